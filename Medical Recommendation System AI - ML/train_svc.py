@@ -0,0 +1,136 @@
+"""Train the symptom -> disease classifier used by main.py.
+
+Produces models/svc.joblib together with models/svc.json (the model_registry
+manifest: hash, symptom vocabulary, label encoding, version and metrics) and
+models/benchmark.json, which compares the SVC against faster candidates.
+
+Usage:
+    python train_svc.py [--data datasets/Training.csv] [--out models]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import BernoulliNB, MultinomialNB
+from sklearn.preprocessing import LabelEncoder
+from sklearn.svm import SVC
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import file_sha256, save_model  # noqa: E402
+
+LABEL_COLUMN = 'prognosis'
+RANDOM_STATE = 20
+
+# Candidate models. "svc" is the one main.py serves; the others are benchmarked
+# so we can see whether a cheaper model gives the same accuracy.
+CANDIDATES = {
+    'svc': lambda: SVC(kernel='linear'),
+    'logistic_regression': lambda: LogisticRegression(max_iter=1000),
+    'bernoulli_nb': lambda: BernoulliNB(),
+    'multinomial_nb': lambda: MultinomialNB(),
+}
+
+
+def load_training_data(path):
+    """Return (X, y, symptoms, classes) with y label-encoded."""
+    df = pd.read_csv(path)
+    df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
+
+    # The column order of the CSV *is* the model's feature order
+    symptoms = [c for c in df.columns if c != LABEL_COLUMN]
+    X = df[symptoms].to_numpy(dtype=np.float64)
+
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(df[LABEL_COLUMN])
+    return X, y, symptoms, list(encoder.classes_)
+
+
+def benchmark_model(name, X_train, X_test, y_train, y_test, repeats=200):
+    """Fit one candidate and time fit, batch predict and single-row predict."""
+    model = CANDIDATES[name]()
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    batch_seconds = time.perf_counter() - start
+
+    # Single-row latency is what the Streamlit app actually pays per click
+    row = X_test[:1]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+
+    report = {
+        'model': name,
+        'fit_seconds': round(fit_seconds, 6),
+        'batch_predict_seconds': round(batch_seconds, 6),
+        'batch_size': int(len(X_test)),
+        'single_predict_ms_p50': round(float(np.percentile(timings, 50)), 4),
+        'single_predict_ms_p99': round(float(np.percentile(timings, 99)), 4),
+        'accuracy': round(float(accuracy_score(y_test, y_pred)), 6),
+    }
+    return model, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=os.path.join('datasets', 'Training.csv'))
+    parser.add_argument('--out', default='models')
+    parser.add_argument('--test-size', type=float, default=0.3)
+    parser.add_argument('--repeats', type=int, default=200, help="single-row predictions to time per model")
+    args = parser.parse_args()
+
+    # Step 1: Load data and derive the vocabulary / label encoding from it
+    X, y, symptoms, classes = load_training_data(args.data)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=args.test_size, random_state=RANDOM_STATE
+    )
+
+    # Step 2: Train and benchmark every candidate
+    reports = []
+    served_model = None
+    for name in CANDIDATES:
+        model, report = benchmark_model(name, X_train, X_test, y_train, y_test, args.repeats)
+        reports.append(report)
+        print(f"{name:>20}: acc={report['accuracy']:.4f} fit={report['fit_seconds']:.3f}s "
+              f"p50={report['single_predict_ms_p50']:.3f}ms")
+        if name == 'svc':
+            served_model, served_report = model, report
+
+    # Step 3: Save the served model together with its manifest
+    os.makedirs(args.out, exist_ok=True)
+    model_path = os.path.join(args.out, 'svc.joblib')
+    data_sha256 = file_sha256(args.data)
+    metadata = save_model(
+        served_model, model_path, features=symptoms, classes=classes,
+        version=f"{datetime.now(timezone.utc):%Y%m%d%H%M%S}-{data_sha256[:8]}",
+        model_name='svc',
+        training_data=os.path.basename(args.data),
+        training_data_sha256=data_sha256,
+        sklearn_version=sklearn.__version__,
+        metrics=served_report,
+    )
+
+    with open(os.path.join(args.out, 'benchmark.json'), 'w') as f:
+        json.dump({'version': metadata['version'], 'results': reports}, f, indent=2)
+
+    print(f"Model saved as '{model_path}' (version {metadata['version']})")
+
+
+if __name__ == '__main__':
+    main()
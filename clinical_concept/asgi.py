@@ -0,0 +1,23 @@
+"""
+ASGI config for clinical_concept project.
+
+Needed for the async views (the live event stream, and the dashboards from
+core/async_views.py when ASYNC_VIEWS is set), e.g.:
+
+    ASYNC_VIEWS=1 DJANGO_SETTINGS_MODULE=clinical_concept.settings_production \
+        uvicorn clinical_concept.asgi:application --workers 1
+
+Compare against the WSGI views with:
+    python manage.py dashboard_benchmark --requests 500 --concurrency 32
+
+core.events.LocalBroker only reaches streams in its own process; run one
+worker per broker or configure EVENT_BROKER.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clinical_concept.settings')
+
+application = get_asgi_application()
@@ -0,0 +1,109 @@
+"""Production overrides for the base settings.
+
+    DJANGO_SETTINGS_MODULE=clinical_concept.settings_production
+
+SQLite (the default) runs in WAL mode with the pragmas below applied to every
+connection by core.db.configure_connection, IMMEDIATE write transactions and
+persistent connections. Set DATABASE_ENGINE=postgresql (plus DATABASE_NAME,
+DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST, DATABASE_PORT) to use a
+server database instead; DATABASE_POOL=1 enables psycopg's connection pool.
+
+REDIS_URL or MEMCACHED_LOCATION selects the shared cache; see CACHES below.
+
+Check the lock behaviour under concurrent writers with:
+    python manage.py sqlite_stress --workers 16 --seconds 10
+"""
+import os
+from pathlib import Path
+
+import django
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 600))
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+}
+
+if os.environ.get('DATABASE_ENGINE', 'sqlite') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'clinical_concept'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DATABASE_POOL') == '1':
+        # A pool and persistent connections are mutually exclusive in Django
+        DATABASES['default']['OPTIONS']['pool'] = True
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', str(PROJECT_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # The lock wait is SQLITE_PRAGMAS['busy_timeout'], applied after
+            # connecting; a driver 'timeout' here would be overridden by it
+            'OPTIONS': {},
+        }
+    }
+    if django.VERSION >= (5, 1):
+        # Take the write lock at BEGIN so a read-then-write transaction can
+        # wait on busy_timeout instead of failing with "database is locked"
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+# The profile cache, the feed and the ETag version counters must be shared by
+# every worker: set REDIS_URL (e.g. redis://127.0.0.1:6379/1) or
+# MEMCACHED_LOCATION (e.g. 127.0.0.1:11211), with the redis or pymemcache
+# package installed. The core.E001 check refuses the per-process local-memory
+# cache unless SINGLE_PROCESS=1 says there is only one worker.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'].split(','),
+        }
+    }
+SINGLE_PROCESS = os.environ.get('SINGLE_PROCESS') == '1'
+
+# ASYNC_VIEWS=1 when serving through clinical_concept/asgi.py: the dashboards
+# and searches then come from core/async_views.py. Persistent connections are
+# turned off, as Django advises under ASGI: connections opened on the async
+# ORM's threads are not reliably closed when a request finishes.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+if ASYNC_VIEWS:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# METRICS=1 records per-view latency, SQL and template timings (core/metrics.py),
+# readable by staff at /metrics/ or by Prometheus with METRICS_TOKEN.
+METRICS_ENABLED = os.environ.get('METRICS') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+MIDDLEWARE = ['core.metrics.MetricsMiddleware', *MIDDLEWARE]  # noqa: F405
+
+# Where archive_old_rows moves old notifications, appointments and issues
+# (core/archive.py); defaults to archive.sqlite3 next to the database.
+ARCHIVE_DATABASE = os.environ.get('ARCHIVE_DATABASE') or None
@@ -0,0 +1,198 @@
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import summaries
+from .etags import profile_version
+from .models import Appointment, Issue, Notification
+from .versions import bump
+
+# Moves old rows out of the hot tables into a sidecar SQLite file, so the
+# tables the dashboards query (and their indexes) only hold live data.
+#
+#   notifications  read, and created more than N days ago
+#   appointments   cancelled, or accepted (i.e. held), dated more than N days ago
+#   issues         created more than N days ago
+#
+# N comes from ARCHIVE_HORIZON_DAYS and can be overridden per run. Each batch
+# is first written and committed to the sidecar and only then deleted from
+# the hot table in its own short transaction; a run interrupted between the
+# two leaves the rows in both places, and the next run overwrites the
+# sidecar copies by id.
+#
+# The hot-table delete is plain SQL, so model signals do not fire: the cohort
+# rollups keep counting archived history, and rollups.rebuild() reads it back
+# from the sidecar (``archived_rows``). Patient summaries and dashboard ETags
+# of the affected profiles are refreshed explicitly.
+ARCHIVE_HORIZON_DAYS = {
+    'notifications': 90,
+    'appointments': 180,
+    'issues': 730,
+    **getattr(settings, 'ARCHIVE_HORIZON_DAYS', {}),
+}
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_path():
+    """ARCHIVE_DATABASE, or archive.sqlite3 next to the SQLite database (else the working directory)."""
+    configured = getattr(settings, 'ARCHIVE_DATABASE', None)
+    if configured:
+        return Path(configured)
+    default = settings.DATABASES['default']
+    if default['ENGINE'].endswith('sqlite3') and str(default['NAME']) != ':memory:':
+        return Path(default['NAME']).with_name('archive.sqlite3')
+    return Path('archive.sqlite3')
+
+
+class Policy:
+    def __init__(self, name, model, condition, profile_columns, patient_column=None):
+        self.name = name
+        self.model = model
+        self.condition = condition  # cutoff datetime -> Q
+        self.profile_columns = profile_columns  # whose dashboards show these rows
+        self.patient_column = patient_column  # whose PatientSummary counts them
+
+    @property
+    def fields(self):
+        return self.model._meta.concrete_fields
+
+    @property
+    def table(self):
+        return f'archived_{self.model._meta.db_table}'
+
+
+POLICIES = {
+    policy.name: policy for policy in [
+        Policy('notifications', Notification,
+               lambda cutoff: Q(is_read=True, created_at__lt=cutoff),
+               ['user_profile_id']),
+        Policy('appointments', Appointment,
+               lambda cutoff: Q(status__in=[Appointment.Status.CANCELLED, Appointment.Status.ACCEPTED],
+                                appointment_date__lt=cutoff),
+               ['patient_id', 'doctor_id'], patient_column='patient_id'),
+        Policy('issues', Issue,
+               lambda cutoff: Q(created_at__lt=cutoff),
+               ['patient_id'], patient_column='patient_id'),
+    ]
+}
+
+
+def archived_rows(policy, columns):
+    """Yield ``columns`` of the rows archived under ``policy`` that are no longer in the hot table.
+
+    Reads the sidecar at archive_path(); rows an interrupted run left in both
+    places are skipped, as the hot copy still counts.
+    """
+    path = archive_path()
+    if not path.exists():
+        return
+    sidecar = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        exists = sidecar.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [policy.table]
+        ).fetchone()
+        if not exists:
+            return
+        selected = ', '.join(f'"{column}"' for column in columns)
+        cursor = sidecar.execute(f'SELECT id, {selected} FROM "{policy.table}" ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(ARCHIVE_BATCH_SIZE)
+            if not rows:
+                break
+            live = set(policy.model.objects.filter(id__in=[row[0] for row in rows]).values_list('id', flat=True))
+            for row in rows:
+                if row[0] not in live:
+                    yield row[1:]
+    finally:
+        sidecar.close()
+
+
+def _sqlite_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class Archiver:
+    def __init__(self, path=None, batch_size=ARCHIVE_BATCH_SIZE, pause=0.0):
+        self.path = Path(path) if path else archive_path()
+        self.batch_size = batch_size
+        self.pause = pause
+        self.sidecar = sqlite3.connect(self.path)
+        self.sidecar.execute('PRAGMA journal_mode = WAL')
+        self.sidecar.execute('PRAGMA synchronous = NORMAL')
+
+    def close(self):
+        self.sidecar.close()
+
+    def _ensure_table(self, policy):
+        columns = ', '.join(
+            'id INTEGER PRIMARY KEY' if field.primary_key else f'"{field.column}"' for field in policy.fields
+        )
+        self.sidecar.execute(f'CREATE TABLE IF NOT EXISTS "{policy.table}" ({columns}, archived_at TEXT)')
+        # Archived rows are looked up by the profile they belong to
+        for column in policy.profile_columns:
+            self.sidecar.execute(
+                f'CREATE INDEX IF NOT EXISTS "{policy.table}_{column}" ON "{policy.table}" ("{column}")'
+            )
+
+    def eligible(self, policy, days):
+        cutoff = timezone.now() - timedelta(days=days)
+        return policy.model.objects.filter(policy.condition(cutoff))
+
+    def run(self, policy, days, limit=None):
+        """Archive ``policy``'s rows older than ``days``; yields the size of each batch moved."""
+        self._ensure_table(policy)
+        attnames = [field.attname for field in policy.fields]
+        columns = ', '.join(f'"{field.column}"' for field in policy.fields)
+        placeholders = ', '.join('?' * (len(attnames) + 1))
+        insert = f'INSERT OR REPLACE INTO "{policy.table}" ({columns}, archived_at) VALUES ({placeholders})'
+        queryset = self.eligible(policy, days).order_by('id')
+        moved = 0
+        last_id = 0
+        while limit is None or moved < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - moved)
+            rows = list(queryset.filter(id__gt=last_id).values_list(*attnames)[:size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            archived_at = timezone.now().isoformat()
+            with self.sidecar:
+                self.sidecar.executemany(insert, [
+                    [_sqlite_value(value) for value in row] + [archived_at] for row in rows
+                ])
+            ids = [row[0] for row in rows]
+            self._delete(policy, ids)
+            self._refresh(policy, attnames, rows)
+            moved += len(rows)
+            yield len(rows)
+            if self.pause:
+                time.sleep(self.pause)
+
+    @staticmethod
+    def _delete(policy, ids):
+        table = connection.ops.quote_name(policy.model._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+
+    @staticmethod
+    def _refresh(policy, attnames, rows):
+        profile_ids = set()
+        for column in policy.profile_columns:
+            index = attnames.index(column)
+            profile_ids.update(row[index] for row in rows)
+        if policy.patient_column:
+            index = attnames.index(policy.patient_column)
+            patient_ids = {row[index] for row in rows}
+            summaries.refresh_many(patient_ids)
+            # Their doctors' dashboards show the refreshed summaries
+            profile_ids.update(
+                Appointment.objects.filter(patient_id__in=patient_ids).values_list('doctor_id', flat=True).distinct()
+            )
+        bump(*(profile_version(profile_id) for profile_id in profile_ids))
@@ -0,0 +1,202 @@
+"""Async versions of the dashboards and read-only JSON endpoints, for ASGI.
+
+core/urls.py serves these in place of the views.py versions when
+settings.ASYNC_VIEWS is True (see clinical_concept/asgi.py). Each view issues
+its independent queries together with asyncio.gather, and nothing reachable
+from the templates is left lazy, so rendering never touches the database.
+The dashboards rendered here also subscribe to the live event stream
+(live_events.html, views.event_stream), which only works under ASGI.
+
+Django's async ORM still runs each query on its sync thread, so queries are
+not parallel; what changes is that a request waiting on the database or cache
+no longer holds a worker thread. Writes (the doctor's prescription form) are
+handed to the sync view.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
+
+from . import etags, feed, rollups, search, summaries, views
+from .decorators import role_required
+from .forms import MedicationForm
+from .models import Issue, Medication, Notification, UserProfile
+from .views import APPOINTMENTS_PAGE_SIZE
+
+# URL names served from here when ASYNC_VIEWS is on
+VIEWS = [
+    'doctor_dashboard', 'patient_dashboard', 'scientist_dashboard',
+    'search_research_posts', 'search_issues', 'search_patients',
+]
+
+
+def _page_number(request):
+    page = request.GET.get('page', '')
+    return int(page) if page.isdigit() and int(page) > 0 else 1
+
+
+async def _list(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _recent_notifications(profile, limit=5):
+    return await _list(Notification.objects.filter(user_profile=profile).order_by('-created_at')[:limit])
+
+
+async def _unread_count(profile):
+    return await Notification.objects.filter(user_profile=profile, is_read=False).acount()
+
+
+@role_required(UserProfile.Role.DOCTOR, denied_template='unauthorized.html')
+@cache_control(private=True, no_cache=True)
+@etag(etags.doctor_dashboard)
+async def doctor_dashboard(request):
+    if request.method == 'POST':
+        return await sync_to_async(views.doctor_dashboard)(request)
+    user_profile = request.profile
+    page_number = _page_number(request)
+    offset = (page_number - 1) * APPOINTMENTS_PAGE_SIZE
+
+    appointments, research_posts, notifications, unread_notifications_count = await asyncio.gather(
+        _list(
+            views.doctor_appointments(user_profile)
+            .order_by('appointment_date', 'id')[offset:offset + APPOINTMENTS_PAGE_SIZE + 1]
+        ),
+        sync_to_async(feed.latest_posts)(5),
+        _recent_notifications(user_profile),
+        _unread_count(user_profile),
+    )
+
+    appointment_details = []
+    for appointment in appointments[:APPOINTMENTS_PAGE_SIZE]:
+        patient_profile = appointment.patient
+        if not hasattr(patient_profile, 'summary'):
+            # Not backfilled yet (see the rebuild_patient_summaries command)
+            patient_profile.summary = await sync_to_async(summaries.refresh)(patient_profile.id)
+        appointment_details.append({
+            'appointment': appointment,
+            'patient_profile': patient_profile,
+            'summary': patient_profile.summary,
+        })
+
+    context = {
+        'profile': user_profile,
+        'appointment_details': appointment_details,
+        'appointment_page': {
+            'number': page_number,
+            'has_previous': page_number > 1,
+            'has_next': len(appointments) > APPOINTMENTS_PAGE_SIZE,
+        },
+        'medication_form': MedicationForm(doctor=user_profile),
+        'research_posts': research_posts,
+        'notifications': notifications,
+        'unread_notifications_count': unread_notifications_count,
+        'live_events': True,
+    }
+    return render(request, 'doctor_dashboard.html', context)
+
+
+@role_required(UserProfile.Role.PATIENT)
+@cache_control(private=True, no_cache=True)
+@etag(etags.patient_dashboard)
+async def patient_dashboard(request):
+    user_profile = request.profile
+    issues = Issue.objects.filter(patient=user_profile)
+
+    patient_issues, appointments, medications, doctors = await asyncio.gather(
+        _list(issues),
+        _list(views.patient_appointments(user_profile)),
+        _list(Medication.objects.filter(patient=user_profile)),
+        # Doctors whose specialization matches one of the patient's issue descriptions
+        _list(views.matching_doctors(issues.values('description'))),
+    )
+
+    context = {
+        'profile': user_profile,
+        'medical_history': user_profile.details.medical_history if user_profile.details else None,
+        'appointments': appointments,
+        'issues': patient_issues,
+        'medications': medications,
+        'doctors': doctors,
+        'live_events': True,
+    }
+    return render(request, 'patient_dashboard.html', context)
+
+
+@role_required(UserProfile.Role.SCIENTIST)
+@cache_control(private=True, no_cache=True)
+@etag(etags.scientist_dashboard)
+async def scientist_dashboard(request):
+    user_profile = request.profile
+
+    unread_notifications_count, research_page, cohort = await asyncio.gather(
+        _unread_count(user_profile),
+        sync_to_async(feed.feed_page)(_page_number(request)),
+        sync_to_async(rollups.dashboard)(),
+    )
+
+    context = {
+        'profile': user_profile,
+        'research_area': user_profile.details.research_area if user_profile.details else None,
+        'institution': user_profile.details.institution if user_profile.details else None,
+        'research_posts': research_page['posts'],
+        'research_page': research_page,
+        'cohort': cohort,
+        'unread_notifications_count': unread_notifications_count,
+        'live_events': True,
+    }
+    return render(request, 'scientist_dashboard.html', context)
+
+
+@role_required()
+async def search_research_posts(request):
+    query, page = views._search_page(request)
+    results, has_next = await sync_to_async(search.search_research_posts)(query, page=page)
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'has_next': has_next,
+        'results': [
+            {
+                'id': post.id,
+                'title': post.title,
+                'snippet': snippet,
+                'scientist': post.scientist.full_name,
+                'created_at': post.created_at.isoformat(),
+            }
+            for post, snippet in results
+        ],
+    })
+
+
+@role_required(UserProfile.Role.DOCTOR)
+async def search_issues(request):
+    query, page = views._search_page(request)
+    results, has_next = await sync_to_async(search.search_issues)(query, request.profile, page=page)
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'has_next': has_next,
+        'results': [
+            {
+                'id': issue.id,
+                'patient': issue.patient.full_name,
+                'snippet': snippet,
+                'created_at': issue.created_at.isoformat(),
+            }
+            for issue, snippet in results
+        ],
+    })
+
+
+@role_required(UserProfile.Role.DOCTOR)
+async def search_patients(request):
+    query = request.GET.get('q', '').strip()
+    patients = await sync_to_async(search.search_patients)(query, request.profile)
+    return JsonResponse({
+        'query': query,
+        'results': [{'id': patient['id'], 'name': patient['full_name']} for patient in patients],
+    })
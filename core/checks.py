@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends whose entries live in one process (or nowhere). The version
+# counters (core/versions.py), the profile cache (core/middleware.py) and the
+# research feed (core/feed.py) rely on every worker seeing the same cache:
+# with one of these, a write in one worker leaves the others serving stale
+# ETags, pages and roles until their entries time out.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register('caches')
+def check_shared_cache(app_configs, **kwargs):
+    if getattr(settings, 'SINGLE_PROCESS', False):
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"The default cache ({backend}) is not shared between worker processes.",
+        hint="Configure a shared cache (REDIS_URL or MEMCACHED_LOCATION with "
+             "clinical_concept.settings_production), or set SINGLE_PROCESS = True "
+             "if the site runs in a single process.",
+        id='core.E001',
+    )]
@@ -0,0 +1,192 @@
+import csv
+import hashlib
+import hmac
+import io
+import re
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+
+from .models import Issue, UserProfile
+
+# De-identified cohort exports for scientists, streamed by views.cohort_export
+# and the export_cohort command.
+#
+#   patients  one row per patient: pseudonym, gender, 5-year age band (90+
+#             top-coded) and issue / medication / appointment counts from
+#             PatientSummary
+#   issues    one row per issue: the patient's pseudonym, the month it was
+#             reported and the description with identifiers scrubbed
+#
+# Names, emails, addresses, medical history and exact dates never leave the
+# database. Pseudonyms are a keyed hash of the patient id, so the two datasets
+# join on them and stay stable between exports while COHORT_EXPORT_KEY (by
+# default SECRET_KEY) is unchanged.
+#
+# Rows come from QuerySet.iterator(chunk_size=...) over values_list(), so an
+# export holds one chunk of rows and one output chunk in memory however many
+# rows it covers.
+COHORT_EXPORT_KEY = getattr(settings, 'COHORT_EXPORT_KEY', None) or settings.SECRET_KEY
+COHORT_CHUNK_SIZE = getattr(settings, 'COHORT_CHUNK_SIZE', 2000)
+CSV_FLUSH_BYTES = 64 * 1024
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs an optional dependency that is not installed."""
+
+
+@lru_cache(maxsize=100_000)
+def pseudonym(patient_id):
+    digest = hmac.new(COHORT_EXPORT_KEY.encode(), f'patient:{patient_id}'.encode(), hashlib.sha256)
+    return digest.hexdigest()[:16]
+
+
+def age_band(age):
+    if age is None:
+        return ''
+    if age >= 90:
+        return '90+'
+    low = age - age % 5
+    return f'{low}-{low + 4}'
+
+
+_SCRUB = [
+    (re.compile(r'\b[\w.+-]+@[\w-]+\.[\w.-]+\b'), '[EMAIL]'),
+    (re.compile(r'\bhttps?://\S+', re.IGNORECASE), '[URL]'),
+    (re.compile(r'\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b'), '[DATE]'),
+    # Phone, record and ID numbers; short lab values such as "120 mg/dL" stay
+    (re.compile(r'\+?\d[\d ()-]{5,}\d'), '[NUMBER]'),
+]
+
+
+@lru_cache(maxsize=10_000)
+def _name_pattern(names):
+    names = sorted((name for name in names if len(name) >= 3), key=len, reverse=True)
+    if not names:
+        return None
+    return re.compile(r'\b(?:' + '|'.join(map(re.escape, names)) + r')\b', re.IGNORECASE)
+
+
+def scrub(text, names=()):
+    """Remove emails, URLs, dates, long numbers and the given name parts from free text."""
+    text = text or ''
+    for pattern, replacement in _SCRUB:
+        text = pattern.sub(replacement, text)
+    pattern = _name_pattern(frozenset(names))
+    return pattern.sub('[NAME]', text) if pattern else text
+
+
+def _patient_rows(chunk_size):
+    rows = (
+        UserProfile.objects.filter(role=UserProfile.Role.PATIENT)
+        .order_by('id')
+        .values_list('id', 'patient_profile__gender', 'patient_profile__age', 'summary__issue_count',
+                     'summary__medication_count', 'summary__appointment_count')
+        .iterator(chunk_size=chunk_size)
+    )
+    for patient_id, gender, age, issues, medications, appointments in rows:
+        # Counts are NULL for a patient whose summary has not been built yet
+        yield (pseudonym(patient_id), gender or '', age_band(age), issues or 0, medications or 0, appointments or 0)
+
+
+def _issue_rows(chunk_size):
+    rows = (
+        Issue.objects.order_by('id')
+        .values_list('patient_id', 'patient__full_name', 'patient__user__first_name',
+                     'patient__user__last_name', 'created_at', 'description')
+        .iterator(chunk_size=chunk_size)
+    )
+    for patient_id, full_name, first_name, last_name, created_at, description in rows:
+        names = frozenset({*(full_name or '').split(), first_name, last_name} - {None, ''})
+        yield (pseudonym(patient_id), f'{created_at.year}-{created_at.month:02d}', scrub(description, names))
+
+
+# dataset -> ([(column, 'string' | 'int')], row generator)
+DATASETS = {
+    'patients': (
+        [('patient', 'string'), ('gender', 'string'), ('age_band', 'string'),
+         ('issue_count', 'int'), ('medication_count', 'int'), ('appointment_count', 'int')],
+        _patient_rows,
+    ),
+    'issues': (
+        [('patient', 'string'), ('reported_month', 'string'), ('description', 'string')],
+        _issue_rows,
+    ),
+}
+
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _Drain(io.RawIOBase):
+    """A write-only file whose contents are handed out and forgotten by ``drain``."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(columns, rows, row_group_size):
+    """Parquet, one row group per ``row_group_size`` rows, written as each group fills."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'string': pa.string(), 'int': pa.int64()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    rows = iter(rows)
+    while batch := list(islice(rows, row_group_size)):
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)],
+            schema=schema,
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export(dataset, fmt='csv', chunk_size=COHORT_CHUNK_SIZE):
+    """Chunks (str for CSV, bytes for Parquet) of ``dataset`` in ``fmt``; nothing is read until iterated.
+
+    Raises ExportUnavailable up front if ``fmt`` cannot be produced.
+    """
+    columns, row_source = DATASETS[dataset]
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportUnavailable("Parquet export needs pyarrow; use CSV or install pyarrow.")
+        return parquet_chunks(columns, row_source(chunk_size), row_group_size=max(chunk_size, 10000))
+    return csv_chunks(columns, row_source(chunk_size))
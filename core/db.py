@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# What clinical_concept/settings_production.py sets as SQLITE_PRAGMAS; also
+# used by the sqlite_stress command when the active settings define none.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',          # readers no longer block the writer
+    'synchronous': 'NORMAL',        # safe with WAL, far fewer fsyncs
+    'busy_timeout': 5000,           # wait (ms) for a lock instead of failing
+    'mmap_size': 268435456,         # 256 MiB of the file read through mmap
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,           # ~20 MiB page cache per connection
+}
+
+
+def sqlite_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', None) or {}
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created hook: tune each new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = sqlite_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_sqlite_pragmas(cursor, pragmas)
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Stop auto_now_add fields (created_at) overwriting values set for bulk_create."""
+    fields = [f for f in model._meta.concrete_fields if getattr(f, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
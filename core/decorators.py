@@ -0,0 +1,43 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from .middleware import aget_profile, get_profile
+
+
+def role_required(*roles, denied_template=None, denied_url='core:signin'):
+    """Require a logged-in user whose profile has one of ``roles`` (UserProfile.Role; any if none given).
+
+    The resolved profile is set on ``request.profile`` for the view. Users
+    without a matching profile get ``denied_template`` if given, otherwise a
+    redirect to ``denied_url``.
+    """
+    def denied(request):
+        if denied_template:
+            return render(request, denied_template)
+        return redirect(denied_url)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                # Resolve the user (and with it the session) off the event loop
+                # once, so etag functions and templates can use them synchronously
+                request.user = await request.auser()
+                profile = await aget_profile(request)
+                if profile is None or (roles and profile.role not in roles):
+                    return denied(request)
+                request.profile = profile
+                return await view_func(request, *args, **kwargs)
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                profile = get_profile(request)
+                if profile is None or (roles and profile.role not in roles):
+                    return denied(request)
+                request.profile = profile
+                return view_func(request, *args, **kwargs)
+        return login_required(wrapper)
+    return decorator
@@ -0,0 +1,47 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+
+from . import feed, rollups
+from .versions import get_versions
+
+# ETags for the role dashboards, built only from change counters held in the
+# cache so a matching If-None-Match is answered with 304 before any dashboard
+# query runs. core.signals bumps the counters:
+#   profile:<id>  anything shown on that profile's dashboard changed
+#   doctors       a doctor profile changed (patients see the doctor list)
+#   research_feed a research post changed (doctor and scientist dashboards)
+#   cohort_rollups the cohort analytics changed (scientist dashboard)
+DOCTORS = 'doctors'
+
+
+def profile_version(profile_id):
+    return f'profile:{profile_id}'
+
+
+def _etag(request, *parts):
+    # Pending flash messages are rendered once, so never answer 304 over them
+    if len(messages.get_messages(request)):
+        return None
+    # The page embeds a CSRF token; a new CSRF cookie must get a fresh page
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    raw = ':'.join(str(part) for part in (*parts, csrf_cookie))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def doctor_dashboard(request, *args, **kwargs):
+    profile = request.profile
+    return _etag(request, 'doctor', profile.id, request.GET.get('page', ''),
+                 *get_versions(profile_version(profile.id), feed.VERSION))
+
+
+def patient_dashboard(request, *args, **kwargs):
+    profile = request.profile
+    return _etag(request, 'patient', profile.id, *get_versions(profile_version(profile.id), DOCTORS))
+
+
+def scientist_dashboard(request, *args, **kwargs):
+    profile = request.profile
+    return _etag(request, 'scientist', profile.id, request.GET.get('page', ''),
+                 *get_versions(profile_version(profile.id), feed.VERSION, rollups.VERSION))
@@ -0,0 +1,151 @@
+import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import UserProfile
+
+# Live dashboard events, streamed to browsers by views.event_stream as
+# server-sent events. core.signals publishes once a write commits:
+#   notification   new Notification row      -> profile:<recipient id>
+#   appointment    appointment created/updated -> profile:<patient>, profile:<doctor>
+#   research_post  new ResearchPost           -> research (doctors and scientists)
+#
+# Each open stream is a Subscription around a bounded asyncio.Queue on the
+# server's event loop, so an idle connection costs one coroutine and one
+# queue rather than a worker thread.
+#
+# LocalBroker only reaches streams in its own process. It is the stand-in for
+# development and single-process ASGI deployments; with several workers, set
+# EVENT_BROKER to a class with the same subscribe / unsubscribe / publish
+# methods backed by a shared broker (e.g. Redis pub/sub).
+EVENT_BROKER = getattr(settings, 'EVENT_BROKER', 'core.events.LocalBroker')
+EVENT_QUEUE_SIZE = getattr(settings, 'EVENT_QUEUE_SIZE', 100)
+EVENT_HEARTBEAT = getattr(settings, 'EVENT_HEARTBEAT', 20)
+RESEARCH = 'research'
+
+# Queued in place of events for a subscriber that fell too far behind
+OVERFLOW = None
+
+
+def profile_channel(profile_id):
+    return f'profile:{profile_id}'
+
+
+def channels_for(profile):
+    channels = [profile_channel(profile.id)]
+    if profile.role in (UserProfile.Role.DOCTOR, UserProfile.Role.SCIENTIST):
+        channels.append(RESEARCH)
+    return channels
+
+
+class Subscription:
+    def __init__(self, channels, loop, maxsize=EVENT_QUEUE_SIZE):
+        self.channels = tuple(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Always runs on self.loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Rather than silently dropping events, tell the client to reload
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self, timeout):
+        """Next event, OVERFLOW, or raise asyncio.TimeoutError after ``timeout`` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LocalBroker:
+    """In-process pub/sub; ``publish`` may be called from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def publish(self, channel, event_type, data):
+        """Send an event to every subscriber of ``channel``; returns how many there were."""
+        event = {'id': next(self._ids), 'event': event_type, 'data': data}
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        # One wake-up per event loop, however many of its streams are listening
+        by_loop = {}
+        for subscription in subscribers:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver_all, group, event)
+            except RuntimeError:
+                # The loop has been closed; its streams are gone
+                pass
+        return len(subscribers)
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return len({s for subscribers in self._channels.values() for s in subscribers})
+
+
+def _deliver_all(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.deliver(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(EVENT_BROKER)()
+    return _broker
+
+
+def publish(channels, event_type, data):
+    broker = get_broker()
+    for channel in channels:
+        broker.publish(channel, event_type, data)
+
+
+def publish_on_commit(channels, event_type, data):
+    """Publish once the current transaction commits, so clients never see rolled-back writes."""
+    channels = list(channels)
+    transaction.on_commit(lambda: publish(channels, event_type, data), robust=True)
+
+
+def format_event(event):
+    """Server-sent-events wire format for a broker event."""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ResearchPost
+from .versions import bump, get_version
+
+# Research feed pages are cached under a version number that is bumped on
+# every ResearchPost write (see core.signals), so a write invalidates every
+# cached page at once and steady-state reads never reach the database. That
+# needs a cache shared by every worker (checked by core.E001 in core/checks.py).
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 600)
+FEED_PAGE_SIZE = 20
+VERSION = 'research_feed'
+
+
+def version():
+    return get_version(VERSION)
+
+
+def invalidate():
+    bump(VERSION)
+
+
+def _serialize(posts):
+    return [
+        {
+            'id': post.id,
+            'title': post.title,
+            'content': post.content,
+            'created_at': post.created_at,
+            'scientist_name': post.scientist.full_name,
+        }
+        for post in posts
+    ]
+
+
+def _cached(key, build):
+    key = f'core:research_feed:{version()}:{key}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, FEED_CACHE_TIMEOUT)
+    return value
+
+
+def latest_posts(limit=5):
+    """The newest ``limit`` posts as dicts (title, content, created_at, ...)."""
+    return _cached(f'latest:{limit}', lambda: _serialize(
+        ResearchPost.objects.select_related('scientist').order_by('-created_at', '-id')[:limit]
+    ))
+
+
+def feed_page(number, per_page=FEED_PAGE_SIZE):
+    """One page of the feed: {'posts', 'number', 'has_previous', 'has_next'}."""
+    number = max(int(number), 1)
+
+    def build():
+        offset = (number - 1) * per_page
+        posts = list(
+            ResearchPost.objects.select_related('scientist')
+            .order_by('-created_at', '-id')[offset:offset + per_page + 1]
+        )
+        return {
+            'posts': _serialize(posts[:per_page]),
+            'number': number,
+            'has_previous': number > 1,
+            'has_next': len(posts) > per_page,
+        }
+
+    return _cached(f'page:{per_page}:{number}', build)
@@ -2,12 +2,8 @@ from django import forms
 from django.contrib.auth.models import User
 from .models import UserProfile
 
-# Choices for the user roles
-ROLE_CHOICES = [
-    ('doctor', 'Doctor'),
-    ('patient', 'Patient'),
-    ('scientist', 'Scientist'),
-]
+# Choices for the user roles; the sign-up form posts the role slug
+ROLE_CHOICES = [(role.slug, role.label) for role in UserProfile.Role]
 
 class SignUpForm(forms.Form):
     name = forms.CharField(max_length=100, required=True, label="Full Name")
@@ -64,6 +60,7 @@ class IssueForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'rows': 3}),
         }
 from django import forms
+from . import search
 from .models import Medication, UserProfile
 
 class MedicationForm(forms.ModelForm):
@@ -71,24 +68,60 @@ class MedicationForm(forms.ModelForm):
         model = Medication
         fields = ['patient', 'name', 'dosage', 'frequency', 'instructions']
         widgets = {
-            'patient': forms.Select(attrs={'class': 'form-control custom-select'}),  # Add Bootstrap class
+            # Set by the patient picker (core:search_patients); never rendered as a <select>
+            'patient': forms.HiddenInput(),
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter medication name'}),
             'dosage': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter dosage amount'}),
             'frequency': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter frequency (e.g., daily)'}),
             'instructions': forms.Textarea(attrs={'class': 'form-control', 'placeholder': 'Enter medication instructions', 'rows': 4}),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, doctor=None, **kwargs):
         super(MedicationForm, self).__init__(*args, **kwargs)
-        
-        # Restrict patient options to only those with role 'patient'
-        self.fields['patient'].queryset = UserProfile.objects.filter(role='patient')
+
+        # Only used to look up the submitted id, so restricting it to the
+        # doctor's own patients costs one indexed query per POST
+        if doctor is not None:
+            self.fields['patient'].queryset = search.doctor_patients(doctor)
+        else:
+            self.fields['patient'].queryset = UserProfile.objects.filter(role=UserProfile.Role.PATIENT)
 
         # Remove labels from form fields
         for field in self.fields.values():
             field.label = False
 
 
+class PrescriptionForm(forms.Form):
+    """One item of a bulk prescription (core.views.bulk_prescribe).
+
+    A plain form rather than a MedicationForm: ``patients`` is the set of
+    ids the doctor may prescribe for, looked up once for the whole batch
+    instead of once per item.
+    """
+    patient = forms.IntegerField()
+    name = forms.CharField(max_length=255)
+    dosage = forms.CharField(max_length=255)
+    frequency = forms.CharField(max_length=255)
+    instructions = forms.CharField()
+
+    def __init__(self, *args, patients=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.patients = patients
+
+    def clean_patient(self):
+        patient = self.cleaned_data['patient']
+        if patient not in self.patients:
+            raise forms.ValidationError("Not one of your patients.")
+        return patient
+
+    def medication(self):
+        """The unsaved Medication for a valid form."""
+        return Medication(
+            patient_id=self.cleaned_data['patient'],
+            **{field: self.cleaned_data[field] for field in ['name', 'dosage', 'frequency', 'instructions']},
+        )
+
+
 from django import forms
 from .models import ResearchPost
 
@@ -105,19 +138,39 @@ class ResearchPostForm(forms.ModelForm):
 
 
 from django import forms
-from .models import UserProfile
+from django.db import transaction
+from .models import UserProfile, DoctorProfile, ScientistProfile, PatientProfile
+
+
+class ProfileDetailsForm(forms.ModelForm):
+    """Edits a role's details row (the form's instance) together with its profile's full_name."""
+    full_name = forms.CharField(max_length=100)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['full_name'].initial = self.instance.profile.full_name
+        self.order_fields(['full_name'])
+
+    def save(self, commit=True):
+        details = super().save(commit=False)
+        details.profile.full_name = self.cleaned_data['full_name']
+        if commit:
+            with transaction.atomic():
+                details.profile.save(update_fields=['full_name'])
+                details.save()
+        return details
+
+
+class UserProfileForm(ProfileDetailsForm):
+    full_name = forms.CharField(max_length=100, widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Enter your full name',
+    }))
 
-class UserProfileForm(forms.ModelForm):
     class Meta:
-        model = UserProfile
-        fields = ['full_name', 'gender', 'age', 'address']
+        model = PatientProfile
+        fields = ['gender', 'age', 'address']
         widgets = {
-            'full_name': forms.TextInput(
-                attrs={
-                    'class': 'form-control',
-                    'placeholder': 'Enter your full name',
-                }
-            ),
             'gender': forms.Select(
                 choices=[('Male', 'Male'), ('Female', 'Female'), ('Other', 'Other')],
                 attrs={'class': 'form-select'}
@@ -137,19 +190,17 @@ class UserProfileForm(forms.ModelForm):
             ),
         }
 
-from django import forms
-from .models import UserProfile
-
 # forms.py
-class DoctorProfileForm(forms.ModelForm):
+class DoctorProfileForm(ProfileDetailsForm):
+    full_name = forms.CharField(max_length=100, widget=forms.TextInput(attrs={
+        'class': 'form-control mb-3',
+        'placeholder': 'Enter your full name',
+    }))
+
     class Meta:
-        model = UserProfile
-        fields = ['full_name', 'license_number', 'specialization', 'hospital']
+        model = DoctorProfile
+        fields = ['license_number', 'specialization', 'hospital']
         widgets = {
-            'full_name': forms.TextInput(attrs={
-                'class': 'form-control mb-3',
-                'placeholder': 'Enter your full name',
-            }),
             'license_number': forms.TextInput(attrs={
                 'class': 'form-control mb-3',
                 'placeholder': 'Enter your license number',
@@ -164,21 +215,16 @@ class DoctorProfileForm(forms.ModelForm):
             }),
         }
 
-from django import forms
-from .models import UserProfile
-
+class ResearcherProfileForm(ProfileDetailsForm):
+    full_name = forms.CharField(max_length=100, widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Enter your full name',
+    }))
 
-
-
-class ResearcherProfileForm(forms.ModelForm):
     class Meta:
-        model = UserProfile
-        fields = ['full_name', 'research_area', 'institution']
+        model = ScientistProfile
+        fields = ['research_area', 'institution']
         widgets = {
-            'full_name': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Enter your full name',
-            }),
             'research_area': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Enter your research area',
@@ -211,3 +257,22 @@ class AppointmentForm(forms.ModelForm):
         for field_name, field in self.fields.items():
             field.widget.attrs['class'] = 'form-control'  # Apply Bootstrap styling
 
+
+from django import forms
+from django.utils import timezone
+
+class SlotBookingForm(forms.Form):
+    """Pick one of a doctor's free slots (see core.slots.free_slots)."""
+    slot = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-control'}))
+
+    def __init__(self, *args, free_slots=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        # Grouped by day, rendered as <optgroup>s
+        days = {}
+        for slot in free_slots:
+            local = timezone.localtime(slot)
+            days.setdefault(local.strftime('%A, %B %d'), []).append((slot.isoformat(), local.strftime('%H:%M')))
+        self.fields['slot'].choices = list(days.items())
+
+    def clean_slot(self):
+        return datetime.fromisoformat(self.cleaned_data['slot'])
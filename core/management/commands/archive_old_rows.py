@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = ("Move old notifications, appointments and issues (see core/archive.py) out of the "
+            "hot tables into a sidecar SQLite file, a batch per short transaction. Run "
+            "periodically (e.g. nightly from cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*', metavar='policy',
+                            help="what to archive (default: all of %s)" % ', '.join(archive.POLICIES))
+        parser.add_argument('--days', action='append', default=[], metavar='POLICY=DAYS',
+                            help="override a policy's horizon, e.g. --days notifications=30")
+        parser.add_argument('--batch-size', type=int, default=archive.ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="seconds to sleep between batches, to leave room for live writers")
+        parser.add_argument('--limit', type=int, help="stop each policy after this many rows")
+        parser.add_argument('--archive', help="sidecar database (default: ARCHIVE_DATABASE setting)")
+        parser.add_argument('--dry-run', action='store_true', help="only count the eligible rows")
+
+    def horizons(self, overrides):
+        days = dict(archive.ARCHIVE_HORIZON_DAYS)
+        for override in overrides:
+            name, _, value = override.partition('=')
+            if name not in archive.POLICIES or not value.isdigit():
+                raise CommandError(f"Bad --days '{override}'; expected e.g. notifications=30")
+            days[name] = int(value)
+        return days
+
+    def handle(self, *args, **options):
+        days = self.horizons(options['days'])
+        names = options['policies'] or list(archive.POLICIES)
+        unknown = set(names) - set(archive.POLICIES)
+        if unknown:
+            raise CommandError(f"Unknown policy {', '.join(sorted(unknown))}; choose from {', '.join(archive.POLICIES)}")
+        archiver = archive.Archiver(options['archive'], batch_size=options['batch_size'], pause=options['pause'])
+        try:
+            for name in names:
+                policy = archive.POLICIES[name]
+                if options['dry_run']:
+                    count = archiver.eligible(policy, days[name]).count()
+                    self.stdout.write(f"{name}: {count} rows older than {days[name]} days")
+                    continue
+                start = time.perf_counter()
+                moved = batches = 0
+                for size in archiver.run(policy, days[name], limit=options['limit']):
+                    moved += size
+                    batches += 1
+                self.stdout.write(self.style.SUCCESS(
+                    f"{name}: archived {moved} rows older than {days[name]} days in {batches} batches "
+                    f"({time.perf_counter() - start:.2f}s) to {archiver.path}"
+                ))
+        finally:
+            archiver.close()
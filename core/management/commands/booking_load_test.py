@@ -0,0 +1,100 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from core import slots
+from core.models import Appointment, UserProfile
+
+
+class Command(BaseCommand):
+    help = ("Have many patients book the same doctor's slots concurrently and check that "
+            "no slot is double-booked. Creates a throwaway doctor and patients, removed "
+            "afterwards unless --keep is given.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=50)
+        parser.add_argument('--slots', type=int, default=3, help="distinct slots the patients compete for")
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        doctor = self.make_profile(f'loadtest-{run_id}-doctor', UserProfile.Role.DOCTOR)
+        patients = [self.make_profile(f'loadtest-{run_id}-patient{i}', UserProfile.Role.PATIENT) for i in range(options['patients'])]
+        try:
+            self.run(doctor, patients, options)
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith=f'loadtest-{run_id}-').delete()
+
+    @staticmethod
+    def make_profile(username, role):
+        user = User.objects.create_user(username=username, email=f'{username}@example.com')
+        return UserProfile.objects.create(user=user, role=role, full_name=username)
+
+    def run(self, doctor, patients, options):
+        # The first few free slots from tomorrow, so every patient targets the same handful
+        start = timezone.now() + timedelta(days=1)
+        targets = slots.free_slots(doctor, start)[:options['slots']]
+        if len(targets) < options['slots']:
+            raise CommandError("Not enough free slots; check DEFAULT_WORKING_HOURS")
+
+        outcomes = Counter()
+        latencies = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(min(options['threads'], len(patients)))
+        work = list(enumerate(patients))
+
+        def worker():
+            try:
+                barrier.wait()
+                while True:
+                    with lock:
+                        if not work:
+                            return
+                        i, patient = work.pop()
+                    began = time.perf_counter()
+                    try:
+                        slots.book_slot(doctor, patient, targets[i % len(targets)])
+                        outcome = 'booked'
+                    except slots.SlotUnavailable:
+                        outcome = 'conflict'
+                    except Exception as e:
+                        outcome = type(e).__name__
+                    with lock:
+                        outcomes[outcome] += 1
+                        latencies.append(time.perf_counter() - began)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker) for _ in range(barrier.parties)]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        per_slot = Appointment.objects.filter(doctor=doctor).exclude(status=Appointment.Status.CANCELLED) \
+            .values('slot_start').annotate(n=Count('id'))
+        double_booked = [row for row in per_slot if row['n'] > 1]
+        latencies = np.array(latencies) * 1000
+        self.stdout.write(
+            f"{len(patients)} bookings for {len(targets)} slots on {len(threads)} threads in {elapsed:.2f}s: "
+            + ', '.join(f'{n} {outcome}' for outcome, n in sorted(outcomes.items()))
+        )
+        self.stdout.write(f"latency p50={np.percentile(latencies, 50):.1f}ms "
+                          f"p95={np.percentile(latencies, 95):.1f}ms max={latencies.max():.1f}ms")
+        if double_booked or outcomes['booked'] != len(targets):
+            raise CommandError(f"Booking is not conflict-free: {outcomes['booked']} booked, "
+                               f"double-booked slots: {double_booked}")
+        self.stdout.write(self.style.SUCCESS("Every slot booked exactly once"))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = ("Fold the +1/-1 rows that writes append to CohortRollup into one row per "
+            "(metric, week, dimension). Run periodically (e.g. hourly from cron); "
+            "--rebuild recomputes every rollup from the live tables instead.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help="recompute from scratch (first deploy, after bulk imports)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['rebuild']:
+            written = rollups.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {written} rollup rows in {time.perf_counter() - start:.2f}s"
+            ))
+            return
+        before, after = rollups.compact()
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {before} rollup rows into {after} in {time.perf_counter() - start:.2f}s"
+        ))
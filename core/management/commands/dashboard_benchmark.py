@@ -0,0 +1,168 @@
+import asyncio
+import io
+import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client, override_settings
+from django.urls import include, path, reverse
+
+from core import async_views
+from core import urls as core_urls
+from core.models import UserProfile
+
+DASHBOARDS = {
+    'doctor': 'core:doctor_dashboard',
+    'patient': 'core:patient_dashboard',
+    'scientist': 'core:scientist_dashboard',
+}
+
+
+def urlconf(use_async):
+    """A root URLconf module serving core's patterns with the sync or async read views."""
+    patterns = [
+        path(str(pattern.pattern), getattr(async_views, pattern.name), name=pattern.name)
+        if use_async and pattern.name in async_views.VIEWS else pattern
+        for pattern in core_urls.urlpatterns
+    ]
+    name = f'core_benchmark_urls_{"async" if use_async else "sync"}'
+    module = types.ModuleType(name)
+    module.urlpatterns = [path('', include((patterns, 'core')))]
+    sys.modules[name] = module
+    return name
+
+
+class Command(BaseCommand):
+    help = ("Compare requests/second and latency of the dashboards served by the sync views "
+            "under WSGI and by core/async_views.py under ASGI, in-process with the same "
+            "concurrency. Uses the first user of each role in the configured database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="requests per dashboard and server")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--role', action='append', choices=list(DASHBOARDS))
+
+    def handle(self, *args, **options):
+        targets = []
+        for role in options['role'] or list(DASHBOARDS):
+            profile = UserProfile.objects.filter(role=UserProfile.Role.from_slug(role)).select_related('user').first()
+            if profile is None:
+                self.stderr.write(f"No {role} profile, skipping its dashboard")
+                continue
+            targets.append((role, self.session_cookie(profile.user)))
+        if not targets:
+            raise CommandError("No users to benchmark with; run the seed command first.")
+
+        for role, cookie in targets:
+            for server, use_async in (('wsgi', False), ('asgi', True)):
+                with override_settings(ROOT_URLCONF=urlconf(use_async)):
+                    url = reverse(DASHBOARDS[role])
+                    run = self.run_asgi if use_async else self.run_wsgi
+                    statuses, latencies, elapsed = run(url, cookie, options['requests'], options['concurrency'])
+                self.report(role, server, statuses, latencies, elapsed)
+
+    @staticmethod
+    def session_cookie(user):
+        client = Client()
+        client.force_login(user)
+        return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    def report(self, role, server, statuses, latencies, elapsed):
+        latencies = np.array(latencies) * 1000
+        bad = sum(1 for status in statuses if status != 200)
+        self.stdout.write(
+            f"{role:>9} {server}: {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50={np.percentile(latencies, 50):.1f}ms p95={np.percentile(latencies, 95):.1f}ms"
+            + (f"  {bad} non-200 responses" if bad else "")
+        )
+
+    def run_wsgi(self, url, cookie, n, concurrency):
+        application = get_wsgi_application()
+
+        def one(_):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': url,
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie,
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http',
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+                'wsgi.version': (1, 0),
+            }
+            status = []
+            began = time.perf_counter()
+            body = application(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+            return status[0], time.perf_counter() - began
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(one, range(n)))
+        return [s for s, _ in results], [t for _, t in results], time.perf_counter() - began
+
+    def run_asgi(self, url, cookie, n, concurrency):
+        application = get_asgi_application()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'raw_path': url.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+
+        async def one(semaphore):
+            async with semaphore:
+                sent = False
+                done = asyncio.Event()
+                status = []
+
+                async def receive():
+                    nonlocal sent
+                    if not sent:
+                        sent = True
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    await done.wait()
+                    return {'type': 'http.disconnect'}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+
+                began = time.perf_counter()
+                await application(dict(scope), receive, send)
+                done.set()
+                return status[0], time.perf_counter() - began
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(one(semaphore) for _ in range(n)))
+
+        began = time.perf_counter()
+        results = asyncio.run(main())
+        return [s for s, _ in results], [t for _, t in results], time.perf_counter() - began
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import slots
+from core.models import Appointment, UserProfile
+
+from .seed_data import parse_weights
+
+ROLES = [role.slug for role in UserProfile.Role]
+
+
+class Command(BaseCommand):
+    help = ("Drive the sign-in -> dashboard -> book/accept/cancel flows against users made by "
+            "the seed_data command, from several threads, and report throughput, latency "
+            "percentiles and SQL queries per view. Writes real appointments.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=30, help="distinct seeded users to sign in as")
+        parser.add_argument('--iterations', type=int, default=5, help="flows per user")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--mix', default='patient=0.6,doctor=0.3,scientist=0.1',
+                            help="share of users per role")
+        parser.add_argument('--prefix', default='seed', help="the --prefix given to seed_data")
+        parser.add_argument('--password', default='password')
+
+    def handle(self, *args, **options):
+        self.password = options['password']
+        mix = parse_weights(options['mix'], ROLES)
+        users = []
+        for role, share in zip(ROLES, mix):
+            wanted = round(options['users'] * share)
+            emails = list(User.objects.filter(username__startswith=f"{options['prefix']}-{role}-")
+                          .order_by('id').values_list('email', flat=True)[:wanted])
+            if len(emails) < wanted:
+                self.stderr.write(f"Only {len(emails)} seeded {role}s, wanted {wanted}")
+            users += [(role, email) for email in emails]
+        if not users:
+            raise CommandError(f"No seeded users with the prefix '{options['prefix']}'; run seed_data first.")
+        self.doctor_ids = list(UserProfile.objects.filter(role=UserProfile.Role.DOCTOR).values_list('id', flat=True)[:200])
+
+        self.samples = defaultdict(list)  # view -> [(seconds, queries, status)]
+        self.errors = Counter()
+        self.lock = threading.Lock()
+        work = [user for user in users for _ in range(options['iterations'])]
+
+        def worker():
+            try:
+                while True:
+                    with self.lock:
+                        if not work:
+                            return
+                        role, email = work.pop()
+                    try:
+                        getattr(self, f'{role}_flow')(self.client(), email)
+                    except Exception as e:
+                        with self.lock:
+                            self.errors[f'{role} flow: {type(e).__name__}: {e}'] += 1
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker) for _ in range(min(options['threads'], len(work)))]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report(len(users), len(threads), time.perf_counter() - began)
+
+    @staticmethod
+    def client():
+        # Client's default 'testserver' host is only allowed under the test runner
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        return Client(HTTP_HOST=host)
+
+    def request(self, client, name, method, url, data=None, expect=(200, 302)):
+        """One timed request, recording its latency and query count under ``name``."""
+        with CaptureQueriesContext(connection) as queries:
+            began = time.perf_counter()
+            response = client.post(url, data or {}) if method == 'POST' else client.get(url)
+            elapsed = time.perf_counter() - began
+        with self.lock:
+            self.samples[name].append((elapsed, len(queries), response.status_code))
+            if response.status_code not in expect:
+                self.errors[f'{name}: HTTP {response.status_code}'] += 1
+        return response
+
+    def sign_in(self, client, email, role):
+        response = self.request(client, 'sign_in', 'POST', reverse('core:signin'),
+                                {'email': email, 'password': self.password})
+        if response.status_code != 302 or response.url != reverse(f'core:{role}_dashboard'):
+            raise CommandError(f"could not sign in as {email}")
+        self.request(client, f'{role}_dashboard', 'GET', reverse(f'core:{role}_dashboard'), expect=(200,))
+
+    def patient_flow(self, client, email):
+        self.sign_in(client, email, 'patient')
+        profile = UserProfile.objects.get(user__email=email)
+        doctor_id = self.doctor_ids[np.random.randint(len(self.doctor_ids))]
+        url = reverse('core:book_appointment', args=[doctor_id])
+        self.request(client, 'book_appointment', 'GET', url, expect=(200,))
+        free = slots.free_slots(UserProfile(id=doctor_id))
+        if not free:
+            return
+        slot = free[np.random.randint(min(len(free), 20))]
+        response = self.request(client, 'book_appointment', 'POST', url, {'slot': slot.isoformat()})
+        self.request(client, 'patient_dashboard', 'GET', reverse('core:patient_dashboard'), expect=(200,))
+        if response.status_code == 302 and np.random.random() < 0.5:
+            booked = Appointment.objects.filter(patient=profile, doctor_id=doctor_id, slot_start=slot) \
+                .values_list('id', flat=True).first()
+            if booked:
+                self.request(client, 'cancel_appointment', 'POST', reverse('core:cancel_appointment', args=[booked]))
+
+    def doctor_flow(self, client, email):
+        self.sign_in(client, email, 'doctor')
+        pending = Appointment.objects.filter(doctor__user__email=email, status=Appointment.Status.SCHEDULED) \
+            .values_list('id', flat=True).first()
+        if pending:
+            self.request(client, 'accept_appointment', 'POST', reverse('core:accept_appointment', args=[pending]))
+            self.request(client, 'doctor_dashboard', 'GET', reverse('core:doctor_dashboard'), expect=(200,))
+
+    def scientist_flow(self, client, email):
+        self.sign_in(client, email, 'scientist')
+        self.request(client, 'scientist_dashboard', 'GET', reverse('core:scientist_dashboard') + '?page=2',
+                     expect=(200,))
+
+    def report(self, users, threads, elapsed):
+        total = sum(len(samples) for samples in self.samples.values())
+        self.stdout.write(f"{total} requests for {users} users on {threads} threads in {elapsed:.2f}s "
+                          f"({total / elapsed:.1f} req/s)")
+        self.stdout.write(f"{'view':<22}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+                          f"{'max ms':>9}{'queries':>9}{'max q':>7}")
+        for name, samples in sorted(self.samples.items()):
+            latencies = np.array([s[0] for s in samples]) * 1000
+            queries = np.array([s[1] for s in samples])
+            self.stdout.write(
+                f"{name:<22}{len(samples):>9}{len(samples) / elapsed:>8.1f}"
+                f"{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 95):>9.1f}{latencies.max():>9.1f}"
+                f"{queries.mean():>9.1f}{queries.max():>7}"
+            )
+        for error, count in self.errors.most_common():
+            self.stderr.write(f"{count} x {error}")
+        if self.errors:
+            raise CommandError(f"{sum(self.errors.values())} errors")
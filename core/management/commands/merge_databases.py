@@ -0,0 +1,320 @@
+import sqlite3
+import time
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core import feed, rollups, summaries
+from core.db import keep_timestamps
+from core.etags import DOCTORS, profile_version
+from core.models import (
+    Appointment, DoctorProfile, Issue, Medication, Notification, PatientProfile, ResearchPost, ScientistProfile,
+    UserProfile,
+)
+from core.versions import bump
+
+# Role-specific details, merged from their own tables or, for sources from
+# before those existed, from the same columns on core_userprofile
+PROFILE_DETAILS = [
+    (DoctorProfile, UserProfile.Role.DOCTOR),
+    (ScientistProfile, UserProfile.Role.SCIENTIST),
+    (PatientProfile, UserProfile.Role.PATIENT),
+]
+
+# Tables that hang off UserProfile, with the columns that point at it
+PROFILE_CHILDREN = [
+    (Appointment, ['patient_id', 'doctor_id']),
+    (Issue, ['patient_id']),
+    (Medication, ['patient_id']),
+    (Notification, ['user_profile_id']),
+    (ResearchPost, ['scientist_id']),
+]
+
+# Older schemas stored roles and appointment statuses as text
+LEGACY_CODES = {
+    **{label.lower(): code for code, label in UserProfile.Role.choices},
+    'researcher': UserProfile.Role.SCIENTIST,
+    **{label.lower(): code for code, label in Appointment.Status.choices},
+}
+
+
+class Command(BaseCommand):
+    help = ("Merge the users, profiles and core tables of one or more SQLite files into the "
+            "configured database, deduplicating users by email and remapping foreign keys. "
+            "Only users and profiles are deduplicated, so merge each source once.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', help="SQLite files, e.g. db.sqlite3 Clinical.sqlite3 newuser.sqlite3")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.touched_profiles = set()
+        for path in options['sources']:
+            try:
+                conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            except sqlite3.OperationalError as e:
+                raise CommandError(f"Cannot open {path}: {e}")
+            self.stdout.write(f"Merging {path}")
+            try:
+                self.merge_source(conn)
+            finally:
+                conn.close()
+        # bulk_create skips the signals that keep PatientSummary and the
+        # cohort rollups current
+        self.stdout.write(f"Rebuilt {summaries.rebuild()} patient summaries")
+        self.stdout.write(f"Rebuilt {rollups.rebuild()} cohort rollup rows")
+        # Nor do the cached feed pages and dashboard ETags notice the new rows
+        feed.invalidate()
+        bump(DOCTORS, *(profile_version(profile_id) for profile_id in self.touched_profiles))
+
+    def merge_source(self, conn):
+        # source id -> target id; only ids are kept in memory, rows are streamed
+        user_map = self.timed(User, lambda: self.merge_users(conn))
+        profile_map = self.timed(UserProfile, lambda: self.merge_profiles(conn, user_map))
+        self.touched_profiles.update(profile_map.values())
+        for model, role in PROFILE_DETAILS:
+            self.timed(model, lambda: self.merge_details(conn, model, role, profile_map))
+        for model, fk_columns in PROFILE_CHILDREN:
+            with keep_timestamps(model):
+                self.timed(model, lambda: self.merge_children(conn, model, fk_columns, profile_map))
+
+    def timed(self, model, merge):
+        start = time.perf_counter()
+        result = merge()
+        stats = self.stats
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        self.stdout.write(
+            f"  {model._meta.db_table}: {stats['read']} read, {stats['created']} created, "
+            f"{stats['merged']} merged, {stats['skipped']} skipped ({stats['read'] / elapsed:,.0f} rows/s)"
+        )
+        return result
+
+    def read_batches(self, conn, model):
+        """Yield lists of row dicts for the model's table, keyed by attname.
+
+        Only columns that exist in both the source table and the current
+        model are read, so older schemas (e.g. Issue.doctor_id) still merge.
+        """
+        table = model._meta.db_table
+        self.stats = {'read': 0, 'created': 0, 'merged': 0, 'skipped': 0}
+        source_columns = self.table_columns(conn, table)
+        if not source_columns:
+            return
+        fields = [f for f in model._meta.concrete_fields if f.column in source_columns]
+        columns = ', '.join(f'"{f.column}"' for f in fields)
+        cursor = conn.execute(f'SELECT {columns} FROM "{table}" ORDER BY "{model._meta.pk.column}"')
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            self.stats['read'] += len(rows)
+            yield [
+                {f.attname: self.convert(f, value) for f, value in zip(fields, row)}
+                for row in rows
+            ]
+
+    @staticmethod
+    def table_columns(conn, table):
+        return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+    @staticmethod
+    def convert(field, value):
+        if value is None or not isinstance(value, str):
+            return value
+        if field.choices and isinstance(field, models.IntegerField):
+            value = LEGACY_CODES.get(value.strip().lower())
+            if value is None and field.has_default():
+                value = field.get_default()
+        elif isinstance(field, models.DateTimeField):
+            value = parse_datetime(value)
+            if value is not None and timezone.is_naive(value):
+                value = timezone.make_aware(value, dt_timezone.utc)
+        elif isinstance(field, models.DateField):
+            value = parse_date(value)
+        return value
+
+    def merge_users(self, conn):
+        """Map source users onto target users by email, case-insensitively.
+
+        Users without an email on either side are matched by username. A
+        username that is already taken by a user with a different (or no)
+        email is reported as a conflict and the source user is skipped, along
+        with everything that belongs to it.
+        """
+        user_map = {}
+        for batch in self.read_batches(conn, User):
+            with transaction.atomic():
+                # Target users this batch could collide with, by email or by username
+                emails = {self.user_email(row) for row in batch} - {''}
+                by_email, by_username = {}, {}
+                for user_id, email, username in User.objects.annotate(email_lower=Lower('email')).filter(
+                    models.Q(email_lower__in=emails) | models.Q(username__in=[row['username'] for row in batch])
+                ).order_by('id').values_list('id', 'email', 'username'):
+                    email = (email or '').strip().lower()
+                    if email:
+                        by_email.setdefault(email, user_id)
+                    by_username[username] = (user_id, email)
+
+                new_users = {}
+                new_usernames = {}
+                for row in batch:
+                    email = self.user_email(row)
+                    key = email or f"username:{row['username']}"
+                    taken = by_username.get(row['username'])
+                    if email and email in by_email:
+                        user_map[row['id']] = by_email[email]
+                        self.stats['merged'] += 1
+                    elif taken and not email and not taken[1]:
+                        user_map[row['id']] = taken[0]
+                        self.stats['merged'] += 1
+                    elif key in new_users:
+                        # Same email twice in one source: fold into the first row
+                        new_users[key][1].append(row['id'])
+                        self.stats['merged'] += 1
+                    elif taken or row['username'] in new_usernames:
+                        other = taken[1] if taken else new_usernames[row['username']]
+                        self.stderr.write(
+                            f"  Skipping user {row['id']} ({row['username']!r}, {email or 'no email'}): the "
+                            f"username belongs to a user with {other or 'no email'}"
+                        )
+                        self.stats['skipped'] += 1
+                    else:
+                        new_users[key] = (row, [row['id']])
+                        new_usernames[row['username']] = email
+
+                created = User.objects.bulk_create(
+                    [User(**{k: v for k, v in row.items() if k != 'id'}) for row, _ in new_users.values()]
+                )
+                for user, (_, source_ids) in zip(created, new_users.values()):
+                    for source_id in source_ids:
+                        user_map[source_id] = user.id
+                self.stats['created'] += len(created)
+        return user_map
+
+    @staticmethod
+    def user_email(row):
+        return (row.get('email') or '').strip().lower()
+
+    def merge_profiles(self, conn, user_map):
+        profile_map = {}
+        for batch in self.read_batches(conn, UserProfile):
+            with transaction.atomic():
+                target_users = {user_map.get(row['user_id']) for row in batch} - {None}
+                existing = dict(UserProfile.objects.filter(user_id__in=target_users).values_list('user_id', 'id'))
+
+                # user_id -> (new profile, source profile ids) for users without one yet
+                new_profiles = {}
+                for row in batch:
+                    user_id = user_map.get(row['user_id'])
+                    if user_id is None or row.get('role') is None:
+                        self.stats['skipped'] += 1
+                    elif user_id in existing:
+                        profile_map[row['id']] = existing[user_id]
+                        self.stats['merged'] += 1
+                    elif user_id in new_profiles:
+                        new_profiles[user_id][1].append(row['id'])
+                        self.stats['merged'] += 1
+                    else:
+                        fields = {k: v for k, v in row.items() if k != 'id'}
+                        fields['user_id'] = user_id
+                        new_profiles[user_id] = (UserProfile(**fields), [row['id']])
+
+                created = UserProfile.objects.bulk_create([profile for profile, _ in new_profiles.values()])
+                for profile, (_, source_ids) in zip(created, new_profiles.values()):
+                    for source_id in source_ids:
+                        profile_map[source_id] = profile.id
+                self.stats['created'] += len(created)
+        return profile_map
+
+    def read_legacy_details(self, conn, model, role):
+        """``read_batches`` for ``model``, from the role-specific columns of an older core_userprofile."""
+        self.stats = {'read': 0, 'created': 0, 'merged': 0, 'skipped': 0}
+        table = UserProfile._meta.db_table
+        source_columns = self.table_columns(conn, table)
+        fields = [f for f in model._meta.concrete_fields if not f.primary_key and f.column in source_columns]
+        if not fields:
+            return
+        role_field = UserProfile._meta.get_field('role')
+        columns = ', '.join(f'"{f.column}"' for f in fields)
+        cursor = conn.execute(f'SELECT id, role, {columns} FROM "{table}" ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            self.stats['read'] += len(rows)
+            yield [
+                {'profile_id': row[0], **{f.attname: self.convert(f, value) for f, value in zip(fields, row[2:])}}
+                for row in rows if self.convert(role_field, row[1]) == role
+            ]
+
+    def merge_details(self, conn, model, role, profile_map):
+        if self.table_columns(conn, model._meta.db_table):
+            batches = self.read_batches(conn, model)
+        else:
+            batches = self.read_legacy_details(conn, model, role)
+        for batch in batches:
+            objects = {}
+            for row in batch:
+                target = profile_map.get(row['profile_id'])
+                if target is None:
+                    self.stats['skipped'] += 1
+                elif target in objects:
+                    self.stats['merged'] += 1
+                else:
+                    objects[target] = model(**{**row, 'profile_id': target})
+            with transaction.atomic():
+                # A profile merged into an existing one keeps the existing details
+                existing = set(model.objects.filter(pk__in=objects).values_list('pk', flat=True))
+                model.objects.bulk_create(
+                    [obj for target, obj in objects.items() if target not in existing], ignore_conflicts=True
+                )
+            self.stats['created'] += len(objects) - len(existing)
+            self.stats['merged'] += len(existing)
+
+    def merge_children(self, conn, model, fk_columns, profile_map):
+        for batch in self.read_batches(conn, model):
+            objects = []
+            for row in batch:
+                targets = [profile_map.get(row.get(column)) for column in fk_columns]
+                if None in targets:
+                    self.stats['skipped'] += 1
+                    continue
+                fields = {k: v for k, v in row.items() if k != 'id'}
+                fields.update(zip(fk_columns, targets))
+                objects.append(model(**fields))
+            with transaction.atomic():
+                if model is Appointment:
+                    self.release_taken_slots(objects)
+                model.objects.bulk_create(objects)
+            self.stats['created'] += len(objects)
+
+    def release_taken_slots(self, appointments):
+        """Clear slot_start on live appointments whose doctor already has that slot booked.
+
+        They are kept, as free-form appointments at the same time, and
+        reported so the double booking can be sorted out by hand.
+        """
+        live = [a for a in appointments if a.slot_start is not None and a.status != Appointment.Status.CANCELLED]
+        if not live:
+            return
+        taken = set(
+            Appointment.objects.filter(
+                doctor_id__in={a.doctor_id for a in live}, slot_start__in={a.slot_start for a in live},
+            ).exclude(status=Appointment.Status.CANCELLED).values_list('doctor_id', 'slot_start')
+        )
+        for appointment in live:
+            slot = (appointment.doctor_id, appointment.slot_start)
+            if slot in taken:
+                self.stderr.write(
+                    f"  Appointment of patient {appointment.patient_id} with doctor {appointment.doctor_id} "
+                    f"at {appointment.slot_start.isoformat()}: slot already booked, kept without a slot"
+                )
+                appointment.slot_start = None
+            else:
+                taken.add(slot)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import summaries
+
+
+class Command(BaseCommand):
+    help = ("Recompute the PatientSummary read model for every patient, e.g. after "
+            "merge_databases or any other bulk import that bypasses model signals.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = summaries.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} patient summaries in {time.perf_counter() - start:.2f}s"
+        ))
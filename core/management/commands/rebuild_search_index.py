@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 search indexes over research posts and issue descriptions."
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The FTS5 search index only exists on SQLite.")
+        start = time.perf_counter()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt in {time.perf_counter() - start:.2f}s"))
@@ -0,0 +1,286 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core import feed, rollups, summaries
+from core.db import keep_timestamps
+from core.etags import DOCTORS
+from core.models import (
+    Appointment, DoctorProfile, Issue, Medication, Notification, PatientProfile, ResearchPost, ScientistProfile,
+    UserProfile,
+)
+from core.versions import bump
+
+SPECIALIZATIONS = ['cardiology', 'dermatology', 'neurology', 'oncology', 'pediatrics',
+                   'orthopedics', 'psychiatry', 'endocrinology', 'gastroenterology', 'pulmonology']
+SYMPTOMS = ['chest pain', 'skin rash', 'headache', 'persistent cough', 'joint pain', 'fatigue',
+            'high fever', 'stomach pain', 'dizziness', 'shortness of breath', 'blurred vision']
+MEDICATIONS = ['Amoxicillin', 'Atorvastatin', 'Metformin', 'Lisinopril', 'Omeprazole',
+               'Amlodipine', 'Levothyroxine', 'Ibuprofen', 'Cetirizine', 'Salbutamol']
+FREQUENCIES = ['once daily', 'twice daily', 'three times daily', 'as needed', 'weekly']
+RESEARCH_AREAS = ['genomics', 'immunology', 'pharmacology', 'epidemiology', 'bioinformatics']
+REPORT_FILES = 10
+
+
+def parse_weights(value, names):
+    """'Scheduled=0.6,Accepted=0.3,Cancelled=0.1' -> normalised probabilities in ``names`` order."""
+    weights = dict.fromkeys(names, 0.0)
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in weights:
+            raise CommandError(f"Unknown name '{name.strip()}' in '{value}'")
+        weights[name.strip()] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise CommandError(f"Weights in '{value}' must add up to more than zero")
+    return [weights[name] / total for name in names]
+
+
+def dummy_pdf(text):
+    """A minimal one-page PDF containing ``text``."""
+    stream = f"BT /F1 18 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class Command(BaseCommand):
+    help = ("Seed doctors, patients and scientists with appointments, issues (some with dummy "
+            "PDF reports), medications, research posts and notifications for scale testing. "
+            "Rows are written with batched bulk_create; per-patient counts are Poisson "
+            "distributed and doctor popularity follows a tunable Zipf skew.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--patients', type=int, default=1000)
+        parser.add_argument('--scientists', type=int, default=20)
+        parser.add_argument('--appointments-per-patient', type=float, default=3, help="Poisson mean")
+        parser.add_argument('--issues-per-patient', type=float, default=2, help="Poisson mean")
+        parser.add_argument('--medications-per-patient', type=float, default=2, help="Poisson mean")
+        parser.add_argument('--posts-per-scientist', type=float, default=10, help="Poisson mean")
+        parser.add_argument('--notifications-per-user', type=float, default=5, help="Poisson mean")
+        parser.add_argument('--doctor-skew', type=float, default=1.0,
+                            help="Zipf exponent for picking a patient's doctors; 0 is uniform")
+        parser.add_argument('--status-weights', default='Scheduled=0.6,Accepted=0.3,Cancelled=0.1')
+        parser.add_argument('--report-fraction', type=float, default=0.2, help="issues with a PDF report")
+        parser.add_argument('--read-fraction', type=float, default=0.5, help="notifications already read")
+        parser.add_argument('--days', type=int, default=60, help="appointments span this many days around today")
+        parser.add_argument('--prefix', default='seed', help="usernames are <prefix>-<role>-<n>@example.com")
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Users with the prefix '{prefix}-' already exist; pick another --prefix.")
+        started = time.perf_counter()
+
+        Role = UserProfile.Role
+        doctors = self.step('doctors', lambda: self.create_profiles(Role.DOCTOR, options['doctors']))
+        patients = self.step('patients', lambda: self.create_profiles(Role.PATIENT, options['patients']))
+        scientists = self.step('scientists', lambda: self.create_profiles(Role.SCIENTIST, options['scientists']))
+        if patients and not doctors:
+            raise CommandError("Patients need at least one doctor for their appointments.")
+
+        self.step('appointments', lambda: self.create_appointments(doctors, patients))
+        self.step('issues', lambda: self.create_issues(patients))
+        self.step('medications', lambda: self.create_medications(patients))
+        self.step('research posts', lambda: self.create_posts(scientists))
+        self.step('notifications', lambda: self.create_notifications(doctors + patients + scientists))
+
+        # bulk_create bypasses the signals that maintain these (the search
+        # index is kept by triggers, so it is already up to date)
+        self.step('patient summaries', summaries.rebuild)
+        self.step('cohort rollups', rollups.rebuild)
+        feed.invalidate()
+        bump(DOCTORS)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded in {time.perf_counter() - started:.1f}s; sign in as "
+            f"{prefix}-<role>-0@example.com with password '{options['password']}'"
+        ))
+
+    def step(self, label, build):
+        started = time.perf_counter()
+        result = build()
+        count = len(result) if isinstance(result, list) else result
+        self.stdout.write(f"  {label}: {count} in {time.perf_counter() - started:.2f}s")
+        return result
+
+    def bulk_create(self, model, objects):
+        """Insert in batches, one transaction per batch; returns the number of rows."""
+        created = 0
+        with keep_timestamps(model):
+            for start in range(0, len(objects), self.batch_size):
+                with transaction.atomic():
+                    model.objects.bulk_create(objects[start:start + self.batch_size])
+                created += len(objects[start:start + self.batch_size])
+        return created
+
+    def poisson(self, mean, size):
+        return self.rng.poisson(mean, size) if size else np.array([], dtype=int)
+
+    def past(self, days=365):
+        return self.now - timedelta(seconds=int(self.rng.integers(0, days * 86400)))
+
+    def create_profiles(self, role, count):
+        """Returns the new profile ids, in order."""
+        prefix = f"{self.options['prefix']}-{role.slug}"
+        title = role.label
+        password = make_password(self.options['password'])  # hash once, not per user
+        users = [
+            User(username=f'{prefix}-{i}@example.com', email=f'{prefix}-{i}@example.com',
+                 first_name=title, last_name=str(i), password=password)
+            for i in range(count)
+        ]
+        self.bulk_create(User, users)
+        user_ids = dict(User.objects.filter(username__startswith=f'{prefix}-').values_list('username', 'id'))
+
+        self.bulk_create(UserProfile, [
+            UserProfile(user_id=user_ids[user.username], role=role, full_name=f'{title} {i}')
+            for i, user in enumerate(users)
+        ])
+        profile_ids = dict(UserProfile.objects.filter(user__username__startswith=f'{prefix}-')
+                           .values_list('user__username', 'id'))
+        ids = [profile_ids[user.username] for user in users]
+
+        if role == UserProfile.Role.DOCTOR:
+            model = DoctorProfile
+            details = [
+                DoctorProfile(profile_id=profile_id, license_number=f'LIC{i:06d}',
+                              specialization=SPECIALIZATIONS[i % len(SPECIALIZATIONS)], hospital=f'Hospital {i % 7}')
+                for i, profile_id in enumerate(ids)
+            ]
+        elif role == UserProfile.Role.SCIENTIST:
+            model = ScientistProfile
+            details = [
+                ScientistProfile(profile_id=profile_id, research_area=RESEARCH_AREAS[i % len(RESEARCH_AREAS)],
+                                 institution=f'Institute {i % 5}')
+                for i, profile_id in enumerate(ids)
+            ]
+        else:
+            model = PatientProfile
+            details = [
+                PatientProfile(profile_id=profile_id, gender=['male', 'female', 'other'][int(self.rng.integers(0, 3))],
+                               age=int(self.rng.integers(1, 95)), address=f'{i} Seed Street',
+                               medical_history='None recorded')
+                for i, profile_id in enumerate(ids)
+            ]
+        self.bulk_create(model, details)
+        return ids
+
+    def create_appointments(self, doctors, patients):
+        statuses = parse_weights(self.options['status_weights'], Appointment.Status.labels)
+        ranks = np.arange(1, len(doctors) + 1)
+        popularity = 1.0 / ranks ** self.options['doctor_skew']
+        popularity /= popularity.sum()
+        days = self.options['days']
+
+        taken = set()
+        appointments = []
+        for patient_id, count in zip(patients, self.poisson(self.options['appointments_per_patient'], len(patients))):
+            for _ in range(count):
+                doctor_id = doctors[self.rng.choice(len(doctors), p=popularity)]
+                # A half-hour slot in working hours (9:00-17:00) within +/- days/2 of today
+                for _attempt in range(10):
+                    day = (self.now + timedelta(days=int(self.rng.integers(-days // 2, days // 2 + 1)))).date()
+                    slot = timezone.make_aware(datetime.combine(day, datetime.min.time())) \
+                        + timedelta(hours=9, minutes=30 * int(self.rng.integers(0, 16)))
+                    if (doctor_id, slot) not in taken:
+                        break
+                else:
+                    continue
+                status = Appointment.Status.values[self.rng.choice(len(statuses), p=statuses)]
+                if status != Appointment.Status.CANCELLED:
+                    taken.add((doctor_id, slot))
+                appointments.append(Appointment(patient_id=patient_id, doctor_id=doctor_id, appointment_date=slot,
+                                                slot_start=slot, status=status))
+        return self.bulk_create(Appointment, appointments)
+
+    def create_issues(self, patients):
+        reports = [
+            default_storage.save(f'reports/{self.options["prefix"]}_report_{i}.pdf',
+                                 ContentFile(dummy_pdf(f'Seed lab report {i}')))
+            for i in range(REPORT_FILES)
+        ] if self.options['report_fraction'] > 0 else []
+        issues = []
+        for patient_id, count in zip(patients, self.poisson(self.options['issues_per_patient'], len(patients))):
+            for _ in range(count):
+                # Half the time the description names a specialization, so the
+                # patient dashboard's doctor matching has something to find
+                if self.rng.random() < 0.5:
+                    description = SPECIALIZATIONS[int(self.rng.integers(0, len(SPECIALIZATIONS)))]
+                else:
+                    description = ', '.join(self.rng.choice(SYMPTOMS, size=int(self.rng.integers(1, 4)), replace=False))
+                report = reports[int(self.rng.integers(0, len(reports)))] \
+                    if reports and self.rng.random() < self.options['report_fraction'] else None
+                issues.append(Issue(patient_id=patient_id, description=description, report=report,
+                                    created_at=self.past()))
+        return self.bulk_create(Issue, issues)
+
+    def create_medications(self, patients):
+        medications = [
+            Medication(
+                patient_id=patient_id,
+                name=MEDICATIONS[int(self.rng.integers(0, len(MEDICATIONS)))],
+                dosage=f'{int(self.rng.choice([5, 10, 20, 50, 100, 250, 500]))} mg',
+                frequency=FREQUENCIES[int(self.rng.integers(0, len(FREQUENCIES)))],
+                instructions='Take with water.',
+            )
+            for patient_id, count in zip(patients, self.poisson(self.options['medications_per_patient'], len(patients)))
+            for _ in range(count)
+        ]
+        return self.bulk_create(Medication, medications)
+
+    def create_posts(self, scientists):
+        posts = [
+            ResearchPost(
+                scientist_id=scientist_id,
+                title=f'{RESEARCH_AREAS[int(self.rng.integers(0, len(RESEARCH_AREAS)))].title()} update {n}',
+                content=' '.join(self.rng.choice(SYMPTOMS + SPECIALIZATIONS, size=40)),
+                created_at=self.past(),
+            )
+            for scientist_id, count in zip(scientists, self.poisson(self.options['posts_per_scientist'], len(scientists)))
+            for n in range(count)
+        ]
+        return self.bulk_create(ResearchPost, posts)
+
+    def create_notifications(self, profiles):
+        notifications = [
+            Notification(
+                user_profile_id=profile_id,
+                message=f'Seed notification {n}',
+                is_read=bool(self.rng.random() < self.options['read_fraction']),
+                created_at=self.past(30),
+            )
+            for profile_id, count in zip(profiles, self.poisson(self.options['notifications_per_user'], len(profiles)))
+            for n in range(count)
+        ]
+        return self.bulk_create(Notification, notifications)
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas, sqlite_pragmas
+
+
+def _worker(path, pragmas, immediate, timeout, seconds, results):
+    """Run read-then-write transactions, like a view creating a Notification."""
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    apply_sqlite_pragmas(conn.cursor(), pragmas)
+    ok = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            conn.execute('SELECT COUNT(*) FROM stress WHERE worker = ?', (os.getpid(),)).fetchone()
+            conn.execute('INSERT INTO stress (worker, payload) VALUES (?, ?)', (os.getpid(), 'x' * 200))
+            conn.execute('COMMIT')
+            ok += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            locked += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+    results.put((ok, locked))
+
+
+class Command(BaseCommand):
+    help = ("Hammer a scratch SQLite file from several processes and count 'database is locked' "
+            "errors, with the configured pragmas or (--baseline) Django's defaults.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--baseline', action='store_true',
+                            help="rollback journal, deferred BEGIN and a 5s driver timeout")
+
+    def handle(self, *args, **options):
+        db_options = settings.DATABASES['default'].get('OPTIONS', {})
+        if options['baseline']:
+            pragmas, immediate, timeout = {}, False, 5
+        else:
+            pragmas = sqlite_pragmas() or DEFAULT_SQLITE_PRAGMAS
+            immediate = db_options.get('transaction_mode', 'IMMEDIATE') == 'IMMEDIATE'
+            timeout = db_options.get('timeout', 5)  # busy_timeout in pragmas wins
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stress.sqlite3')
+            conn = sqlite3.connect(path)
+            apply_sqlite_pragmas(conn.cursor(), pragmas)
+            conn.execute('CREATE TABLE stress (id INTEGER PRIMARY KEY, worker INTEGER, payload TEXT)')
+            conn.execute('CREATE INDEX stress_worker ON stress (worker)')
+            conn.commit()
+            conn.close()
+
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=_worker, args=(
+                    path, pragmas, immediate, timeout, options['seconds'], results))
+                for _ in range(options['workers'])
+            ]
+            for process in processes:
+                process.start()
+            totals = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+
+        ok = sum(t[0] for t in totals)
+        locked = sum(t[1] for t in totals)
+        self.stdout.write(
+            f"{'baseline' if options['baseline'] else 'tuned'}: {options['workers']} workers, "
+            f"{ok} commits ({ok / options['seconds']:.0f}/s), {locked} lock errors"
+        )
+        if locked and not options['baseline']:
+            self.stderr.write(self.style.ERROR("Lock errors with the tuned configuration"))
@@ -0,0 +1,124 @@
+import asyncio
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core import events
+from core.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = ("Open N idle event streams against the ASGI application in-process, then "
+            "publish events and report per-connection memory and fan-out latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--events', type=int, default=20)
+        parser.add_argument('--email', help="user to connect as (default: the first doctor)")
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def handle(self, *args, **options):
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+        else:
+            profile = UserProfile.objects.filter(role=UserProfile.Role.DOCTOR).select_related('user').first()
+            user = profile.user if profile else None
+        if user is None:
+            raise CommandError("No user to connect as; pass --email or create a doctor.")
+
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        profile_id = UserProfile.objects.get(user=user).id
+        asyncio.run(self.soak(cookie, profile_id, options))
+
+    async def soak(self, cookie, profile_id, options):
+        app = get_asgi_application()
+        broker = events.get_broker()
+        channel = events.profile_channel(profile_id)
+        n = options['connections']
+        baseline = broker.subscriber_count(channel)
+        # event id -> arrival times, one per connection
+        arrivals = {}
+        disconnect = asyncio.Event()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': reverse('core:event_stream'),
+            'raw_path': reverse('core:event_stream').encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode()), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        statuses = []
+
+        async def connection():
+            sent_request = False
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif message['type'] == 'http.response.body':
+                    for line in message.get('body', b'').decode().splitlines():
+                        if line.startswith('id: '):
+                            arrivals.setdefault(int(line[4:]), []).append(time.perf_counter())
+
+            await app(dict(scope), receive, send)
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(connection()) for _ in range(n)]
+        while broker.subscriber_count(channel) - baseline < n:
+            if time.perf_counter() - start > options['timeout']:
+                raise CommandError(f"Only {broker.subscriber_count(channel) - baseline} of {n} streams connected"
+                                   f" (statuses: {sorted(set(statuses))})")
+            await asyncio.sleep(0.05)
+        connect_seconds = time.perf_counter() - start
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(f"{n} streams open in {connect_seconds:.2f}s, "
+                          f"~{(after - before) / n / 1024:.1f} KiB traced memory per stream")
+
+        # Publish from a worker thread, as the sync views' on_commit hooks do
+        loop = asyncio.get_running_loop()
+        latencies = []
+        for _ in range(options['events']):
+            published = time.perf_counter()
+            await loop.run_in_executor(None, broker.publish, channel, 'notification', {'message': 'soak'})
+            deadline = published + options['timeout']
+            while not any(len(times) >= n for times in arrivals.values()):
+                if time.perf_counter() > deadline:
+                    raise CommandError("An event did not reach every stream before the timeout")
+                await asyncio.sleep(0.001)
+            latencies.append(max(max(times) for times in arrivals.values()) - published)
+            arrivals.clear()
+
+        latencies = np.array(latencies) * 1000
+        self.stdout.write(f"fan-out to {n} streams: p50={np.percentile(latencies, 50):.1f}ms "
+                          f"p99={np.percentile(latencies, 99):.1f}ms")
+
+        disconnect.set()
+        await asyncio.wait_for(asyncio.gather(*tasks), options['timeout'])
+        left = broker.subscriber_count(channel) - baseline
+        self.stdout.write(self.style.SUCCESS(f"All streams closed, {left} subscriptions left behind"))
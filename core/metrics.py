@@ -0,0 +1,259 @@
+import contextvars
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.template.backends.django import Template
+
+# Per-request timings for the core views, kept in memory and served by
+# views.metrics as JSON (staff) or Prometheus text. Add
+# 'core.metrics.MetricsMiddleware' at the top of MIDDLEWARE and set
+# METRICS_ENABLED = True; while it is off the middleware removes itself at
+# startup and nothing below is hooked in.
+#
+# Each worker process keeps its own buffer of the last METRICS_BUFFER_SIZE
+# requests, so percentiles are per process and over a recent window.
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', False)
+METRICS_BUFFER_SIZE = getattr(settings, 'METRICS_BUFFER_SIZE', 10000)
+# Lets a Prometheus scraper read the endpoint with "Authorization: Bearer <token>"
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', None)
+QUANTILES = (0.5, 0.95, 0.99)
+MEASURES = ('duration', 'queries', 'query_time', 'template_time', 'size')
+
+Sample = namedtuple('Sample', 'view method status duration queries query_time template_time size')
+
+
+class _Timings:
+    __slots__ = ('queries', 'query_time', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+
+
+# The timings of the request being served. A context variable rather than a
+# thread local so queries made on sync_to_async threads for an async view
+# are still counted against it.
+_current = contextvars.ContextVar('core_metrics_timings', default=None)
+
+
+class RingBuffer:
+    """The last ``size`` samples, plus running totals per view since startup.
+
+    ``append`` is safe from any thread.
+    """
+
+    def __init__(self, size=METRICS_BUFFER_SIZE):
+        self._samples = deque(maxlen=size)
+        self._totals = {}  # view -> [count, sum of each measure...]
+        self._lock = threading.Lock()
+
+    def append(self, sample):
+        with self._lock:
+            self._samples.append(sample)
+            totals = self._totals.setdefault(sample.view, [0] * (len(MEASURES) + 1))
+            totals[0] += 1
+            for i, measure in enumerate(MEASURES, start=1):
+                totals[i] += getattr(sample, measure)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._samples)
+
+    def totals(self):
+        """{view: {'count': n, <measure>: sum, ...}}; only ever grows, as Prometheus expects."""
+        with self._lock:
+            return {
+                view: {'count': totals[0], **dict(zip(MEASURES, totals[1:]))}
+                for view, totals in self._totals.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+
+buffer = RingBuffer()
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.query_time += time.perf_counter() - began
+
+
+def _install_query_wrappers(**kwargs):
+    # The same hook connection.execute_wrapper() installs, but left in place
+    # on this thread's connections. request_started is sent on the thread the
+    # ORM runs on (the sync_to_async thread under ASGI), which a with-block
+    # around get_response could not reach for async views.
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if _record_query not in wrappers:
+            wrappers.append(_record_query)
+
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return render(self, context, request)
+        began = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            timings.template_time += time.perf_counter() - began
+    wrapper.core_metrics = True
+    return wrapper
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install():
+    """Hook query and template timing in; idempotent."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        request_started.connect(_install_query_wrappers, dispatch_uid='core_metrics_queries')
+        # render() and render_to_string() both go through the backend's
+        # Template.render, once per top-level template ({% include %}s are
+        # rendered inside it)
+        if not getattr(Template.render, 'core_metrics', False):
+            Template.render = _timed_render(Template.render)
+        _installed = True
+
+
+class MetricsMiddleware:
+    """Record view name, wall time, queries, query time, template time and size per request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = _Timings()
+        token = _current.set(timings)
+        began = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, timings, time.perf_counter() - began)
+        return response
+
+    async def __acall__(self, request):
+        timings = _Timings()
+        token = _current.set(timings)
+        began = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, timings, time.perf_counter() - began)
+        return response
+
+    @staticmethod
+    def record(request, response, timings, duration):
+        match = getattr(request, 'resolver_match', None)
+        # Streaming responses (the event stream) are timed to their headers
+        # only and have no size
+        size = 0 if response.streaming else len(response.content)
+        buffer.append(Sample(
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            status=response.status_code,
+            duration=duration,
+            queries=timings.queries,
+            query_time=timings.query_time,
+            template_time=timings.template_time,
+            size=size,
+        ))
+
+
+def summarize(samples=None):
+    """Per-view request counts, errors and quantiles of each measure, busiest view first."""
+    samples = buffer.snapshot() if samples is None else samples
+    by_view = {}
+    for sample in samples:
+        by_view.setdefault(sample.view, []).append(sample)
+
+    report = []
+    for view, rows in by_view.items():
+        columns = np.array([[getattr(s, measure) for measure in MEASURES] for s in rows])
+        entry = {
+            'view': view,
+            'count': len(rows),
+            'errors': sum(1 for s in rows if s.status >= 500),
+        }
+        for i, measure in enumerate(MEASURES):
+            values = columns[:, i]
+            entry[measure] = {
+                'sum': float(values.sum()),
+                'mean': float(values.mean()),
+                'max': float(values.max()),
+                **{f'p{round(q * 100)}': float(v) for q, v in zip(QUANTILES, np.quantile(values, QUANTILES))},
+            }
+        report.append(entry)
+    report.sort(key=lambda entry: -entry['count'])
+    return report
+
+
+# (metric name, measure in summarize(), help text)
+PROMETHEUS_SUMMARIES = [
+    ('core_request_duration_seconds', 'duration', 'Wall time of the request in the Django stack.'),
+    ('core_request_db_queries', 'queries', 'SQL queries per request.'),
+    ('core_request_db_seconds', 'query_time', 'Time spent in SQL queries per request.'),
+    ('core_request_template_seconds', 'template_time', 'Time spent rendering templates per request.'),
+    ('core_response_size_bytes', 'size', 'Response body size (0 for streaming responses).'),
+]
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus():
+    """The buffer in the Prometheus text exposition format: one summary per view.
+
+    Quantiles cover the buffered window; _sum and _count are totals since
+    the process started.
+    """
+    report = {entry['view']: entry for entry in summarize()}
+    totals = buffer.totals()
+    lines = []
+    for name, measure, help_text in PROMETHEUS_SUMMARIES:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} summary']
+        for view, total in sorted(totals.items()):
+            label = _label(view)
+            if view in report:
+                for q in QUANTILES:
+                    value = report[view][measure][f'p{round(q * 100)}']
+                    lines.append(f'{name}{{view="{label}",quantile="{q}"}} {value!r}')
+            lines.append(f'{name}_sum{{view="{label}"}} {float(total[measure])!r}')
+            lines.append(f'{name}_count{{view="{label}"}} {total["count"]}')
+    return '\n'.join(lines) + '\n'
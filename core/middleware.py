@@ -0,0 +1,81 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+
+# Profiles are cached per user id, with their role's details row, so role
+# checks don't hit the database on every request. core.signals drops the
+# entry whenever a profile or its details are saved. Roles gate access, so
+# the cache must be shared by every worker or a role change would only reach
+# the worker that made it; core.E001 (core/checks.py) enforces that.
+PROFILE_CACHE_TIMEOUT = getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300)
+_MISSING = 'missing'
+# One-to-one joins on the primary key; only the profile's own role matches
+DETAILS = ('doctor_profile', 'scientist_profile', 'patient_profile')
+
+
+def profile_cache_key(user_id):
+    # v3: details moved to per-role tables; older pickled entries are ignored
+    return f'core:userprofile:v3:{user_id}'
+
+
+def invalidate_profile(user_id):
+    cache.delete(profile_cache_key(user_id))
+
+
+def get_profile(request):
+    """Return the logged-in user's UserProfile (or None), resolving it at most once per request."""
+    if hasattr(request, '_profile_cache'):
+        return request._profile_cache
+
+    profile = None
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        key = profile_cache_key(user.id)
+        profile = cache.get(key)
+        if profile is None:
+            try:
+                profile = UserProfile.objects.select_related(*DETAILS).get(user_id=user.id)
+            except UserProfile.DoesNotExist:
+                profile = _MISSING
+            cache.set(key, profile, PROFILE_CACHE_TIMEOUT)
+        if profile == _MISSING:
+            profile = None
+        else:
+            # Reuse the already-loaded user instead of the cached copy
+            profile.user = user
+
+    request._profile_cache = profile
+    return profile
+
+
+async def aget_profile(request):
+    """``get_profile`` for async views; the cache and ORM lookups run in a thread."""
+    return await sync_to_async(get_profile)(request)
+
+
+class UserProfileMiddleware:
+    """Expose ``request.profile``, loaded lazily on first access.
+
+    Async-capable, so async views such as the event stream are served on the
+    event loop without a thread hop for this middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
+        return await self.get_response(request)
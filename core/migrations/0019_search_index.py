@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# FTS5 indexes over ResearchPost(title, content) and Issue(description).
+# They are external-content tables (the text is stored only once, in the
+# core tables) kept in sync by triggers, so bulk_create and raw SQL writes
+# are indexed too. Other database backends skip this migration.
+INDEXES = [
+    ('core_researchpost', ['title', 'content']),
+    ('core_issue', ['description']),
+]
+
+
+def create_sql(table, columns):
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='porter unicode61')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(table):
+    fts = f'{table}_fts'
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + \
+        [f'DROP TABLE IF EXISTS {fts}']
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in INDEXES:
+        for statement in create_sql(table, columns):
+            schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, _ in INDEXES:
+        for statement in drop_sql(table):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_auto_20241130_1001'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
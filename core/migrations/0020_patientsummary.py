@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSummary',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.userprofile')),
+                ('issue_count', models.PositiveIntegerField(default=0)),
+                ('medication_count', models.PositiveIntegerField(default=0)),
+                ('appointment_count', models.PositiveIntegerField(default=0)),
+                ('scheduled_count', models.PositiveIntegerField(default=0)),
+                ('latest_issue_preview', models.CharField(blank=True, default='', max_length=255)),
+                ('latest_issue_report', models.CharField(blank=True, default='', max_length=100)),
+                ('latest_issue_at', models.DateTimeField(blank=True, null=True)),
+                ('active_medications', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'appointment_date'], name='core_appt_doctor_date_idx'),
+        ),
+    ]
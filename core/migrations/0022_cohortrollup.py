@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_appointment_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=20)),
+                ('bucket', models.DateField()),
+                ('dimension', models.CharField(blank=True, default='', max_length=255)),
+                ('count', models.IntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric', 'bucket'], name='core_rollup_metric_bucket_idx')],
+            },
+        ),
+    ]
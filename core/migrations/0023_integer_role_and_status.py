@@ -0,0 +1,116 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Role and status strings -> UserProfile.Role / Appointment.Status values.
+# Older rows were written with inconsistent casing, and scientists were
+# sometimes saved as 'researcher'.
+ROLES = {'doctor': 1, 'patient': 2, 'scientist': 3, 'researcher': 3}
+STATUSES = {'scheduled': 1, 'accepted': 2, 'cancelled': 3, 'canceled': 3}
+
+
+def _encode(queryset, column, target, codes):
+    for value in set(queryset.values_list(column, flat=True).distinct()):
+        code = codes.get((value or '').strip().lower())
+        if code is not None:
+            queryset.filter(**{column: value}).update(**{target: code})
+    unknown = sorted(set(queryset.filter(**{f'{target}__isnull': True}).values_list(column, flat=True)), key=str)
+    if unknown:
+        raise ValueError(
+            f"{queryset.model.__name__}.{column} has values with no code: {unknown!r}; "
+            f"fix those rows and migrate again"
+        )
+
+
+def encode(apps, schema_editor):
+    _encode(apps.get_model('core', 'UserProfile').objects.all(), 'role', 'role_code', ROLES)
+    _encode(apps.get_model('core', 'Appointment').objects.all(), 'status', 'status_code', STATUSES)
+
+
+def decode(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    Appointment = apps.get_model('core', 'Appointment')
+    for name, code in [('doctor', 1), ('patient', 2), ('scientist', 3)]:
+        UserProfile.objects.filter(role_code=code).update(role=name)
+    for name, code in [('Scheduled', 1), ('Accepted', 2), ('Cancelled', 3)]:
+        Appointment.objects.filter(status_code=code).update(status=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_cohortrollup'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='core_appt_unique_doctor_slot',
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='role_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        # Nullable while it is dropped, so unapplying can add it back and refill it
+        migrations.AlterField(
+            model_name='userprofile',
+            name='role',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.RunPython(encode, decode),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='role',
+        ),
+        migrations.RemoveField(
+            model_name='appointment',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='userprofile',
+            old_name='role_code',
+            new_name='role',
+        ),
+        migrations.RenameField(
+            model_name='appointment',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='role',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Doctor'), (2, 'Patient'), (3, 'Scientist')]),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Scheduled'), (2, 'Accepted'), (3, 'Cancelled')], default=1),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='patient',
+            field=models.ForeignKey(limit_choices_to={'role': 2}, on_delete=django.db.models.deletion.CASCADE, related_name='issues', to='core.userprofile'),
+        ),
+        migrations.AlterField(
+            model_name='researchpost',
+            name='scientist',
+            field=models.ForeignKey(limit_choices_to={'role': 3}, on_delete=django.db.models.deletion.CASCADE, to='core.userprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role'], name='core_profile_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'status'], name='core_appt_doctor_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 3), _negated=True), fields=('doctor', 'slot_start'), name='core_appt_unique_doctor_slot'),
+        ),
+    ]
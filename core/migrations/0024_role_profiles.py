@@ -0,0 +1,79 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# UserProfile role code -> (details model, its fields)
+DETAILS = {
+    1: ('DoctorProfile', ['license_number', 'specialization', 'hospital']),
+    3: ('ScientistProfile', ['research_area', 'institution']),
+    2: ('PatientProfile', ['gender', 'age', 'address', 'medical_history']),
+}
+BATCH_SIZE = 1000
+
+
+def split(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    for role, (model_name, fields) in DETAILS.items():
+        model = apps.get_model('core', model_name)
+        rows = UserProfile.objects.filter(role=role).order_by('id').values_list('id', *fields)
+        batch = []
+        for profile_id, *values in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(model(profile_id=profile_id, **dict(zip(fields, values))))
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+
+def join(apps, schema_editor):
+    UserProfile = apps.get_model('core', 'UserProfile')
+    for model_name, fields in DETAILS.values():
+        model = apps.get_model('core', model_name)
+        for profile_id, *values in model.objects.values_list('profile_id', *fields).iterator(chunk_size=BATCH_SIZE):
+            UserProfile.objects.filter(id=profile_id).update(**dict(zip(fields, values)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_integer_role_and_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorProfile',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='doctor_profile', serialize=False, to='core.userprofile')),
+                ('license_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('specialization', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('hospital', models.CharField(blank=True, max_length=100, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScientistProfile',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='scientist_profile', serialize=False, to='core.userprofile')),
+                ('research_area', models.CharField(blank=True, max_length=100, null=True)),
+                ('institution', models.CharField(blank=True, max_length=100, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PatientProfile',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='patient_profile', serialize=False, to='core.userprofile')),
+                ('gender', models.CharField(blank=True, max_length=10, null=True)),
+                ('age', models.PositiveIntegerField(blank=True, null=True)),
+                ('address', models.TextField(blank=True, null=True)),
+                ('medical_history', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(split, join),
+        migrations.RemoveField(model_name='userprofile', name='license_number'),
+        migrations.RemoveField(model_name='userprofile', name='specialization'),
+        migrations.RemoveField(model_name='userprofile', name='hospital'),
+        migrations.RemoveField(model_name='userprofile', name='research_area'),
+        migrations.RemoveField(model_name='userprofile', name='institution'),
+        migrations.RemoveField(model_name='userprofile', name='gender'),
+        migrations.RemoveField(model_name='userprofile', name='age'),
+        migrations.RemoveField(model_name='userprofile', name='address'),
+        migrations.RemoveField(model_name='userprofile', name='medical_history'),
+    ]
@@ -1,42 +1,128 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.storage import default_storage
 
 class UserProfile(models.Model):
+    class Role(models.IntegerChoices):
+        DOCTOR = 1, 'Doctor'
+        PATIENT = 2, 'Patient'
+        SCIENTIST = 3, 'Scientist'
+
+        @property
+        def slug(self):
+            """'doctor', 'patient' or 'scientist': the sign-up form value and dashboard URL prefix."""
+            return self.name.lower()
+
+        @classmethod
+        def from_slug(cls, slug):
+            """The role for a slug, or None if ``slug`` names no role."""
+            return cls.__members__.get((slug or '').upper())
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    role = models.CharField(max_length=50)
+    role = models.PositiveSmallIntegerField(choices=Role.choices)
     full_name = models.CharField(max_length=100)
-    
-    # Doctor-specific fields
+
+    # Role-specific fields live in DoctorProfile, ScientistProfile and
+    # PatientProfile (see ``details``)
+
+    class Meta:
+        indexes = [
+            # Doctor lists, patient pickers and the summary/cohort rebuilds filter by role
+            models.Index(fields=['role'], name='core_profile_role_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.get_role_display()}"
+
+    @property
+    def role_slug(self):
+        return self.Role(self.role).slug
+
+    @property
+    def details(self):
+        """This role's DoctorProfile, ScientistProfile or PatientProfile, or None if it has none yet."""
+        try:
+            return getattr(self, f'{self.role_slug}_profile')
+        except ObjectDoesNotExist:
+            return None
+
+
+# Role-specific profile fields, one row per profile of that role. Kept out of
+# UserProfile so profile lookups and joins read narrow rows; select_related
+# the one a view shows (e.g. 'patient__patient_profile').
+class DoctorProfile(models.Model):
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='doctor_profile')
     license_number = models.CharField(max_length=50, blank=True, null=True)
-    specialization = models.CharField(max_length=100, blank=True, null=True)
+    # Patients are matched to doctors by specialization
+    specialization = models.CharField(max_length=100, blank=True, null=True, db_index=True)
     hospital = models.CharField(max_length=100, blank=True, null=True)
-    
-    # Scientist-specific fields
+
+    def __str__(self):
+        return f"Doctor details for profile {self.profile_id}"
+
+
+class ScientistProfile(models.Model):
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='scientist_profile')
     research_area = models.CharField(max_length=100, blank=True, null=True)
     institution = models.CharField(max_length=100, blank=True, null=True)
-    
-    # Patient-specific fields
+
+    def __str__(self):
+        return f"Scientist details for profile {self.profile_id}"
+
+
+class PatientProfile(models.Model):
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='patient_profile')
     gender = models.CharField(max_length=10, blank=True, null=True)
     age = models.PositiveIntegerField(blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     medical_history = models.TextField(blank=True, null=True)
 
     def __str__(self):
-        return f"{self.user.username} - {self.role}"
+        return f"Patient details for profile {self.profile_id}"
+
+# Module level as well as Appointment.Status, so Appointment.Meta can refer to it
+class AppointmentStatus(models.IntegerChoices):
+    SCHEDULED = 1, 'Scheduled'
+    ACCEPTED = 2, 'Accepted'
+    CANCELLED = 3, 'Cancelled'
+
 
 # Appointment Model - Now using UserProfile for both doctor and patient
 class Appointment(models.Model):
+    Status = AppointmentStatus
+
     patient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="appointments_as_patient")
     doctor = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="appointments_as_doctor")
     appointment_date = models.DateTimeField()
-    status = models.CharField(max_length=20, default="Scheduled")
+    status = models.PositiveSmallIntegerField(choices=Status.choices, default=Status.SCHEDULED)
+    # Set for bookings made through core.slots; NULL for free-form legacy rows
+    slot_start = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # doctor_dashboard pages through a doctor's appointments by date
+            models.Index(fields=['doctor', 'appointment_date'], name='core_appt_doctor_date_idx'),
+            # A doctor's pending (Scheduled) appointments
+            models.Index(fields=['doctor', 'status'], name='core_appt_doctor_status_idx'),
+            # A doctor's patients (patient picker, issue search)
+            models.Index(fields=['doctor', 'patient'], name='core_appt_doctor_patient_idx'),
+        ]
+        constraints = [
+            # One live booking per slot; cancelling frees the slot again
+            models.UniqueConstraint(
+                fields=['doctor', 'slot_start'],
+                condition=~models.Q(status=AppointmentStatus.CANCELLED),
+                name='core_appt_unique_doctor_slot',
+            ),
+        ]
 
     def __str__(self):
         return f"Appointment with Dr. {self.doctor.user.first_name} {self.doctor.user.last_name} on {self.appointment_date}"
 
 # Define the Issue model
 class Issue(models.Model):
-    patient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, limit_choices_to={'role': 'patient'}, related_name='issues')
+    patient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, limit_choices_to={'role': UserProfile.Role.PATIENT}, related_name='issues')
     description = models.TextField()
     report = models.FileField(upload_to='reports/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -64,7 +150,7 @@ from .models import UserProfile  # Importing UserProfile model
 
 class ResearchPost(models.Model):
     # Relating to the UserProfile model for scientists
-    scientist = models.ForeignKey(UserProfile, on_delete=models.CASCADE, limit_choices_to={'role': 'Scientist'})
+    scientist = models.ForeignKey(UserProfile, on_delete=models.CASCADE, limit_choices_to={'role': UserProfile.Role.SCIENTIST})
     title = models.CharField(max_length=255)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -83,3 +169,60 @@ class Notification(models.Model):
 
     def __str__(self):
         return f"Notification for {self.user_profile.user.username}: {self.message}"
+
+
+# Denormalized per-patient read model for the doctor dashboard, kept current by
+# core.signals on every Issue / Medication / Appointment write (core/summaries.py)
+class PatientSummary(models.Model):
+    patient = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    issue_count = models.PositiveIntegerField(default=0)
+    medication_count = models.PositiveIntegerField(default=0)
+    appointment_count = models.PositiveIntegerField(default=0)
+    scheduled_count = models.PositiveIntegerField(default=0)
+    latest_issue_preview = models.CharField(max_length=255, blank=True, default='')
+    latest_issue_report = models.CharField(max_length=100, blank=True, default='')
+    latest_issue_at = models.DateTimeField(blank=True, null=True)
+    # [{'name', 'dosage', 'frequency', 'instructions'}, ...], newest first
+    active_medications = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary for profile {self.patient_id}"
+
+    @property
+    def latest_issue_report_url(self):
+        return default_storage.url(self.latest_issue_report) if self.latest_issue_report else ''
+
+
+# Weekly working hours used by core.slots; doctors without rows fall back to
+# settings.DEFAULT_WORKING_HOURS
+class WorkingHours(models.Model):
+    doctor = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='working_hours')
+    weekday = models.PositiveSmallIntegerField()  # 0 = Monday, as datetime.weekday()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+
+    def __str__(self):
+        return f"Profile {self.doctor_id}: day {self.weekday} {self.start_time}-{self.end_time}"
+
+
+# Time-bucketed cohort counters for the scientist dashboard (core/rollups.py).
+# Writes append +1/-1 rows; the compact_rollups command folds them into one
+# row per (metric, bucket, dimension).
+class CohortRollup(models.Model):
+    metric = models.CharField(max_length=20)
+    bucket = models.DateField()  # Monday of the week counted in
+    dimension = models.CharField(max_length=255, blank=True, default='')
+    count = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['metric', 'bucket'], name='core_rollup_metric_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} {self.bucket} {self.dimension}: {self.count}"
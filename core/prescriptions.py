@@ -0,0 +1,49 @@
+from django.db import transaction
+
+from . import rollups, summaries
+from .models import Appointment, Medication, Notification
+from .signals import announce_notification, bump_dashboards
+
+# Bulk prescribing (views.bulk_prescribe): a doctor's whole list of
+# medications, for any number of their patients, is written with one
+# bulk_create, plus one Notification per patient summarizing what they were
+# prescribed. bulk_create skips model signals, so what core.signals would do
+# per row (cohort rollups, patient summaries, dashboard ETags, live
+# notification events) is done here once for the batch.
+MAX_PRESCRIPTION_ITEMS = 100
+# Medication names listed in a patient's notification before "and N more"
+NOTIFICATION_NAMES = 5
+
+
+def notification_message(doctor, names):
+    listed = ', '.join(names[:NOTIFICATION_NAMES])
+    if len(names) > NOTIFICATION_NAMES:
+        listed += f' and {len(names) - NOTIFICATION_NAMES} more'
+    noun = 'medication' if len(names) == 1 else 'medications'
+    message = f"Dr. {doctor.full_name} prescribed {len(names)} {noun}: {listed}"
+    return message[:Notification._meta.get_field('message').max_length]
+
+
+def prescribe(doctor, medications):
+    """Save unsaved Medication objects for ``doctor``'s patients and notify each patient once.
+
+    The caller has checked that every patient is one of the doctor's.
+    Returns the saved medications.
+    """
+    names = {}
+    for medication in medications:
+        names.setdefault(medication.patient_id, []).append(medication.name)
+    with transaction.atomic():
+        medications = Medication.objects.bulk_create(medications)
+        rollups.record_changes(Medication, [(None, rollups.snapshot(Medication, m)) for m in medications])
+        notifications = Notification.objects.bulk_create([
+            Notification(user_profile_id=patient_id, message=notification_message(doctor, patient_names))
+            for patient_id, patient_names in names.items()
+        ])
+        for notification in notifications:
+            announce_notification(notification)
+        summaries.refresh_on_commit(names)
+        # Shown on each patient's dashboard and on each of their doctors'
+        doctors = Appointment.objects.filter(patient_id__in=names).values_list('doctor_id', flat=True).distinct()
+        bump_dashboards([*names, *doctors])
+    return medications
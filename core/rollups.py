@@ -0,0 +1,327 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import archive
+from .cohort import age_band
+from .models import Appointment, CohortRollup, DoctorProfile, Issue, Medication, PatientProfile
+from .versions import bump, get_version
+
+# Cohort analytics for the scientist dashboard, read from CohortRollup rather
+# than from GROUP BYs over the live tables.
+#
+#   issues        bucket = week reported,            dimension ''
+#   medications   bucket = week prescribed/removed,  dimension medication name
+#   appointments  bucket = week of the appointment,  dimension 'specialization|status'
+#   patients      bucket = week the profile changed, dimension 'gender|age band'
+#
+# core.signals turns every Issue / Medication / Appointment / PatientProfile /
+# DoctorProfile write into +1 / -1 rows inside the same transaction, so writers
+# only ever INSERT and never contend on a shared counter row. Reading sums the
+# rows; the compact_rollups command periodically folds them into one row per
+# (metric, bucket, dimension) so the table stays small. ``rebuild`` recomputes
+# everything from the live tables plus the issues and appointments
+# archive_old_rows moved to the sidecar, for the first deploy and after bulk
+# imports that bypass signals.
+ROLLUP_CACHE_TIMEOUT = getattr(settings, 'ROLLUP_CACHE_TIMEOUT', 600)
+ROLLUP_WEEKS = 12
+TOP_MEDICATIONS = 10
+# Rows read and deleted per statement; under SQLite's default variable limit
+COMPACT_BATCH_SIZE = 900
+VERSION = 'cohort_rollups'
+
+ISSUES = 'issues'
+MEDICATIONS = 'medications'
+APPOINTMENTS = 'appointments'
+PATIENTS = 'patients'
+APPOINTMENT_STATUSES = Appointment.Status.labels
+UNKNOWN = 'unknown'
+
+# Fields whose values decide which counters a row contributes to
+TRACKED_FIELDS = {
+    Issue: ('created_at',),
+    Medication: ('name',),
+    Appointment: ('doctor_id', 'status', 'appointment_date'),
+    PatientProfile: ('gender', 'age'),
+    DoctorProfile: ('profile_id', 'specialization'),
+}
+
+
+def week_start(value=None):
+    """Monday of the week holding ``value`` (datetime or date, default now) in the current time zone."""
+    value = timezone.now() if value is None else value
+    if isinstance(value, datetime):
+        value = timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value - timedelta(days=value.weekday())
+
+
+def medication_name(name):
+    return ' '.join((name or '').split()).title() or UNKNOWN
+
+
+def demographic(gender, age):
+    return f'{gender or UNKNOWN}|{age_band(age) or UNKNOWN}'
+
+
+def appointment_dimension(specialization, status):
+    # By label, so the stored dimensions read the same whatever the status codes
+    return f'{specialization or UNKNOWN}|{Appointment.Status(status).label}'
+
+
+def snapshot(model, instance):
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS[model]}
+
+
+def stored_snapshot(model, instance):
+    """The tracked values currently in the database for ``instance``, or None if it is new.
+
+    Called after a save too, so the counters follow the stored values rather
+    than whatever was assigned to the instance.
+    """
+    if instance._state.adding or instance.pk is None:
+        return None
+    return model.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS[model]).first()
+
+
+def _keys(model, values, specializations):
+    if model is Issue:
+        return [(ISSUES, week_start(values['created_at']), '')]
+    if model is Medication:
+        return [(MEDICATIONS, week_start(), medication_name(values['name']))]
+    if model is Appointment:
+        doctor_id = values['doctor_id']
+        if doctor_id not in specializations:
+            specializations[doctor_id] = (
+                DoctorProfile.objects.filter(profile_id=doctor_id).values_list('specialization', flat=True).first()
+            )
+        dimension = appointment_dimension(specializations[doctor_id], values['status'])
+        return [(APPOINTMENTS, week_start(values['appointment_date']), dimension)]
+    if model is PatientProfile:
+        return [(PATIENTS, week_start(), demographic(values['gender'], values['age']))]
+    return []
+
+
+def _doctor_moves(before, after):
+    """A doctor's new specialization takes their appointment counts with it.
+
+    A doctor without details until now had their appointments counted under
+    no specialization. Deleted details are not moved: they only go with the
+    profile, whose appointments are retracted along with it.
+    """
+    deltas = Counter()
+    old = before['specialization'] if before else None
+    if after is None or old == after['specialization']:
+        return deltas
+    per_week = (
+        Appointment.objects.filter(doctor_id=after['profile_id'])
+        .annotate(week=TruncWeek('appointment_date'))
+        .values('week', 'status')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for row in per_week:
+        week = week_start(row['week'])
+        deltas[(APPOINTMENTS, week, appointment_dimension(old, row['status']))] -= row['n']
+        deltas[(APPOINTMENTS, week, appointment_dimension(after['specialization'], row['status']))] += row['n']
+    return deltas
+
+
+def record_change(model, before, after):
+    """Append the rows that move the counters from ``before`` to ``after`` (snapshots; None = absent).
+
+    Runs inside the caller's transaction, so the counters commit or roll
+    back with the write itself.
+    """
+    record_changes(model, [(before, after)])
+
+
+def record_changes(model, changes):
+    """``record_change`` for many (before, after) pairs in one INSERT, for bulk writes that skip signals."""
+    deltas = Counter()
+    specializations = {}
+    for before, after in changes:
+        if before == after:
+            continue
+        if before is not None:
+            for key in _keys(model, before, specializations):
+                deltas[key] -= 1
+        if after is not None:
+            for key in _keys(model, after, specializations):
+                deltas[key] += 1
+        if model is DoctorProfile:
+            deltas.update(_doctor_moves(before, after))
+    rows = [
+        CohortRollup(metric=metric, bucket=bucket, dimension=dimension, count=n)
+        for (metric, bucket, dimension), n in deltas.items() if n
+    ]
+    if rows:
+        CohortRollup.objects.bulk_create(rows)
+        transaction.on_commit(lambda: bump(VERSION))
+
+
+def _replace_all(totals):
+    CohortRollup.objects.bulk_create(
+        [CohortRollup(metric=metric, bucket=bucket, dimension=dimension, count=n)
+         for (metric, bucket, dimension), n in totals.items() if n],
+        batch_size=1000,
+    )
+
+
+def compact(batch_size=COMPACT_BATCH_SIZE):
+    """Fold every row up to now into one per (metric, bucket, dimension); returns (rows before, rows after).
+
+    Rows are read and deleted by id a batch at a time, so rows inserted by
+    concurrent writers meanwhile are left for the next run rather than lost.
+    """
+    with transaction.atomic():
+        last_id = CohortRollup.objects.aggregate(last=Max('id'))['last']
+        if last_id is None:
+            return 0, 0
+        totals = Counter()
+        folded = 0
+        after_id = 0
+        while True:
+            batch = list(
+                CohortRollup.objects.filter(id__gt=after_id, id__lte=last_id)
+                .order_by('id')
+                .values_list('id', 'metric', 'bucket', 'dimension', 'count')[:batch_size]
+            )
+            if not batch:
+                break
+            for _id, metric, bucket, dimension, n in batch:
+                totals[(metric, bucket, dimension)] += n
+            after_id = batch[-1][0]
+            CohortRollup.objects.filter(id__in=[row[0] for row in batch]).delete()
+            folded += len(batch)
+        _replace_all(totals)
+    transaction.on_commit(lambda: bump(VERSION))
+    return folded, sum(1 for n in totals.values() if n)
+
+
+def rebuild():
+    """Recompute every counter from the live and archived rows; returns the number of rollup rows."""
+    totals = Counter()
+    this_week = week_start()
+    for row in Issue.objects.annotate(week=TruncWeek('created_at')).values('week').annotate(n=Count('id')).order_by():
+        totals[(ISSUES, week_start(row['week']), '')] += row['n']
+    for row in Medication.objects.values('name').annotate(n=Count('id')).order_by():
+        totals[(MEDICATIONS, this_week, medication_name(row['name']))] += row['n']
+    appointments = (
+        Appointment.objects.annotate(week=TruncWeek('appointment_date'))
+        .values('week', 'doctor__doctor_profile__specialization', 'status')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for row in appointments:
+        dimension = appointment_dimension(row['doctor__doctor_profile__specialization'], row['status'])
+        totals[(APPOINTMENTS, week_start(row['week']), dimension)] += row['n']
+    # History archive_old_rows moved out of the hot tables (core/archive.py)
+    for (created_at,) in archive.archived_rows(archive.POLICIES['issues'], ['created_at']):
+        totals[(ISSUES, week_start(parse_datetime(created_at)), '')] += 1
+    specializations = dict(DoctorProfile.objects.values_list('profile_id', 'specialization'))
+    archived_appointments = archive.archived_rows(
+        archive.POLICIES['appointments'], ['doctor_id', 'status', 'appointment_date']
+    )
+    for doctor_id, status, appointment_date in archived_appointments:
+        dimension = appointment_dimension(specializations.get(doctor_id), status)
+        totals[(APPOINTMENTS, week_start(parse_datetime(appointment_date)), dimension)] += 1
+    patients = PatientProfile.objects.values('gender', 'age').annotate(n=Count('profile_id')).order_by()
+    for row in patients:
+        totals[(PATIENTS, this_week, demographic(row['gender'], row['age']))] += row['n']
+
+    with transaction.atomic():
+        CohortRollup.objects.all().delete()
+        _replace_all(totals)
+    bump(VERSION)
+    return sum(1 for n in totals.values() if n)
+
+
+def _totals(metric, group='dimension', **filters):
+    """{group value: summed count} for one metric."""
+    return dict(
+        CohortRollup.objects.filter(metric=metric, **filters)
+        .values(group)
+        .annotate(total=Sum('count'))
+        .order_by()
+        .values_list(group, 'total')
+    )
+
+
+def _age_order(band):
+    return int(band.split('-')[0].rstrip('+')) if band[0].isdigit() else 1000
+
+
+def _build_dashboard():
+    this_week = week_start()
+    first_week = this_week - timedelta(weeks=ROLLUP_WEEKS - 1)
+    per_week = _totals(ISSUES, 'bucket', bucket__gte=first_week)
+    weeks = [first_week + timedelta(weeks=i) for i in range(ROLLUP_WEEKS)]
+    peak = max([per_week.get(week, 0) for week in weeks] + [1])
+    issue_weeks = [
+        {'week': week, 'count': per_week.get(week, 0), 'percent': round(100 * per_week.get(week, 0) / peak)}
+        for week in weeks
+    ]
+
+    medications = sorted(
+        ((name, n) for name, n in _totals(MEDICATIONS).items() if n > 0),
+        key=lambda item: (-item[1], item[0]),
+    )[:TOP_MEDICATIONS]
+
+    by_specialization = {}
+    for dimension, n in _totals(APPOINTMENTS).items():
+        specialization, status = dimension.rsplit('|', 1)
+        by_specialization.setdefault(specialization, Counter())[status] += n
+    appointment_rows = sorted(
+        (
+            {'specialization': specialization,
+             'counts': [counts[status] for status in APPOINTMENT_STATUSES],
+             'total': sum(counts.values())}
+            for specialization, counts in by_specialization.items() if sum(counts.values()) > 0
+        ),
+        key=lambda row: (-row['total'], row['specialization']),
+    )
+
+    by_band = {}
+    genders = set()
+    for dimension, n in _totals(PATIENTS).items():
+        if n <= 0:
+            continue
+        gender, band = dimension.rsplit('|', 1)
+        genders.add(gender)
+        by_band.setdefault(band, Counter())[gender] += n
+    genders = sorted(genders, key=lambda gender: (gender == UNKNOWN, gender))
+    demographic_rows = [
+        {'age_band': band, 'counts': [by_band[band][gender] for gender in genders],
+         'total': sum(by_band[band].values())}
+        for band in sorted(by_band, key=_age_order)
+    ]
+
+    return {
+        'issue_weeks': issue_weeks,
+        'top_medications': [{'name': name, 'count': n} for name, n in medications],
+        'appointment_statuses': APPOINTMENT_STATUSES,
+        'appointments_by_specialization': appointment_rows,
+        'genders': genders,
+        'demographics': demographic_rows,
+    }
+
+
+def version():
+    return get_version(VERSION)
+
+
+def dashboard():
+    """Everything the scientist dashboard's analytics panel shows, cached per rollup version."""
+    key = f'core:cohort_rollups:{version()}:{week_start().isoformat()}'
+    value = cache.get(key)
+    if value is None:
+        value = _build_dashboard()
+        cache.set(key, value, ROLLUP_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,117 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Appointment, Issue, ResearchPost, UserProfile
+
+# Created by migration 0019_search_index
+RESEARCH_POST_FTS = 'core_researchpost_fts'
+ISSUE_FTS = 'core_issue_fts'
+# Suggestions returned per keystroke by the doctor's patient picker
+PATIENT_SEARCH_LIMIT = 10
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_query(text):
+    """Turn user input into a safe FTS5 query: every word must match, the last as a prefix."""
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _search(fts, snippet_column, query, page, per_page, extra_where='', extra_params=()):
+    """Return ([(id, snippet)], has_next) for one page of bm25-ranked matches."""
+    match = fts_query(query)
+    if match is None:
+        return [], False
+    offset = (page - 1) * per_page
+    sql = (
+        f"SELECT {fts}.rowid, snippet({fts}, {snippet_column}, '[', ']', '…', 16) "
+        f"FROM {fts} WHERE {fts} MATCH %s {extra_where} "
+        f"ORDER BY bm25({fts}) LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        cursor.execute(sql, [match, *extra_params, per_page + 1, offset])
+        rows = cursor.fetchall()
+    return rows[:per_page], len(rows) > per_page
+
+
+def _fallback(queryset, fields, query, page, per_page):
+    """LIKE-based search for databases without FTS5; every word must appear in one of ``fields``."""
+    for token in _TOKEN_RE.findall(query):
+        matches = Q()
+        for field in fields:
+            matches |= Q(**{f'{field}__icontains': token})
+        queryset = queryset.filter(matches)
+    offset = (page - 1) * per_page
+    ids = list(queryset.order_by('-created_at').values_list('id', flat=True)[offset:offset + per_page + 1])
+    return [(pk, None) for pk in ids[:per_page]], len(ids) > per_page
+
+
+def _hydrate(queryset, rows):
+    objects = queryset.in_bulk([pk for pk, _ in rows])
+    return [(objects[pk], snippet) for pk, snippet in rows if pk in objects]
+
+
+def search_research_posts(query, page=1, per_page=20):
+    """Ranked ResearchPost matches as ([(post, snippet)], has_next)."""
+    if connection.vendor == 'sqlite':
+        rows, has_next = _search(RESEARCH_POST_FTS, 1, query, page, per_page)
+    else:
+        # The same columns as the FTS5 index
+        rows, has_next = _fallback(ResearchPost.objects.all(), ['title', 'content'], query, page, per_page)
+    return _hydrate(ResearchPost.objects.select_related('scientist'), rows), has_next
+
+
+def search_issues(query, doctor, page=1, per_page=20):
+    """Ranked matches among the issues of ``doctor``'s patients."""
+    if connection.vendor == 'sqlite':
+        rows, has_next = _search(
+            ISSUE_FTS, 0, query, page, per_page,
+            extra_where=(f"AND {ISSUE_FTS}.rowid IN (SELECT i.id FROM core_issue i JOIN core_appointment a "
+                         f"ON a.patient_id = i.patient_id WHERE a.doctor_id = %s)"),
+            extra_params=[doctor.id],
+        )
+    else:
+        issues = Issue.objects.filter(patient__appointments_as_patient__doctor=doctor).distinct()
+        rows, has_next = _fallback(issues, ['description'], query, page, per_page)
+    return _hydrate(Issue.objects.select_related('patient'), rows), has_next
+
+
+def doctor_patients(doctor):
+    """Patients with at least one appointment with ``doctor``."""
+    return UserProfile.objects.filter(
+        role=UserProfile.Role.PATIENT,
+        id__in=Appointment.objects.filter(doctor=doctor).values('patient_id'),
+    )
+
+
+def search_patients(query, doctor, limit=PATIENT_SEARCH_LIMIT):
+    """``doctor``'s patients whose full name starts with ``query``, as [{'id', 'full_name'}] by name.
+
+    The candidates come from the doctor's appointments (core_appt_doctor_patient_idx),
+    so the cost depends on the size of the doctor's practice, not of the patient table.
+    """
+    query = ' '.join(query.split())
+    if not query:
+        return []
+    return list(
+        doctor_patients(doctor)
+        .filter(full_name__istartswith=query)
+        .order_by('full_name', 'id')
+        .values('id', 'full_name')[:limit]
+    )
+
+
+def rebuild():
+    """Rebuild and optimize both indexes from the core tables."""
+    with connection.cursor() as cursor:
+        for fts in (RESEARCH_POST_FTS, ISSUE_FTS):
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import events, feed, rollups, summaries
+from .db import configure_connection
+from .etags import DOCTORS, profile_version
+from .middleware import invalidate_profile
+from .models import (
+    Appointment, DoctorProfile, Issue, Medication, Notification, PatientProfile, ResearchPost, ScientistProfile,
+    UserProfile,
+)
+from .versions import bump
+
+connection_created.connect(configure_connection, dispatch_uid='core.db.configure_connection')
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+    # Doctors see their patients' profiles; patients see the doctor list
+    if instance.role == UserProfile.Role.DOCTOR:
+        bump_dashboards([instance.id], DOCTORS)
+    else:
+        bump_dashboards([instance.id] + doctors_of(instance.id))
+
+
+@receiver(post_save, sender=DoctorProfile)
+@receiver(post_delete, sender=DoctorProfile)
+@receiver(post_save, sender=ScientistProfile)
+@receiver(post_delete, sender=ScientistProfile)
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_delete, sender=PatientProfile)
+def profile_details_changed(sender, instance, **kwargs):
+    # Cached with the profile and shown wherever it is
+    try:
+        profile = instance.profile
+    except UserProfile.DoesNotExist:
+        return  # Deleted along with its profile, which has been handled
+    invalidate_cached_profile(UserProfile, profile)
+
+
+@receiver(post_save, sender=ResearchPost)
+@receiver(post_delete, sender=ResearchPost)
+def invalidate_research_feed(sender, instance, **kwargs):
+    # After commit, so a concurrent reader can't re-cache the pre-write feed
+    transaction.on_commit(feed.invalidate)
+
+
+@receiver(post_save, sender=ResearchPost)
+def publish_research_post(sender, instance, created, **kwargs):
+    if created:
+        events.publish_on_commit([events.RESEARCH], 'research_post', {
+            'id': instance.id,
+            'title': instance.title,
+            'scientist_name': instance.scientist.full_name,
+        })
+
+
+def doctors_of(patient_id):
+    return list(Appointment.objects.filter(patient_id=patient_id).values_list('doctor_id', flat=True).distinct())
+
+
+def bump_dashboards(profile_ids, *extra):
+    """Bump the dashboard ETag counters of ``profile_ids`` once the write commits."""
+    names = [profile_version(profile_id) for profile_id in set(profile_ids)] + list(extra)
+    transaction.on_commit(lambda: bump(*names))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_changed(sender, instance, **kwargs):
+    summaries.refresh_on_commit([instance.patient_id])
+    bump_dashboards([instance.patient_id, instance.doctor_id])
+
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment(sender, instance, **kwargs):
+    events.publish_on_commit(
+        [events.profile_channel(instance.patient_id), events.profile_channel(instance.doctor_id)],
+        'appointment',
+        {
+            'id': instance.id,
+            'status': instance.get_status_display(),
+            'appointment_date': instance.appointment_date.isoformat(),
+        },
+    )
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+def patient_record_changed(sender, instance, **kwargs):
+    # Shown on the patient's dashboard and on each of their doctors'
+    summaries.refresh_on_commit([instance.patient_id])
+    bump_dashboards([instance.patient_id] + doctors_of(instance.patient_id))
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    bump_dashboards([instance.user_profile_id])
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, **kwargs):
+    if created:
+        announce_notification(instance)
+
+
+def announce_notification(notification):
+    events.publish_on_commit([events.profile_channel(notification.user_profile_id)], 'notification', {
+        'id': notification.id,
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat(),
+    })
+
+
+@receiver(pre_save, sender=Issue)
+@receiver(pre_save, sender=Medication)
+@receiver(pre_save, sender=Appointment)
+@receiver(pre_save, sender=PatientProfile)
+@receiver(pre_save, sender=DoctorProfile)
+def remember_rollup_state(sender, instance, **kwargs):
+    # What the row counted towards before this save (one query, updates only)
+    instance._rollup_before = rollups.stored_snapshot(sender, instance)
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_save, sender=Medication)
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_save, sender=DoctorProfile)
+def update_rollups(sender, instance, **kwargs):
+    # The values as saved, not as assigned: a view may have set a raw string
+    after = rollups.stored_snapshot(sender, instance)
+    rollups.record_change(sender, getattr(instance, '_rollup_before', None), after)
+
+
+@receiver(pre_delete, sender=Issue)
+@receiver(pre_delete, sender=Medication)
+@receiver(pre_delete, sender=Appointment)
+@receiver(pre_delete, sender=PatientProfile)
+@receiver(pre_delete, sender=DoctorProfile)
+def retract_rollups(sender, instance, **kwargs):
+    # Before the delete, while an appointment's doctor still exists to say
+    # which specialization it was counted under
+    rollups.record_change(sender, rollups.snapshot(sender, instance), None)
@@ -0,0 +1,119 @@
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+
+from .models import Appointment, WorkingHours
+
+# Appointments are booked into fixed-size slots inside each doctor's weekly
+# WorkingHours. The partial unique constraint on (doctor, slot_start) is what
+# makes booking race-safe: two patients posting the same slot both try the
+# INSERT and the database lets exactly one through, with no read-then-write
+# window to lock. Free-slot lookups are one range query on the
+# (doctor, appointment_date) index for the whole window.
+
+# (weekday, start, end, slot minutes) for doctors without WorkingHours rows
+DEFAULT_WORKING_HOURS = getattr(settings, 'DEFAULT_WORKING_HOURS', [
+    (weekday, '09:00', '17:00', 30) for weekday in range(5)
+])
+BOOKING_DAYS = getattr(settings, 'BOOKING_DAYS', 14)
+BOOKING_RETRIES = 5
+
+
+class SlotUnavailable(ValueError):
+    """The requested slot is outside working hours, in the past or already booked."""
+
+
+def working_hours(doctor):
+    """{weekday: [(start time, end time, slot minutes), ...]} for the doctor."""
+    hours = {}
+    rows = WorkingHours.objects.filter(doctor=doctor).values_list('weekday', 'start_time', 'end_time', 'slot_minutes')
+    if not rows:
+        rows = [(weekday, dt_time.fromisoformat(start), dt_time.fromisoformat(end), minutes)
+                for weekday, start, end, minutes in DEFAULT_WORKING_HOURS]
+    for weekday, start, end, minutes in rows:
+        hours.setdefault(weekday, []).append((start, end, minutes))
+    return hours
+
+
+def candidate_slots(hours, start, end):
+    """Yield (slot start, slot end) inside working hours between aware datetimes ``start`` and ``end``."""
+    tz = timezone.get_current_timezone()
+    day = timezone.localtime(start, tz).date()
+    last_day = timezone.localtime(end, tz).date()
+    while day <= last_day:
+        for range_start, range_end, minutes in hours.get(day.weekday(), ()):
+            step = timedelta(minutes=minutes)
+            slot = timezone.make_aware(datetime.combine(day, range_start), tz)
+            range_end = timezone.make_aware(datetime.combine(day, range_end), tz)
+            while slot + step <= range_end:
+                if start <= slot < end:
+                    yield slot, slot + step
+                slot += step
+        day += timedelta(days=1)
+
+
+def free_slots(doctor, start=None, end=None):
+    """Unbooked slot start times for ``doctor`` in [start, end), earliest first."""
+    start = start or timezone.now()
+    end = end or start + timedelta(days=BOOKING_DAYS)
+    candidates = list(candidate_slots(working_hours(doctor), start, end))
+    if not candidates:
+        return []
+    # Everything live in the window, including legacy free-form appointments
+    # that may sit part-way into a slot; one range scan on the index
+    booked = sorted(
+        Appointment.objects.filter(
+            doctor=doctor,
+            appointment_date__gte=candidates[0][0],
+            appointment_date__lt=candidates[-1][1],
+        ).exclude(status=Appointment.Status.CANCELLED).values_list('appointment_date', flat=True)
+    )
+    free = []
+    i = 0
+    for slot, finish in candidates:
+        while i < len(booked) and booked[i] < slot:
+            i += 1
+        if i == len(booked) or booked[i] >= finish:
+            free.append(slot)
+    return free
+
+
+def slot_end(doctor, slot_start):
+    """End of the slot starting at ``slot_start``, or None if no slot starts then."""
+    for slot, end in candidate_slots(working_hours(doctor), slot_start, slot_start + timedelta(seconds=1)):
+        if slot == slot_start:
+            return end
+    return None
+
+
+def book_slot(doctor, patient, slot_start, retries=BOOKING_RETRIES):
+    """Book ``slot_start`` with ``doctor`` for ``patient``; raises SlotUnavailable."""
+    end = slot_end(doctor, slot_start)
+    if end is None or slot_start <= timezone.now():
+        raise SlotUnavailable("That time is not an available slot.")
+    for attempt in range(retries + 1):
+        try:
+            with transaction.atomic():
+                # Legacy free-form appointments have no slot_start for the constraint to see
+                legacy = Appointment.objects.filter(
+                    doctor=doctor, slot_start__isnull=True,
+                    appointment_date__gte=slot_start, appointment_date__lt=end,
+                ).exclude(status=Appointment.Status.CANCELLED)
+                if legacy.exists():
+                    raise SlotUnavailable("That slot is already booked.")
+                return Appointment.objects.create(
+                    doctor=doctor,
+                    patient=patient,
+                    appointment_date=slot_start,
+                    slot_start=slot_start,
+                )
+        except IntegrityError:
+            raise SlotUnavailable("That slot has just been booked.")
+        except OperationalError:
+            # SQLite "database is locked" under write contention; back off and retry
+            if attempt == retries:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
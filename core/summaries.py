@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Appointment, Issue, Medication, PatientSummary, UserProfile
+
+# PatientSummary rows are refreshed one patient at a time by core.signals, as
+# soon as an Issue / Medication / Appointment write commits, so the
+# doctor dashboard can read everything it shows about a patient from a single
+# joined row. ``rebuild`` backfills every patient (after a bulk import, or
+# when the table is first created).
+PREVIEW_LENGTH = 255
+MAX_ACTIVE_MEDICATIONS = 20
+
+
+def build(patient_id):
+    """Unsaved PatientSummary for ``patient_id`` computed from the source tables."""
+    latest_issue = (
+        Issue.objects.filter(patient_id=patient_id)
+        .order_by('-created_at', '-id')
+        .only('description', 'report', 'created_at')
+        .first()
+    )
+    medications = Medication.objects.filter(patient_id=patient_id).order_by('-id')
+    appointments = Appointment.objects.filter(patient_id=patient_id).aggregate(
+        total=Count('id'),
+        scheduled=Count('id', filter=Q(status=Appointment.Status.SCHEDULED)),
+    )
+    return PatientSummary(
+        patient_id=patient_id,
+        issue_count=Issue.objects.filter(patient_id=patient_id).count(),
+        medication_count=medications.count(),
+        appointment_count=appointments['total'],
+        scheduled_count=appointments['scheduled'],
+        latest_issue_preview=latest_issue.description[:PREVIEW_LENGTH] if latest_issue else '',
+        latest_issue_report=latest_issue.report.name if latest_issue and latest_issue.report else '',
+        latest_issue_at=latest_issue.created_at if latest_issue else None,
+        active_medications=list(
+            medications.values('name', 'dosage', 'frequency', 'instructions')[:MAX_ACTIVE_MEDICATIONS]
+        ),
+    )
+
+
+def refresh(patient_id):
+    """Recompute and store one patient's summary; returns it, or None if the patient is gone."""
+    with transaction.atomic():
+        # Locking the profile serializes concurrent refreshes of one patient, so
+        # the last writer always saw every committed change.
+        if not UserProfile.objects.select_for_update().filter(id=patient_id).exists():
+            return None
+        summary = build(patient_id)
+        summary.save()
+    return summary
+
+
+def refresh_many(patient_ids):
+    for patient_id in set(patient_ids):
+        refresh(patient_id)
+
+
+def refresh_on_commit(patient_ids):
+    """Refresh the summaries once the current transaction commits.
+
+    After commit, rather than inside the write, so cascaded deletes of the
+    patient itself don't re-create the row they are removing. ``robust`` so a
+    failed refresh (e.g. SQLite lock contention) is logged instead of being
+    raised to a caller whose write has already committed;
+    rebuild_patient_summaries repairs any row left stale.
+    """
+    patient_ids = set(patient_ids)
+    transaction.on_commit(lambda: refresh_many(patient_ids), robust=True)
+
+
+def rebuild(batch_size=500):
+    """Recompute every patient's summary; returns the number of rows written."""
+    written = 0
+    last_id = 0
+    patients = UserProfile.objects.filter(role=UserProfile.Role.PATIENT).order_by('id').values_list('id', flat=True)
+    while True:
+        batch = list(patients.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            summaries = [build(patient_id) for patient_id in batch]
+            PatientSummary.objects.filter(patient_id__in=batch).delete()
+            PatientSummary.objects.bulk_create(summaries)
+        written += len(summaries)
+        last_id = batch[-1]
+    # Summaries of profiles that are no longer patients
+    PatientSummary.objects.exclude(patient__role=UserProfile.Role.PATIENT).delete()
+    return written
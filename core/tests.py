@@ -1,3 +1,978 @@
-from django.test import TestCase
+import importlib
+import csv
+import os
+import sqlite3
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.checks import Error
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Sum
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from model_registry import RISK_FEATURES, ModelIntegrityError, ModelRegistry, load_model, registry, save_model
+from pipeline_tracing import NullTracer, Tracer
+from risk_scoring import get_scorer
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+from symptom_index import SymptomIndex
+
+from . import async_views, cohort, feed, metrics, rollups, search, summaries
+from .checks import check_shared_cache
+from .forms import MedicationForm
+from .middleware import get_profile
+from .etags import DOCTORS, profile_version
+from .models import (
+    Appointment, CohortRollup, DoctorProfile, Issue, Medication, Notification, PatientProfile, PatientSummary,
+    ResearchPost, UserProfile,
+)
+from .slots import SlotUnavailable, book_slot, free_slots
+from .versions import get_version
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    @override_settings(SINGLE_PROCESS=False, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_local_memory_cache_is_refused(self):
+        errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertIsInstance(errors[0], Error)
+
+    @override_settings(SINGLE_PROCESS=True, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_local_memory_cache_allowed_in_a_single_process(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(SINGLE_PROCESS=False, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                    'LOCATION': 'redis://127.0.0.1:6379/1'}})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+
+class SqliteSettingsTests(TestCase):
+    def test_pragmas_are_applied_to_each_new_connection(self):
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'cache_size': -4321}):
+            new_connection = connections.create_connection('default')
+            self.addCleanup(new_connection.close)
+            with new_connection.cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone(), (1234,))
+                self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone(), (-4321,))
+
+    def test_production_sqlite_waits_on_one_timeout(self):
+        with mock.patch.dict(os.environ, {'SQLITE_BUSY_TIMEOUT_MS': '7000'}):
+            os.environ.pop('DATABASE_ENGINE', None)
+            production = importlib.import_module('clinical_concept.settings_production')
+            production = importlib.reload(production)
+        self.assertEqual(production.SQLITE_PRAGMAS['journal_mode'], 'WAL')
+        self.assertEqual(production.SQLITE_PRAGMAS['busy_timeout'], 7000)
+        options = production.DATABASES['default']['OPTIONS']
+        self.assertNotIn('timeout', options)
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+
+def make_profile(username, role):
+    user = User.objects.create_user(username, email=f'{username}@example.org')
+    return UserProfile.objects.create(user=user, role=role, full_name=username.title())
+
+
+class ProfileCacheTests(TestCase):
+    def test_role_change_reaches_the_next_request(self):
+        profile = make_profile('ada', UserProfile.Role.PATIENT)
+        user = profile.user
+        self.assertEqual(get_profile(SimpleNamespace(user=user)).role, UserProfile.Role.PATIENT)
+
+        profile.role = UserProfile.Role.DOCTOR
+        profile.save()
+        self.assertEqual(get_profile(SimpleNamespace(user=user)).role, UserProfile.Role.DOCTOR)
+
+
+class SymptomExtractionTests(SimpleTestCase):
+    index = SymptomIndex(['chest_pain', 'high_fever', 'cough', 'chills', 'headache', 'loss_of_appetite', 'skin_rash'])
+
+    def test_mentions_in_order(self):
+        self.assertEqual(self.index.extract('Headache and cough since Monday'), ['headache', 'cough'])
+
+    def test_negated_mentions_are_dropped(self):
+        self.assertEqual(self.index.extract('Patient reports no chest pain, denies fever'), [])
+        self.assertEqual(self.index.extract('Negative for chills and cough.'), [])
+        self.assertEqual(self.index.extract('without skin rash; headache'), ['headache'])
+
+    def test_negation_ends_with_the_clause(self):
+        self.assertEqual(self.index.extract('no fever but a cough'), ['cough'])
+        self.assertEqual(self.index.extract('Denies chest pain. Chills at night'), ['chills'])
+
+    def test_synonym_starting_with_a_cue_is_not_a_negation(self):
+        self.assertEqual(self.index.extract('no appetite, headache'), ['loss of appetite', 'headache'])
+
+
+class MergeDatabasesTests(TestCase):
+    TABLES = ['auth_user', 'core_userprofile', 'core_doctorprofile', 'core_appointment']
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source_path = os.path.join(tmp.name, 'source.sqlite3')
+        self.source = sqlite3.connect(self.source_path)
+        self.addCleanup(self.source.close)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join(['%s'] * len(self.TABLES))})",
+                self.TABLES,
+            )
+            for (sql,) in cursor.fetchall():
+                self.source.execute(sql)
+
+    def add_source_user(self, user_id, username, email, role=None):
+        self.source.execute(
+            "INSERT INTO auth_user (id, username, email, password, first_name, last_name, is_superuser, is_staff, "
+            "is_active, date_joined) VALUES (?, ?, ?, '', '', '', 0, 0, 1, '2024-01-01 00:00:00')",
+            [user_id, username, email],
+        )
+        if role:
+            self.source.execute(
+                "INSERT INTO core_userprofile (id, user_id, role, full_name) VALUES (?, ?, ?, ?)",
+                [user_id, user_id, role, username],
+            )
+
+    def merge(self):
+        self.source.commit()
+        out, err = StringIO(), StringIO()
+        call_command('merge_databases', self.source_path, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_users_are_matched_by_email_ignoring_case(self):
+        ana = User.objects.create_user('ana', email='Ana@Example.org')
+        self.add_source_user(1, 'ana.b', 'ana@example.ORG')
+        out, _ = self.merge()
+        self.assertEqual(User.objects.count(), 1)
+        self.assertIn('auth_user: 1 read, 0 created, 1 merged', out)
+        self.assertEqual(User.objects.get().pk, ana.pk)
+
+    def test_same_username_with_different_emails_is_a_conflict(self):
+        User.objects.create_user('bob', email='bob@example.org')
+        self.add_source_user(1, 'bob', 'robert@example.net', role=UserProfile.Role.PATIENT)
+        out, err = self.merge()
+        self.assertIn("Skipping user 1 ('bob', robert@example.net)", err)
+        self.assertIn('auth_user: 1 read, 0 created, 0 merged, 1 skipped', out)
+        self.assertFalse(User.objects.filter(email='robert@example.net').exists())
+        self.assertFalse(UserProfile.objects.exists())
+
+    def test_username_fallback_needs_both_emails_missing(self):
+        carl = User.objects.create_user('carl')
+        User.objects.create_user('dana')
+        self.add_source_user(1, 'carl', '')
+        self.add_source_user(2, 'dana', 'dana@example.org')
+        self.add_source_user(3, 'eve', 'eve@example.org')
+        out, err = self.merge()
+        self.assertIn('auth_user: 3 read, 1 created, 1 merged, 1 skipped', out)
+        self.assertIn("'dana'", err)
+        self.assertEqual(User.objects.filter(username='carl').get().pk, carl.pk)
+        self.assertTrue(User.objects.filter(username='eve', email='eve@example.org').exists())
+
+    def test_details_count_only_rows_actually_created(self):
+        user = User.objects.create_user('doc', email='doc@example.org')
+        profile = UserProfile.objects.create(user=user, role=UserProfile.Role.DOCTOR, full_name='Doc')
+        DoctorProfile.objects.create(profile=profile, specialization='Cardiology')
+        self.add_source_user(1, 'doc', 'doc@example.org', role=UserProfile.Role.DOCTOR)
+        self.add_source_user(2, 'new', 'new@example.org', role=UserProfile.Role.DOCTOR)
+        self.source.executemany(
+            "INSERT INTO core_doctorprofile (profile_id, specialization) VALUES (?, ?)",
+            [(1, 'Neurology'), (2, 'Oncology')],
+        )
+        out, _ = self.merge()
+        self.assertIn('core_doctorprofile: 2 read, 1 created, 1 merged', out)
+        self.assertEqual(DoctorProfile.objects.get(profile=profile).specialization, 'Cardiology')
+
+    def test_slot_booked_in_both_databases_is_kept_without_a_slot(self):
+        doctor = make_profile('doc', UserProfile.Role.DOCTOR)
+        patient = make_profile('pat', UserProfile.Role.PATIENT)
+        slot = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        Appointment.objects.create(doctor=doctor, patient=patient, appointment_date=slot, slot_start=slot)
+        versions = get_version(DOCTORS), get_version(profile_version(doctor.id)), feed.version()
+
+        self.add_source_user(1, 'doc', 'doc@example.org', role=UserProfile.Role.DOCTOR)
+        self.add_source_user(2, 'other', 'other@example.org', role=UserProfile.Role.PATIENT)
+        later = slot + timedelta(hours=1)
+        self.source.executemany(
+            "INSERT INTO core_appointment (id, doctor_id, patient_id, appointment_date, slot_start, status) "
+            "VALUES (?, 1, 2, ?, ?, ?)",
+            [(1, slot.isoformat(), slot.isoformat(), Appointment.Status.SCHEDULED),
+             (2, later.isoformat(), later.isoformat(), Appointment.Status.SCHEDULED)],
+        )
+        out, err = self.merge()
+        self.assertIn('core_appointment: 2 read, 2 created', out)
+        self.assertIn('slot already booked, kept without a slot', err)
+        self.assertEqual(
+            sorted(Appointment.objects.filter(patient__full_name='other').values_list('appointment_date', 'slot_start')),
+            [(slot, None), (later, later)],
+        )
+        # Cached dashboards and the feed see the merged rows
+        after = get_version(DOCTORS), get_version(profile_version(doctor.id)), feed.version()
+        for old, new in zip(versions, after):
+            self.assertNotEqual(old, new)
+
+
+class SignUpTests(TestCase):
+    def sign_up(self, **fields):
+        return self.client.post(reverse('core:signup'), {
+            'name': 'Pat', 'email': 'pat@example.org', 'password': 'secret-123', 'role': 'patient',
+            'gender': 'female', **fields,
+        })
+
+    def test_patient_age_is_stored_as_a_number(self):
+        response = self.sign_up(age='40')
+        self.assertRedirects(response, reverse('core:patient_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(PatientProfile.objects.get().age, 40)
+        self.assertEqual(
+            list(CohortRollup.objects.filter(metric='patients').values_list('dimension', 'count')),
+            [('female|40-44', 1)],
+        )
+
+    def test_invalid_age_is_rejected_before_creating_the_user(self):
+        for age in ['forty', '-3', '400']:
+            with self.subTest(age=age):
+                response = self.sign_up(age=age)
+                self.assertEqual(response.status_code, 400)
+                self.assertContains(response, 'Please enter a valid age.', status_code=400)
+        self.assertFalse(User.objects.exists())
+
+
+class ResearchSearchTests(TestCase):
+    def setUp(self):
+        scientist = make_profile('sci', UserProfile.Role.SCIENTIST)
+        self.focused = ResearchPost.objects.create(
+            scientist=scientist, title='Asthma cohort', content='Asthma flares and asthma inhaler use in asthma clinics.',
+        )
+        self.passing = ResearchPost.objects.create(
+            scientist=scientist, title='Diet and sleep',
+            content='A long survey of diet, sleep, exercise, mood and work, with one mention of asthma.',
+        )
+        ResearchPost.objects.create(scientist=scientist, title='Genomics', content='Sequencing pipelines.')
+
+    def titles(self, query):
+        results, _ = search.search_research_posts(query)
+        return [post.title for post, _ in results]
+
+    def test_fts_ranks_the_closer_match_first(self):
+        self.assertEqual(self.titles('asthma'), ['Asthma cohort', 'Diet and sleep'])
+        results, _ = search.search_research_posts('inhal')
+        self.assertEqual([post for post, _ in results], [self.focused])
+        self.assertIn('[inhaler]', results[0][1])
+
+    def test_fts_matches_titles(self):
+        self.assertEqual(self.titles('cohort'), ['Asthma cohort'])
+
+    def test_fallback_searches_the_same_columns(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(self.titles('cohort'), ['Asthma cohort'])
+            self.assertEqual(self.titles('diet mention'), ['Diet and sleep'])
+            self.assertEqual(set(self.titles('asthma')), {'Asthma cohort', 'Diet and sleep'})
+
+
+class SlotBookingTests(TestCase):
+    def setUp(self):
+        self.doctor = make_profile('doc', UserProfile.Role.DOCTOR)
+        self.patients = [make_profile(f'pat{i}', UserProfile.Role.PATIENT) for i in range(2)]
+        self.slot = free_slots(self.doctor)[0]
+
+    def test_a_slot_can_only_be_booked_once(self):
+        book_slot(self.doctor, self.patients[0], self.slot)
+        with self.assertRaises(SlotUnavailable):
+            book_slot(self.doctor, self.patients[1], self.slot)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 1)
+        self.assertNotIn(self.slot, free_slots(self.doctor))
+
+    def test_cancelling_frees_the_slot(self):
+        appointment = book_slot(self.doctor, self.patients[0], self.slot)
+        appointment.status = Appointment.Status.CANCELLED
+        appointment.save()
+        self.assertIn(self.slot, free_slots(self.doctor))
+        book_slot(self.doctor, self.patients[1], self.slot)
+
+    def test_legacy_appointment_inside_a_slot_blocks_it(self):
+        Appointment.objects.create(
+            doctor=self.doctor, patient=self.patients[0], appointment_date=self.slot + timedelta(minutes=10)
+        )
+        with self.assertRaises(SlotUnavailable):
+            book_slot(self.doctor, self.patients[1], self.slot)
+
+    def test_times_outside_working_hours_are_refused(self):
+        with self.assertRaises(SlotUnavailable):
+            book_slot(self.doctor, self.patients[0], self.slot + timedelta(minutes=7))
+
+
+class ArchiveOldRowsTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.archive = os.path.join(tmp.name, 'archive.sqlite3')
+        # Where rollups.rebuild() looks for archived history too
+        self.enterContext(override_settings(ARCHIVE_DATABASE=self.archive))
+        self.doctor = make_profile('doc', UserProfile.Role.DOCTOR)
+        self.patient = make_profile('pat', UserProfile.Role.PATIENT)
+        self.long_ago = timezone.now() - timedelta(days=1000)
+
+    def archived(self, table):
+        sidecar = sqlite3.connect(self.archive)
+        try:
+            cursor = sidecar.execute(f'SELECT * FROM "archived_{table}" ORDER BY id')
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+        finally:
+            sidecar.close()
+
+    def archive_old_rows(self, *args):
+        out = StringIO()
+        call_command('archive_old_rows', *args, stdout=out)
+        return out.getvalue()
+
+    def test_old_rows_move_to_the_sidecar_intact(self):
+        old_issue = Issue.objects.create(patient=self.patient, description='Old rash')
+        Issue.objects.filter(pk=old_issue.pk).update(created_at=self.long_ago)
+        new_issue = Issue.objects.create(patient=self.patient, description='Cough')
+        read = Notification.objects.create(user_profile=self.patient, message='Seen', is_read=True)
+        unread = Notification.objects.create(user_profile=self.patient, message='Unseen')
+        Notification.objects.filter(pk__in=[read.pk, unread.pk]).update(created_at=self.long_ago)
+        held = Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, appointment_date=self.long_ago,
+            status=Appointment.Status.ACCEPTED,
+        )
+        pending = Appointment.objects.create(doctor=self.doctor, patient=self.patient, appointment_date=self.long_ago)
+
+        out = self.archive_old_rows()
+        self.assertIn('issues: archived 1 rows', out)
+        self.assertIn('notifications: archived 1 rows', out)
+        self.assertIn('appointments: archived 1 rows', out)
+        self.assertEqual(list(Issue.objects.values_list('pk', flat=True)), [new_issue.pk])
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [unread.pk])
+        self.assertEqual(list(Appointment.objects.values_list('pk', flat=True)), [pending.pk])
+
+        [issue] = self.archived('core_issue')
+        self.assertEqual(
+            (issue['id'], issue['patient_id'], issue['description'], issue['created_at']),
+            (old_issue.pk, self.patient.pk, 'Old rash', self.long_ago.isoformat()),
+        )
+        self.assertEqual([row['message'] for row in self.archived('core_notification')], ['Seen'])
+        [appointment] = self.archived('core_appointment')
+        self.assertEqual(
+            (appointment['id'], appointment['doctor_id'], appointment['status']),
+            (held.pk, self.doctor.pk, Appointment.Status.ACCEPTED),
+        )
+
+        # Nothing left to move; a second run leaves the sidecar as it was
+        self.assertIn('issues: archived 0 rows', self.archive_old_rows('issues'))
+        self.assertEqual(len(self.archived('core_issue')), 1)
+
+    def rollup_totals(self):
+        return {
+            (metric, bucket, dimension): n for metric, bucket, dimension, n in CohortRollup.objects.values_list('metric', 'bucket', 'dimension')
+            .annotate(n=Sum('count')).order_by() if n
+        }
+
+    def test_rebuilt_rollups_keep_counting_archived_rows(self):
+        DoctorProfile.objects.create(profile=self.doctor, specialization='Cardiology')
+        for description in ['Old rash', 'Old cough', 'Cough']:
+            Issue.objects.create(patient=self.patient, description=description)
+        Issue.objects.filter(description__startswith='Old').update(created_at=self.long_ago)
+        Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, appointment_date=self.long_ago,
+            status=Appointment.Status.CANCELLED,
+        )
+        rollups.rebuild()
+        before = self.rollup_totals()
+        self.assertEqual(before[(rollups.ISSUES, rollups.week_start(self.long_ago), '')], 2)
+
+        self.archive_old_rows()
+        self.assertEqual(Issue.objects.count(), 1)
+        self.assertFalse(Appointment.objects.exists())
+        self.assertEqual(self.rollup_totals(), before)
+        rollups.rebuild()
+        self.assertEqual(self.rollup_totals(), before)
+
+    def test_dry_run_only_counts(self):
+        issue = Issue.objects.create(patient=self.patient, description='Old rash')
+        Issue.objects.filter(pk=issue.pk).update(created_at=self.long_ago)
+        self.assertIn('issues: 1 rows older than 730 days', self.archive_old_rows('issues', '--dry-run'))
+        self.assertTrue(Issue.objects.filter(pk=issue.pk).exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SeedDataTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # Where any seeded PDF reports go
+        self.enterContext(override_settings(MEDIA_ROOT=tmp.name))
+
+    def test_seeds_and_refreshes_derived_data(self):
+        doctors_version, feed_version = get_version(DOCTORS), feed.version()
+        out = StringIO()
+        call_command(
+            'seed_data', doctors=2, patients=5, scientists=1, report_fraction=0, prefix='t', stdout=out,
+        )
+        self.assertEqual(
+            dict(UserProfile.objects.values_list('role').annotate(n=Count('id')).order_by()),
+            {UserProfile.Role.DOCTOR: 2, UserProfile.Role.PATIENT: 5, UserProfile.Role.SCIENTIST: 1},
+        )
+        self.assertEqual(DoctorProfile.objects.count(), 2)
+        self.assertEqual(PatientProfile.objects.count(), 5)
+        # bulk_create skips the signals, so both were rebuilt from the seeded rows
+        self.assertEqual(PatientSummary.objects.count(), 5)
+        self.assertEqual(
+            CohortRollup.objects.filter(metric=rollups.PATIENTS).aggregate(n=Sum('count'))['n'], 5
+        )
+        self.assertEqual(
+            CohortRollup.objects.filter(metric=rollups.APPOINTMENTS).aggregate(n=Sum('count'))['n'],
+            Appointment.objects.count(),
+        )
+        self.assertNotEqual(get_version(DOCTORS), doctors_version)
+        self.assertNotEqual(feed.version(), feed_version)
+
+    def test_refuses_an_existing_prefix(self):
+        call_command('seed_data', doctors=1, patients=0, scientists=0, report_fraction=0, prefix='t', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "Users with the prefix 't-' already exist"):
+            call_command('seed_data', doctors=1, patients=0, scientists=0, report_fraction=0, prefix='t', stdout=StringIO())
+
+
+class RoleMigrationTests(TransactionTestCase):
+    """0023 turns role and status strings into codes; 0024 moves role fields into per-role tables."""
+    before = [('core', '0022_cohortrollup')]
+    after = [('core', '0024_role_profiles')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_forward_and_back(self):
+        apps = self.migrate(self.before)
+        OldUser = apps.get_model('auth', 'User')
+        OldProfile = apps.get_model('core', 'UserProfile')
+        doctor = OldProfile.objects.create(
+            user=OldUser.objects.create(username='doc'), full_name='Doc', role='Doctor',
+            license_number='L-1', specialization='Cardiology', hospital='General',
+        )
+        scientist = OldProfile.objects.create(
+            user=OldUser.objects.create(username='sci'), full_name='Sci', role='researcher',
+            research_area='Genomics', institution='MIT',
+        )
+        patient = OldProfile.objects.create(
+            user=OldUser.objects.create(username='pat'), full_name='Pat', role=' patient ',
+            gender='female', age=41, medical_history='asthma',
+        )
+        apps.get_model('core', 'Appointment').objects.create(
+            doctor=doctor, patient=patient, appointment_date=timezone.now(), status='canceled',
+        )
+
+        apps = self.migrate(self.after)
+        self.assertEqual(
+            dict(apps.get_model('core', 'UserProfile').objects.values_list('id', 'role')),
+            {doctor.id: UserProfile.Role.DOCTOR, scientist.id: UserProfile.Role.SCIENTIST,
+             patient.id: UserProfile.Role.PATIENT},
+        )
+        self.assertEqual(
+            list(apps.get_model('core', 'Appointment').objects.values_list('status', flat=True)),
+            [Appointment.Status.CANCELLED],
+        )
+        self.assertEqual(
+            list(apps.get_model('core', 'DoctorProfile').objects.values_list(
+                'profile_id', 'license_number', 'specialization', 'hospital')),
+            [(doctor.id, 'L-1', 'Cardiology', 'General')],
+        )
+        self.assertEqual(
+            list(apps.get_model('core', 'ScientistProfile').objects.values_list(
+                'profile_id', 'research_area', 'institution')),
+            [(scientist.id, 'Genomics', 'MIT')],
+        )
+        self.assertEqual(
+            list(apps.get_model('core', 'PatientProfile').objects.values_list(
+                'profile_id', 'gender', 'age', 'medical_history')),
+            [(patient.id, 'female', 41, 'asthma')],
+        )
+
+        apps = self.migrate(self.before)
+        self.assertEqual(
+            list(apps.get_model('core', 'UserProfile').objects.order_by('id').values_list(
+                'role', 'specialization', 'research_area', 'age', 'medical_history')),
+            [('doctor', 'Cardiology', None, None, None), ('scientist', None, 'Genomics', None, None),
+             ('patient', None, None, 41, 'asthma')],
+        )
+        self.assertEqual(
+            list(apps.get_model('core', 'Appointment').objects.values_list('status', flat=True)), ['Cancelled']
+        )
+
+    def test_unknown_role_stops_the_migration(self):
+        apps = self.migrate(self.before)
+        apps.get_model('core', 'UserProfile').objects.create(
+            user=apps.get_model('auth', 'User').objects.create(username='x'), full_name='X', role='admin',
+        )
+        with self.assertRaisesMessage(ValueError, "UserProfile.role has values with no code: ['admin']"):
+            self.migrate(self.after)
+        # Let tearDown migrate forward again
+        apps.get_model('core', 'UserProfile').objects.all().delete()
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.patient = make_profile('pat', UserProfile.Role.PATIENT)
+        self.client.force_login(self.patient.user)
+
+    def test_wsgi_dashboard_does_not_open_the_stream(self):
+        response = self.client.get(reverse('core:patient_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'EventSource')
+
+    def test_stream_ends_at_once_without_async_views(self):
+        response = self.client.get(reverse('core:event_stream'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    @override_settings(ASYNC_VIEWS=True)
+    async def test_stream_opens_with_async_views(self):
+        await self.async_client.aforce_login(self.patient.user)
+        response = await self.async_client.get(reverse('core:event_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+        await chunks.aclose()
+
+
+class DoctorAppointmentListTests(TestCase):
+    def setUp(self):
+        self.doctor = make_profile('doc', UserProfile.Role.DOCTOR)
+        patient = make_profile('pat', UserProfile.Role.PATIENT)
+        PatientProfile.objects.create(
+            profile=patient, gender='female', age=40, address='1 Long Road', medical_history='Asthma since 2001',
+        )
+        self.appointment = Appointment.objects.create(
+            doctor=self.doctor, patient=patient, appointment_date=timezone.now() + timedelta(days=1),
+        )
+        self.client.force_login(self.doctor.user)
+
+    def test_list_leaves_out_address_and_history(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('core:doctor_dashboard'))
+        self.assertContains(response, 'Age:</strong> 40')
+        self.assertNotContains(response, 'Asthma since 2001')
+        [listing] = [query['sql'] for query in queries.captured_queries
+                     if query['sql'].startswith('SELECT "core_appointment"."id"')]
+        self.assertIn('"core_patientprofile"."age"', listing)
+        self.assertNotIn('medical_history', listing)
+        self.assertNotIn('"address"', listing)
+
+    def test_details_are_loaded_on_demand(self):
+        url = reverse('core:appointment_patient_details', args=[self.appointment.id])
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {'address': '1 Long Road', 'medical_history': 'Asthma since 2001'})
+
+        self.client.force_login(make_profile('other', UserProfile.Role.DOCTOR).user)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class RiskScoreTests(TestCase):
+    record = {'Age': 61, 'BloodPressure': 150, 'Glucose': 180, 'Cholesterol': 260, 'HeartRate': 95}
+
+    def setUp(self):
+        self.client.force_login(make_profile('pat', UserProfile.Role.PATIENT).user)
+        self.url = reverse('core:score_risk')
+
+    def post(self, payload):
+        return self.client.post(self.url, payload, content_type='application/json')
+
+    def test_records_are_scored(self):
+        response = self.post({'records': [self.record, dict(self.record, Age=25)]})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertIn(results[0]['risk_level'], {'Low Risk', 'High Risk'})
+        self.assertAlmostEqual(sum(results[0]['probabilities'].values()), 1, places=4)
+
+    def test_scoring_stays_on_the_request_thread(self):
+        scorer = get_scorer()
+        self.assertEqual(scorer.n_jobs, 1)
+        self.assertEqual(scorer.model.n_jobs, 1)
+
+    def test_compiled_forest_matches_predict_proba(self):
+        scorer = get_scorer()
+        rng = np.random.default_rng(0)
+        X = np.column_stack([rng.integers(20, 80, 200), rng.integers(80, 180, 200), rng.integers(70, 200, 200),
+                             rng.integers(150, 300, 200), rng.integers(60, 120, 200)]).astype(np.float64)
+        expected = scorer.model.predict_proba(pd.DataFrame(X, columns=RISK_FEATURES))
+        compiled = np.vstack([scorer.compiled.predict_proba_one(row) for row in X])
+        np.testing.assert_allclose(compiled, expected)
+
+    def test_invalid_record_is_a_client_error(self):
+        response = self.post({'record': dict(self.record, Glucose=None)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Record 0 is missing Glucose'})
+        self.assertEqual(self.post({'record': dict(self.record, Glucose='NaN')}).status_code, 400)
+
+    def test_oversized_batch_is_refused(self):
+        with mock.patch('core.views.MAX_RISK_RECORDS', 2), mock.patch('core.views.get_scorer') as scorer:
+            response = self.post({'records': [self.record] * 3})
+        self.assertEqual(response.status_code, 400)
+        scorer.assert_not_called()
+
+    def test_unloadable_model_is_unavailable(self):
+        with mock.patch('core.views.get_scorer', side_effect=FileNotFoundError('medical_model.joblib')), \
+                self.assertLogs('core.views', 'ERROR'):
+            response = self.post({'record': self.record})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'error': 'Risk scoring is unavailable.'})
+
+
+class ModelArtifactTests(SimpleTestCase):
+    def setUp(self):
+        self.path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'svc.joblib')
+        self.model = SVC().fit([[0, 1], [1, 0], [1, 1], [0, 0]], ['cold', 'flu', 'flu', 'cold'])
+        save_model(self.model, self.path, features=['cough', 'fever'], classes=self.model.classes_)
+
+    def test_saved_artifact_loads_memory_mapped(self):
+        model, manifest = load_model(self.path, features=['cough', 'fever'])
+        self.assertEqual(manifest['features'], ['cough', 'fever'])
+        self.assertEqual(manifest['classes'], ['cold', 'flu'])
+        self.assertIsInstance(model.support_vectors_, np.memmap)
+        self.assertEqual(list(model.predict([[0, 1], [1, 0]])), list(self.model.predict([[0, 1], [1, 0]])))
+
+    def test_tampered_artifact_is_rejected(self):
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        with self.assertRaisesMessage(ModelIntegrityError, 'does not match the SHA-256'):
+            load_model(self.path)
+
+    def test_artifact_without_manifest_is_rejected(self):
+        os.remove(os.path.splitext(self.path)[0] + '.json')
+        with self.assertRaisesMessage(ModelIntegrityError, 'No manifest found'):
+            load_model(self.path)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_shipped_risk_model_matches_its_manifest(self):
+        model, manifest = registry.get_with_manifest('risk')
+        self.assertEqual(manifest['features'], RISK_FEATURES)
+        self.assertEqual(model.n_features_in_, len(RISK_FEATURES))
+
+    def test_models_load_once_and_check_their_features(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'tree.joblib')
+        save_model(DecisionTreeClassifier().fit([[0, 1], [1, 0]], [0, 1]), path, features=['a', 'b'])
+        models = ModelRegistry()
+        models.register('tree', path, features=['a', 'b'])
+        self.assertFalse(models.is_loaded('tree'))
+        self.assertIs(models.get('tree'), models.get('tree'))
+
+        models.register('tree', path, features=['b', 'a'])
+        with self.assertRaisesMessage(ModelIntegrityError, 'trained on different features'):
+            models.get('tree')
+
+
+class ResearchFeedCacheTests(TestCase):
+    def setUp(self):
+        self.scientist = make_profile('sci', UserProfile.Role.SCIENTIST)
+        ResearchPost.objects.create(scientist=self.scientist, title='Statins', content='Cohort results')
+        # Earlier tests' writes were rolled back before their on_commit bumps ran
+        feed.invalidate()
+
+    def test_feed_is_served_from_the_cache_until_a_post_is_written(self):
+        self.assertEqual([post['title'] for post in feed.latest_posts(5)], ['Statins'])
+        with self.assertNumQueries(0):
+            feed.latest_posts(5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ResearchPost.objects.create(scientist=self.scientist, title='Beta blockers', content='Trial design')
+        self.assertEqual([post['title'] for post in feed.latest_posts(5)], ['Beta blockers', 'Statins'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ResearchPost.objects.filter(title='Statins').get().delete()
+        self.assertEqual([post['title'] for post in feed.latest_posts(5)], ['Beta blockers'])
+
+
+class DashboardETagTests(TestCase):
+    def setUp(self):
+        self.patient = make_profile('pat', UserProfile.Role.PATIENT)
+        self.client.force_login(self.patient.user)
+        self.url = reverse('core:patient_dashboard')
+        # The first page sets the CSRF cookie, which is part of the ETag
+        self.client.get(self.url)
+
+    def test_unchanged_dashboard_is_answered_with_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries.captured_queries if 'core_appointment' in query['sql']])
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(patient=self.patient, description='Persistent cough')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Persistent cough')
+        self.assertNotEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_profile('doc', UserProfile.Role.DOCTOR)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class PatientSummaryTests(TestCase):
+    def setUp(self):
+        self.patient = make_profile('pat', UserProfile.Role.PATIENT)
+        self.doctor = make_profile('doc', UserProfile.Role.DOCTOR)
+
+    def test_summary_follows_committed_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(patient=self.patient, description='Shortness of breath')
+            Medication.objects.create(patient=self.patient, name='Salbutamol', dosage='100mcg',
+                                      frequency='As needed', instructions='Two puffs')
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor,
+                                       appointment_date=timezone.now() + timedelta(days=2))
+        summary = PatientSummary.objects.get(patient=self.patient)
+        self.assertEqual((summary.issue_count, summary.medication_count, summary.scheduled_count), (1, 1, 1))
+        self.assertEqual(summary.latest_issue_preview, 'Shortness of breath')
+        self.assertEqual([medication['name'] for medication in summary.active_medications], ['Salbutamol'])
+
+    def test_rebuild_repairs_stale_rows(self):
+        # Writes that bypass the signals, like a bulk import
+        Issue.objects.bulk_create([Issue(patient=self.patient, description='Migraine')])
+        PatientSummary.objects.create(patient=self.doctor)
+        self.assertEqual(summaries.rebuild(), 1)
+        summary = PatientSummary.objects.get()
+        self.assertEqual((summary.patient_id, summary.issue_count), (self.patient.id, 1))
+
+
+class AsyncDashboardTests(TestCase):
+    # core/urls.py picks the async views at import time, so call them directly
+    def setUp(self):
+        self.doctor = make_profile('doc', UserProfile.Role.DOCTOR)
+        User.objects.filter(id=self.doctor.user_id).update(first_name='Gregory', last_name='House')
+        DoctorProfile.objects.create(profile=self.doctor, specialization='Nephrology')
+        self.patient = make_profile('pat', UserProfile.Role.PATIENT)
+        PatientProfile.objects.create(profile=self.patient, age=52, medical_history='Hypertension')
+        Appointment.objects.create(doctor=self.doctor, patient=self.patient,
+                                   appointment_date=timezone.now() + timedelta(days=1))
+
+    async def get(self, view, profile):
+        request = AsyncRequestFactory().get('/')
+
+        async def auser():
+            return profile.user
+        request.auser = auser
+        return await view(request)
+
+    async def test_doctor_dashboard(self):
+        response = await self.get(async_views.doctor_dashboard, self.doctor)
+        self.assertContains(response, 'Age:</strong> 52')
+        self.assertContains(response, 'new EventSource(')
+        self.assertTrue(response.has_header('ETag'))
+
+    async def test_patient_dashboard(self):
+        response = await self.get(async_views.patient_dashboard, self.patient)
+        # Everything the template reaches through the appointment was loaded up front
+        self.assertContains(response, 'Hypertension')
+        self.assertContains(response, 'Dr. Gregory House')
+        self.assertContains(response, 'Nephrology')
+
+    async def test_dashboards_check_the_role(self):
+        response = await self.get(async_views.doctor_dashboard, self.patient)
+        self.assertContains(response, 'Unauthorized Access')
+
+
+@override_settings(MIDDLEWARE=['core.metrics.MetricsMiddleware', *settings.MIDDLEWARE])
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.multiple(metrics, METRICS_ENABLED=True, METRICS_TOKEN='scrape-token'))
+        metrics.buffer.clear()
+        self.addCleanup(metrics.buffer.clear)
+        self.client.force_login(make_profile('pat', UserProfile.Role.PATIENT).user)
+
+    def test_request_is_recorded_with_its_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('core:patient_dashboard'))
+        [sample] = metrics.buffer.snapshot()
+        self.assertEqual((sample.view, sample.method, sample.status), ('core:patient_dashboard', 'GET', 200))
+        self.assertEqual(sample.queries, len(queries.captured_queries))
+        self.assertEqual(sample.size, len(response.content))
+        self.assertGreater(sample.template_time, 0)
+        self.assertGreaterEqual(sample.duration, sample.query_time + sample.template_time)
+
+    def test_report_needs_staff_or_the_token(self):
+        self.client.get(reverse('core:patient_dashboard'))
+        url = reverse('core:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        response = self.client.get(url, {'format': 'prometheus'}, HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertIn('core_request_db_queries_count{view="core:patient_dashboard"} 1\n', response.content.decode())
+        report = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token').json()
+        # Busiest view first: the three earlier report requests were recorded too
+        self.assertEqual([(view['view'], view['count']) for view in report['views']],
+                         [('core:metrics', 3), ('core:patient_dashboard', 1)])
+
+
+class PipelineTracingTests(SimpleTestCase):
+    def test_stages_are_summarized_in_order(self):
+        tracer = Tracer()
+        for chunk_tokens in (384, 128):
+            with tracer.stage('tokenize') as span:
+                span.set(tokens=chunk_tokens)
+        with self.assertRaises(RuntimeError), tracer.stage('ner_forward'):
+            raise RuntimeError('model failed')
+
+        summary = tracer.summary()
+        self.assertEqual(list(summary), ['tokenize', 'ner_forward'])
+        self.assertEqual((summary['tokenize']['calls'], summary['tokenize']['tokens']), (2, 512))
+        self.assertEqual(summary['ner_forward']['calls'], 1)
+        self.assertEqual(summary['tokenize']['max_seconds'], max(span.duration for span in tracer.spans[:2]))
+
+    def test_chrome_trace_has_a_complete_event_per_stage(self):
+        tracer = Tracer()
+        with tracer.stage('pdf_extraction', pages=3):
+            pass
+        [event] = [event for event in tracer.to_chrome_trace()['traceEvents'] if event['ph'] == 'X']
+        self.assertEqual((event['name'], event['args']['pages']), ('pdf_extraction', 3))
+        self.assertIn('rss_bytes', event['args'])
+
+    def test_null_tracer_records_nothing(self):
+        tracer = NullTracer()
+        with tracer.stage('tokenize') as span:
+            span.set(tokens=10)
+        self.assertFalse(tracer.enabled)
+        self.assertFalse(hasattr(tracer, 'spans'))
+
+
+class CohortExportTests(TestCase):
+    def setUp(self):
+        self.patient = make_profile('jdoe', UserProfile.Role.PATIENT)
+        User.objects.filter(id=self.patient.user_id).update(first_name='Jane', last_name='Doe')
+        PatientProfile.objects.create(profile=self.patient, gender='female', age=93, address='1 Long Road')
+        Issue.objects.create(patient=self.patient,
+                             description='Jane reports dizziness since 03/04/2024, call +44 20 7946 0958')
+        self.client.force_login(make_profile('sci', UserProfile.Role.SCIENTIST).user)
+        self.url = reverse('core:cohort_export')
+
+    def export(self, dataset):
+        response = self.client.get(self.url, {'dataset': dataset})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_identifiers_are_scrubbed(self):
+        self.assertEqual(
+            cohort.scrub('Call Jane Doe on +44 20 7946 0958 or jane.doe@example.org, seen 03/04/2024; '
+                         'glucose 120 mg/dL', {'Jane', 'Doe'}),
+            'Call [NAME] [NAME] on [NUMBER] or [EMAIL], seen [DATE]; glucose 120 mg/dL',
+        )
+
+    def test_datasets_are_streamed_and_join_on_the_pseudonym(self):
+        [header, patient] = self.export('patients')
+        self.assertEqual(header[:3], ['patient', 'gender', 'age_band'])
+        self.assertEqual(patient[1:3], ['female', '90+'])
+
+        [header, issue] = self.export('issues')
+        self.assertEqual(header, ['patient', 'reported_month', 'description'])
+        self.assertEqual(issue[0], patient[0])
+        self.assertEqual(issue[1], f'{timezone.now():%Y-%m}')
+        self.assertEqual(issue[2], '[NAME] reports dizziness since [DATE], call [NUMBER]')
+
+    def test_export_is_for_scientists_only(self):
+        self.assertEqual(self.client.get(self.url, {'dataset': 'addresses'}).status_code, 400)
+        self.client.force_login(self.patient.user)
+        self.assertRedirects(self.client.get(self.url), reverse('core:signin'), fetch_redirect_response=False)
+
+
+class PatientPickerTests(TestCase):
+    def setUp(self):
+        self.doctor = make_profile('doc', UserProfile.Role.DOCTOR)
+        other_doctor = make_profile('other', UserProfile.Role.DOCTOR)
+        when = timezone.now() + timedelta(days=1)
+        self.patients = {}
+        for username, doctor in [('maria', self.doctor), ('marco', self.doctor), ('mark', other_doctor)]:
+            patient = self.patients[username] = make_profile(username, UserProfile.Role.PATIENT)
+            Appointment.objects.create(doctor=doctor, patient=patient, appointment_date=when)
+        # A second appointment must not list the patient twice
+        Appointment.objects.create(doctor=self.doctor, patient=self.patients['maria'], appointment_date=when)
+
+    def test_search_only_finds_the_doctors_own_patients(self):
+        self.client.force_login(self.doctor.user)
+        response = self.client.get(reverse('core:search_patients'), {'q': ' mar '})
+        self.assertEqual(response.json()['results'], [
+            {'id': self.patients['marco'].id, 'name': 'Marco'},
+            {'id': self.patients['maria'].id, 'name': 'Maria'},
+        ])
+        self.assertEqual(self.client.get(reverse('core:search_patients'), {'q': ''}).json()['results'], [])
+
+        self.client.force_login(self.patients['maria'].user)
+        self.assertEqual(self.client.get(reverse('core:search_patients'), {'q': 'mar'}).status_code, 302)
+
+    def test_prescription_form_accepts_only_the_doctors_patients(self):
+        data = {'name': 'Amoxicillin', 'dosage': '500mg', 'frequency': 'Three times daily', 'instructions': 'With food'}
+        form = MedicationForm(dict(data, patient=self.patients['mark'].id), doctor=self.doctor)
+        self.assertIn('patient', form.errors)
+        form = MedicationForm(dict(data, patient=self.patients['maria'].id), doctor=self.doctor)
+        self.assertTrue(form.is_valid())
+        self.assertNotIn('<select', str(form['patient']))
+
+
+class BulkPrescribeTests(TestCase):
+    def setUp(self):
+        self.doctor = make_profile('house', UserProfile.Role.DOCTOR)
+        when = timezone.now() + timedelta(days=1)
+        self.ann, self.bob, self.stranger = (
+            make_profile(name, UserProfile.Role.PATIENT) for name in ('ann', 'bob', 'eve')
+        )
+        for patient in (self.ann, self.bob):
+            Appointment.objects.create(doctor=self.doctor, patient=patient, appointment_date=when)
+        self.client.force_login(self.doctor.user)
+
+    def prescribe(self, *items):
+        return self.client.post(reverse('core:bulk_prescribe'), {'medications': [
+            {'patient': patient.id, 'name': name, 'dosage': '1 tablet', 'frequency': 'Daily', 'instructions': '-'}
+            for patient, name in items
+        ]}, content_type='application/json')
+
+    def test_batch_is_saved_with_one_notification_per_patient(self):
+        version = get_version(profile_version(self.ann.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.prescribe((self.ann, 'Metformin'), (self.ann, 'Lisinopril'), (self.bob, 'Metformin'))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'prescribed': 3, 'patients': 2})
+        self.assertEqual(Notification.objects.get(user_profile=self.ann).message,
+                         'Dr. House prescribed 2 medications: Metformin, Lisinopril')
+        self.assertEqual(Notification.objects.filter(user_profile=self.bob).count(), 1)
+
+        # What the signals would have done per row, done once for the batch
+        self.assertEqual(PatientSummary.objects.get(patient=self.ann).medication_count, 2)
+        self.assertNotEqual(get_version(profile_version(self.ann.id)), version)
+        self.assertEqual(
+            CohortRollup.objects.filter(metric=rollups.MEDICATIONS).aggregate(n=Sum('count'))['n'], 3
+        )
+
+    def test_nothing_is_saved_unless_every_item_is_valid(self):
+        response = self.prescribe((self.ann, 'Metformin'), (self.stranger, 'Metformin'))
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1]['patient'][0]['message'], 'Not one of your patients.')
+        self.assertFalse(Medication.objects.exists())
+
+        with mock.patch('core.prescriptions.MAX_PRESCRIPTION_ITEMS', 1):
+            self.assertEqual(self.prescribe((self.ann, 'A'), (self.ann, 'B')).status_code, 400)
@@ -1,20 +1,28 @@
 # urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'core'  # Ensure the app name is set correctly
 
+# ASYNC_VIEWS = True (for ASGI deployments, see clinical_concept/asgi.py)
+# serves the dashboards and searches from core/async_views.py
+read_views = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
+
 urlpatterns = [
     path('', views.HomeView.as_view(), name='home'),
     path('sign_up/', views.sign_up, name='signup'),
     path('sign_in/', views.sign_in, name='signin'),
     
-    path('doctor_dashboard/', views.doctor_dashboard, name='doctor_dashboard'),
-    path('scientist_dashboard/', views.scientist_dashboard, name='scientist_dashboard'),
-    path('patient_dashboard/', views.patient_dashboard, name='patient_dashboard'),
+    path('doctor_dashboard/', read_views.doctor_dashboard, name='doctor_dashboard'),
+    path('scientist_dashboard/', read_views.scientist_dashboard, name='scientist_dashboard'),
+    path('patient_dashboard/', read_views.patient_dashboard, name='patient_dashboard'),
     path('book-appointment/<int:doctor_id>/', views.book_appointment, name='book_appointment'),
     path('cancel-appointment/<int:appointment_id>/', views.cancel_appointment, name='cancel_appointment'),
     path('appointment/accept/<int:appointment_id>/', views.accept_appointment, name='accept_appointment'),
+    path('appointment/<int:appointment_id>/patient/', views.appointment_patient_details,
+         name='appointment_patient_details'),
+    path('prescriptions/', views.bulk_prescribe, name='bulk_prescribe'),
     path('add_issue/', views.add_issue, name='add_issue'),  # New URL for add_issue view
     path('add-research-post/', views.add_research_post, name='add_research_post'),\
     path('edit-profile/', views.edit_profile, name='edit_profile'),
@@ -23,5 +31,12 @@ urlpatterns = [
     path('project_team/', views.project_team, name='project_team'),
     path('our_story/', views.our_story, name='our_story'),
     path('edit_researcher_profile/', views.edit_researcher_profile, name='edit_researcher_profile'),
+    path('api/risk-score/', views.score_risk, name='score_risk'),
+    path('search/research/', read_views.search_research_posts, name='search_research_posts'),
+    path('search/issues/', read_views.search_issues, name='search_issues'),
+    path('search/patients/', read_views.search_patients, name='search_patients'),
+    path('events/', views.event_stream, name='event_stream'),
+    path('metrics/', views.metrics_report, name='metrics'),
+    path('cohort/export/', views.cohort_export, name='cohort_export'),
     
 ]
@@ -0,0 +1,38 @@
+import time
+
+from django.core.cache import cache
+
+# Change counters kept in the cache. Readers fold them into cache keys or
+# ETags; writers bump them (see core.signals). A counter that was evicted is
+# re-seeded from the clock, so it can never come back with an old value.
+# The counters are only coherent in a cache shared by every worker; core.E001
+# (core/checks.py) rejects a process-local one.
+
+
+def _key(name):
+    return f'core:version:{name}'
+
+
+def get_versions(*names):
+    """Current value of each named counter, in order."""
+    keys = [_key(name) for name in names]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return [found[key] for key in keys]
+
+
+def get_version(name):
+    return get_versions(name)[0]
+
+
+def bump(*names):
+    for name in names:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            # Not seeded yet: the next read seeds a fresh value
+            pass
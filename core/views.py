@@ -8,8 +8,51 @@ from django.urls import reverse
 from django.utils import timezone
 from django.db.models import Q
 
-from .models import UserProfile, Appointment, Issue
+from .models import UserProfile, DoctorProfile, ScientistProfile, PatientProfile, PatientSummary, Appointment, Issue
 from .forms import SignUpForm, IssueForm
+from .decorators import role_required
+from .middleware import get_profile
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
+from . import etags, feed, rollups, summaries
+
+APPOINTMENTS_PAGE_SIZE = 20
+
+
+# List querysets for the dashboards (sync and async), loading only the
+# columns the templates show; a patient's address and medical history are
+# left to appointment_patient_details, fetched when a doctor opens them.
+def doctor_appointments(doctor):
+    """``doctor``'s appointments, each with its patient's user, details and PatientSummary."""
+    return (
+        Appointment.objects.filter(doctor=doctor)
+        .select_related('patient__user', 'patient__summary', 'patient__patient_profile')
+        .only('id', 'appointment_date', 'status', 'patient_id', 'doctor_id', 'patient__role', 'patient__full_name',
+              'patient__user__first_name', 'patient__user__last_name',
+              'patient__patient_profile__gender', 'patient__patient_profile__age',
+              *(f'patient__summary__{field.name}' for field in PatientSummary._meta.concrete_fields))
+    )
+
+
+def patient_appointments(patient):
+    """``patient``'s appointments with the doctor's name and specialization."""
+    return (
+        Appointment.objects.filter(patient=patient)
+        .select_related('doctor__user', 'doctor__doctor_profile')
+        .only('id', 'appointment_date', 'status', 'patient_id', 'doctor_id',
+              'doctor__role', 'doctor__user__first_name', 'doctor__user__last_name',
+              'doctor__doctor_profile__specialization')
+    )
+
+
+def matching_doctors(specializations):
+    """Doctors whose specialization is in ``specializations`` (a list or subquery)."""
+    return (
+        UserProfile.objects.filter(role=UserProfile.Role.DOCTOR, doctor_profile__specialization__in=specializations)
+        .select_related('user', 'doctor_profile')
+        .only('id', 'role', 'user__first_name', 'user__last_name',
+              'doctor_profile__specialization', 'doctor_profile__hospital')
+    )
 
 # Base Views
 class HomeView(TemplateView):
@@ -25,8 +68,18 @@ def sign_up(request):
         name = request.POST.get('name')
         email = request.POST.get('email')
         password = request.POST.get('password')
-        role = request.POST.get('role')
-        
+        role = UserProfile.Role.from_slug(request.POST.get('role'))
+        if role is None:
+            return render(request, 'signup.html', {'error': 'Please choose a role.'}, status=400)
+        age = request.POST.get('age') or None
+        if role == UserProfile.Role.PATIENT and age is not None:
+            try:
+                age = int(age)
+            except ValueError:
+                age = None
+            if age is None or not 0 <= age <= 150:
+                return render(request, 'signup.html', {'error': 'Please enter a valid age.'}, status=400)
+
         # Create user and profile
         user = User.objects.create_user(username=email, email=email, password=password)
         user.first_name = name
@@ -35,26 +88,33 @@ def sign_up(request):
         user_profile = UserProfile.objects.create(user=user, role=role, full_name=name)
 
         # Role-specific information
-        if role == 'doctor':
-            user_profile.license_number = request.POST.get('license_number', '')
-            user_profile.specialization = request.POST.get('specialization', '')
-            user_profile.hospital = request.POST.get('hospital', '')
-        elif role == 'scientist':
-            user_profile.research_area = request.POST.get('research_area', '')
-            user_profile.institution = request.POST.get('institution', '')
-        elif role == 'patient':
-            user_profile.gender = request.POST.get('gender', '')
-            user_profile.age = request.POST.get('age', None)
-            user_profile.address = request.POST.get('address', '')
-            user_profile.medical_history = request.POST.get('medical_history', '')
-
-        user_profile.save()
+        if role == UserProfile.Role.DOCTOR:
+            DoctorProfile.objects.create(
+                profile=user_profile,
+                license_number=request.POST.get('license_number', ''),
+                specialization=request.POST.get('specialization', ''),
+                hospital=request.POST.get('hospital', ''),
+            )
+        elif role == UserProfile.Role.SCIENTIST:
+            ScientistProfile.objects.create(
+                profile=user_profile,
+                research_area=request.POST.get('research_area', ''),
+                institution=request.POST.get('institution', ''),
+            )
+        elif role == UserProfile.Role.PATIENT:
+            PatientProfile.objects.create(
+                profile=user_profile,
+                gender=request.POST.get('gender', ''),
+                age=age,
+                address=request.POST.get('address', ''),
+                medical_history=request.POST.get('medical_history', ''),
+            )
 
         # Authentication and redirect
         user = authenticate(request, username=email, password=password)
         if user is not None:
             login(request, user)
-            return redirect(reverse(f'core:{role}_dashboard'))
+            return redirect(reverse(f'core:{role.slug}_dashboard'))
         return render(request, 'signup.html', {'error': 'Authentication failed'})
 
     return render(request, 'signup.html')
@@ -74,15 +134,14 @@ def sign_in(request):
         if user is not None:
             login(request, user)
             
-            try:
-                user_profile = UserProfile.objects.get(user=user)
-                if user_profile.role in ['doctor', 'patient', 'scientist']:
-                    return redirect(f'core:{user_profile.role}_dashboard')
-                messages.error(request, "Role not assigned correctly.")
-                return redirect('core:login')
-            except UserProfile.DoesNotExist:
+            user_profile = get_profile(request)
+            if user_profile is None:
                 messages.error(request, "User profile does not exist.")
                 return redirect('core:signin')
+            if user_profile.role in UserProfile.Role.values:
+                return redirect(f'core:{user_profile.role_slug}_dashboard')
+            messages.error(request, "Role not assigned correctly.")
+            return redirect('core:login')
 
         messages.error(request, "Invalid email or password.")
         return redirect('core:signin')
@@ -101,42 +160,50 @@ from django.contrib.auth.decorators import login_required
 from .models import UserProfile, Appointment, Issue, Medication, ResearchPost, Notification
 from .forms import MedicationForm
 
-@login_required
+@role_required(UserProfile.Role.DOCTOR, denied_template='unauthorized.html')
+@cache_control(private=True, no_cache=True)
+@etag(etags.doctor_dashboard)
 def doctor_dashboard(request):
-    # Get the logged-in user's profile and ensure they are a doctor
-    try:
-        user_profile = UserProfile.objects.get(user=request.user, role='doctor')
-    except UserProfile.DoesNotExist:
-        return render(request, 'unauthorized.html')
-
-    # Fetch all appointments related to the logged-in doctor
-    appointments = Appointment.objects.filter(doctor=user_profile)
+    user_profile = request.profile
+
+    # One page of the doctor's appointments, each joined to its patient's
+    # PatientSummary row (see core/summaries.py) instead of querying issues
+    # and medications per patient
+    page = request.GET.get('page', '')
+    page_number = int(page) if page.isdigit() and int(page) > 0 else 1
+    offset = (page_number - 1) * APPOINTMENTS_PAGE_SIZE
+    appointments = list(
+        doctor_appointments(user_profile)
+        .order_by('appointment_date', 'id')[offset:offset + APPOINTMENTS_PAGE_SIZE + 1]
+    )
     appointment_details = []
-
-    # Gather detailed information for each appointment
-    for appointment in appointments:
+    for appointment in appointments[:APPOINTMENTS_PAGE_SIZE]:
         patient_profile = appointment.patient
-        issues = Issue.objects.filter(patient=patient_profile)
-        medications = Medication.objects.filter(patient=patient_profile)
-
+        if not hasattr(patient_profile, 'summary'):
+            # Not backfilled yet (see the rebuild_patient_summaries command)
+            patient_profile.summary = summaries.refresh(patient_profile.id)
         appointment_details.append({
             'appointment': appointment,
             'patient_profile': patient_profile,
-            'issues': issues,
-            'medications': medications,
+            'summary': patient_profile.summary,
         })
+    appointment_page = {
+        'number': page_number,
+        'has_previous': page_number > 1,
+        'has_next': len(appointments) > APPOINTMENTS_PAGE_SIZE,
+    }
 
     # Handle Medication Form submission
     if request.method == 'POST':
-        medication_form = MedicationForm(request.POST)
+        medication_form = MedicationForm(request.POST, doctor=user_profile)
         if medication_form.is_valid():
             medication_form.save()
             return redirect('core:doctor_dashboard')
     else:
-        medication_form = MedicationForm()
+        medication_form = MedicationForm(doctor=user_profile)
 
     # Fetch research posts and notifications
-    research_posts = ResearchPost.objects.all().order_by('-created_at')[:5]
+    research_posts = feed.latest_posts(5)
     notifications = Notification.objects.filter(user_profile=user_profile).order_by('-created_at')[:5]
     unread_notifications_count = Notification.objects.filter(user_profile=user_profile, is_read=False).count()
 
@@ -144,6 +211,7 @@ def doctor_dashboard(request):
     context = {
         'profile': user_profile,
         'appointment_details': appointment_details,
+        'appointment_page': appointment_page,
         'medication_form': medication_form,
         'research_posts': research_posts,
         'notifications': notifications,
@@ -152,6 +220,66 @@ def doctor_dashboard(request):
     return render(request, 'doctor_dashboard.html', context)
 
 
+@role_required(UserProfile.Role.DOCTOR)
+@cache_control(private=True, no_cache=True)
+def appointment_patient_details(request, appointment_id):
+    """Address and medical history of one appointment's patient, for the doctor's details modal."""
+    appointment = get_object_or_404(Appointment.objects.only('patient_id'), id=appointment_id, doctor=request.profile)
+    details = (
+        PatientProfile.objects.filter(profile_id=appointment.patient_id)
+        .values('address', 'medical_history')
+        .first()
+    ) or {'address': None, 'medical_history': None}
+    return JsonResponse(details)
+
+
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from . import prescriptions, search
+from .forms import PrescriptionForm
+
+@role_required(UserProfile.Role.DOCTOR)
+@require_POST
+def bulk_prescribe(request):
+    """Prescribe a list of medications, for one or more of the doctor's patients, in one request.
+
+    Takes a JSON array of {"patient", "name", "dosage", "frequency",
+    "instructions"} objects, or {"medications": [...]}. Nothing is saved
+    unless every item is valid; otherwise the errors come back per item.
+    """
+    try:
+        payload = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Request body must be valid JSON.'}, status=400)
+    items = payload.get('medications') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return JsonResponse({'error': 'No medications to prescribe.'}, status=400)
+    if len(items) > prescriptions.MAX_PRESCRIPTION_ITEMS:
+        return JsonResponse(
+            {'error': f'At most {prescriptions.MAX_PRESCRIPTION_ITEMS} medications per request.'}, status=400
+        )
+
+    doctor = request.profile
+    # Every patient in the batch checked with one query
+    patient_ids = set()
+    for item in items:
+        try:
+            patient_ids.add(int(item.get('patient')))
+        except (TypeError, ValueError):
+            pass
+    patients = set(search.doctor_patients(doctor).filter(id__in=patient_ids).values_list('id', flat=True))
+    forms = [PrescriptionForm(item, patients=patients) for item in items]
+    errors = [form.errors.get_json_data() for form in forms]
+    if any(errors):
+        return JsonResponse({'errors': errors}, status=400)
+
+    medications = prescriptions.prescribe(doctor, [form.medication() for form in forms])
+    return JsonResponse({
+        'prescribed': len(medications),
+        'patients': len({medication.patient_id for medication in medications}),
+    }, status=201)
 
 
 from django.shortcuts import render, redirect
@@ -161,27 +289,23 @@ from .models import UserProfile, Medication, Appointment, Issue
 from django.shortcuts import render, redirect
 from core.models import UserProfile, Issue, Medication, Appointment
 
-@login_required
+@role_required(UserProfile.Role.PATIENT)
+@cache_control(private=True, no_cache=True)
+@etag(etags.patient_dashboard)
 def patient_dashboard(request):
-    try:
-        user_profile = UserProfile.objects.get(user=request.user, role='patient')
-    except UserProfile.DoesNotExist:
-        return redirect('core:signin')
+    user_profile = request.profile
 
     # Fetch issues related to the patient
     patient_issues = Issue.objects.filter(patient=user_profile)
 
     # Fetch doctors based on specialization matching patient issues
     issue_descriptions = patient_issues.values_list('description', flat=True)
-    doctors = UserProfile.objects.filter(
-        role='doctor',
-        specialization__in=issue_descriptions  # Match doctor's specialization with issue descriptions
-    )
+    doctors = matching_doctors(issue_descriptions)
 
     context = {
         'profile': user_profile,
-        'medical_history': user_profile.medical_history,
-        'appointments': Appointment.objects.filter(patient=user_profile),
+        'medical_history': user_profile.details.medical_history if user_profile.details else None,
+        'appointments': patient_appointments(user_profile),
         'issues': patient_issues,
         'medications': Medication.objects.filter(patient=user_profile),
         'doctors': doctors,
@@ -195,35 +319,39 @@ def patient_dashboard(request):
 from django.shortcuts import render, redirect
 from .models import UserProfile, Notification, ResearchPost
 
-@login_required
+@role_required(UserProfile.Role.SCIENTIST)
+@cache_control(private=True, no_cache=True)
+@etag(etags.scientist_dashboard)
 def scientist_dashboard(request):
-    try:
-        user_profile = UserProfile.objects.get(user=request.user, role='scientist')
-    except UserProfile.DoesNotExist:
-        return redirect('core:signin')
+    user_profile = request.profile
 
     # Get unread notifications for the logged-in scientist
     unread_notifications_count = Notification.objects.filter(user_profile=user_profile, is_read=False).count()
 
-    # Fetch all research posts (removing the scientist filter)
-    research_posts = ResearchPost.objects.all()
+    # One cached page of the research feed
+    try:
+        research_page = feed.feed_page(request.GET.get('page', 1))
+    except ValueError:
+        research_page = feed.feed_page(1)
 
     # Pass context
     context = {
         'profile': user_profile,
-        'research_area': user_profile.research_area,
-        'institution': user_profile.institution,
-        'research_posts': research_posts,  # Fetching all research posts
+        'research_area': user_profile.details.research_area if user_profile.details else None,
+        'institution': user_profile.details.institution if user_profile.details else None,
+        'research_posts': research_page['posts'],
+        'research_page': research_page,
+        'cohort': rollups.dashboard(),
         'unread_notifications_count': unread_notifications_count,  # Unread notifications count
     }
 
     return render(request, 'scientist_dashboard.html', context)
 
 
-@login_required
+@role_required()
 def mark_notification_as_read(request, notification_id):
     try:
-        notification = Notification.objects.get(id=notification_id, user_profile__user=request.user)
+        notification = Notification.objects.get(id=notification_id, user_profile=request.profile)
         notification.is_read = True
         notification.save()
     except Notification.DoesNotExist:
@@ -242,25 +370,30 @@ from django.shortcuts import render, get_object_or_404, redirect
 from .models import UserProfile, Appointment
 from .forms import AppointmentForm
 from django.contrib.auth.decorators import login_required
+from .forms import SlotBookingForm
+from . import slots
 
-@login_required
+@role_required(UserProfile.Role.PATIENT)
 def book_appointment(request, doctor_id):
     # Get the doctor object based on the ID
-    doctor = get_object_or_404(UserProfile, id=doctor_id, role='doctor')
-    
+    doctor = get_object_or_404(
+        UserProfile.objects.select_related('doctor_profile'), id=doctor_id, role=UserProfile.Role.DOCTOR
+    )
+    available = slots.free_slots(doctor)
+
     if request.method == 'POST':
-        form = AppointmentForm(request.POST)
+        form = SlotBookingForm(request.POST, free_slots=available)
         if form.is_valid():
-            # Save the form but don't commit yet
-            appointment = form.save(commit=False)
-            # Assign the doctor and the patient (current user)
-            appointment.doctor = doctor
-            appointment.patient = UserProfile.objects.get(user=request.user, role='patient')
-            appointment.save()
+            try:
+                slots.book_slot(doctor, request.profile, form.cleaned_data['slot'])
+            except slots.SlotUnavailable as e:
+                messages.error(request, str(e))
+                return redirect('core:book_appointment', doctor_id=doctor.id)
+            messages.success(request, "Appointment booked successfully.")
             return redirect('core:patient_dashboard')
+        messages.error(request, "That slot is no longer available, please pick another.")
     else:
-        # Prefill the doctor field
-        form = AppointmentForm(initial={'doctor': doctor})
+        form = SlotBookingForm(free_slots=available)
 
     return render(request, 'book_appointment.html', {'form': form, 'doctor': doctor})
 
@@ -272,18 +405,17 @@ from django.contrib.auth.decorators import login_required
 
 
 
-@login_required
+@role_required()
 def cancel_appointment(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id)
     
     # Check if the user's profile matches the appointment's patient
-    user_profile = request.user.userprofile
-    if user_profile != appointment.patient:
+    if request.profile.id != appointment.patient_id:
         messages.error(request, "You don't have permission to cancel this appointment.")
         return redirect('core:patient_dashboard')
     
-    if appointment.status == "Scheduled":
-        appointment.status = "Cancelled"
+    if appointment.status == Appointment.Status.SCHEDULED:
+        appointment.status = Appointment.Status.CANCELLED
         appointment.save()
         messages.success(request, "Appointment cancelled successfully.")
     else:
@@ -291,18 +423,17 @@ def cancel_appointment(request, appointment_id):
     
     return redirect('core:patient_dashboard')
 
-@login_required
+@role_required()
 def accept_appointment(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id)
     
     # Check if the user's profile matches the appointment's doctor
-    user_profile = request.user.userprofile
-    if user_profile != appointment.doctor:
+    if request.profile.id != appointment.doctor_id:
         messages.error(request, "You don't have permission to accept this appointment.")
         return redirect('core:doctor_dashboard')
     
-    if appointment.status == "Scheduled":
-        appointment.status = "Accepted"
+    if appointment.status == Appointment.Status.SCHEDULED:
+        appointment.status = Appointment.Status.ACCEPTED
         appointment.save()
         messages.success(request, "Appointment accepted successfully.")
     else:
@@ -315,13 +446,13 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.csrf import csrf_exempt
 
 @csrf_exempt
-@login_required
+@role_required(UserProfile.Role.PATIENT)
 def add_issue(request):
     if request.method == 'POST':
         description = request.POST.get('description')
         report = request.FILES.get('report', None)
 
-        user_profile = UserProfile.objects.get(user=request.user, role='patient')
+        user_profile = request.profile
 
         # Create and save the issue
         new_issue = Issue.objects.create(
@@ -341,14 +472,13 @@ from django.shortcuts import render, redirect
 from .models import ResearchPost, UserProfile, Notification
 from django.contrib.auth.decorators import login_required
 
-@login_required
+@role_required(UserProfile.Role.SCIENTIST)
 def add_research_post(request):
     if request.method == 'POST':
         title = request.POST.get('title')
         content = request.POST.get('content')
         
-        # Assuming a logged-in scientist is posting
-        user_profile = UserProfile.objects.get(user=request.user, role='scientist')
+        user_profile = request.profile
 
         # Create the research post
         post = ResearchPost.objects.create(scientist=user_profile, title=title, content=content)
@@ -369,20 +499,18 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from .forms import UserProfileForm,DoctorProfileForm
 
-@login_required
+@role_required(UserProfile.Role.PATIENT)
 def edit_profile(request):
-    try:
-        user_profile = UserProfile.objects.get(user=request.user)
-    except UserProfile.DoesNotExist:
-        return redirect('core:signin')
+    user_profile = request.profile
+    details = user_profile.details or PatientProfile(profile=user_profile)
 
     if request.method == 'POST':
-        form = UserProfileForm(request.POST, instance=user_profile)
+        form = UserProfileForm(request.POST, instance=details)
         if form.is_valid():
             form.save()
             return redirect('core:patient_dashboard')  # Redirect to the dashboard after saving
     else:
-        form = UserProfileForm(instance=user_profile)
+        form = UserProfileForm(instance=details)
 
     return render(request, 'edit_profile.html', {'form': form})
 
@@ -393,22 +521,18 @@ def logout_view(request):
     logout(request)
     return redirect('core:signin')  # Replace with the name of your login/signin URL
 
-@login_required
+@role_required(UserProfile.Role.DOCTOR)
 def edit_doctor_profile(request):
-    try:
-        # Fetch the doctor's profile based on the logged-in user
-        user_profile = UserProfile.objects.get(user=request.user, role='doctor')
-    except UserProfile.DoesNotExist:
-        # If the doctor profile does not exist, redirect to sign in
-        return redirect('core:signin')
+    user_profile = request.profile
+    details = user_profile.details or DoctorProfile(profile=user_profile)
 
     if request.method == 'POST':
-        form = DoctorProfileForm(request.POST, instance=user_profile)
+        form = DoctorProfileForm(request.POST, instance=details)
         if form.is_valid():
             form.save()  # Save the form and update the doctor's profile
             return redirect('core:doctor_dashboard')  # Redirect to doctor's dashboard after saving
     else:
-        form = DoctorProfileForm(instance=user_profile)
+        form = DoctorProfileForm(instance=details)
 
     return render(request, 'edit_doctor_profile.html', {'form': form})
 
@@ -419,22 +543,18 @@ from django.contrib.auth.decorators import login_required
 from .models import UserProfile
 from .forms import ResearcherProfileForm
 
-@login_required
+@role_required(UserProfile.Role.SCIENTIST)
 def edit_researcher_profile(request):
-    try:
-        # Ensure the user is a researcher by checking the role
-        user_profile = UserProfile.objects.get(user=request.user, role='researcher')
-    except UserProfile.DoesNotExist:
-        # If the user profile is not found, redirect to the sign-in page
-        return redirect('core:signin')  # You can modify this if you want to show an error message instead
+    user_profile = request.profile
+    details = user_profile.details or ScientistProfile(profile=user_profile)
 
     if request.method == 'POST':
-        form = ResearcherProfileForm(request.POST, instance=user_profile)
+        form = ResearcherProfileForm(request.POST, instance=details)
         if form.is_valid():
             form.save()
-            return redirect('researcher_dashboard')  # Redirect to the researcher dashboard after saving
+            return redirect('core:scientist_dashboard')  # Redirect to the scientist dashboard after saving
     else:
-        form = ResearcherProfileForm(instance=user_profile)
+        form = ResearcherProfileForm(instance=details)
 
     return render(request, 'researcher_profile.html', {'form': form})
 
@@ -442,4 +562,221 @@ def project_team(request):
     return render(request, 'Project_team.html')
 
 def our_story(request):
-    return render(request, 'our_story.html')
\ No newline at end of file
+    return render(request, 'our_story.html')
+
+import json
+import logging
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from risk_scoring import InvalidRecord, get_scorer
+
+logger = logging.getLogger(__name__)
+
+# Scoring runs inside the request; larger batches belong in train_model.py/risk_scoring.py
+MAX_RISK_RECORDS = 1000
+
+@login_required
+@require_POST
+def score_risk(request):
+    # Accepts {"record": {...}}, {"records": [...]}, a bare record or a bare list
+    try:
+        payload = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Request body must be valid JSON.'}, status=400)
+
+    if isinstance(payload, dict) and ('record' in payload or 'records' in payload):
+        records = payload.get('records', payload.get('record'))
+    else:
+        records = payload
+    if not records:
+        return JsonResponse({'error': 'No records to score.'}, status=400)
+    if isinstance(records, list) and len(records) > MAX_RISK_RECORDS:
+        return JsonResponse(
+            {'error': f'At most {MAX_RISK_RECORDS} records can be scored per request.'}, status=400)
+
+    try:
+        scorer = get_scorer()
+    except Exception:
+        # A missing or mismatched artifact is a deployment problem, not the client's
+        logger.exception("Could not load the risk model")
+        return JsonResponse({'error': 'Risk scoring is unavailable.'}, status=503)
+    try:
+        results = scorer.score(records)
+    except InvalidRecord as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({'results': results})
+
+
+from core import search
+
+def _search_page(request):
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    return request.GET.get('q', '').strip(), page
+
+@role_required()
+def search_research_posts(request):
+    query, page = _search_page(request)
+    results, has_next = search.search_research_posts(query, page=page)
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'has_next': has_next,
+        'results': [
+            {
+                'id': post.id,
+                'title': post.title,
+                'snippet': snippet,
+                'scientist': post.scientist.full_name,
+                'created_at': post.created_at.isoformat(),
+            }
+            for post, snippet in results
+        ],
+    })
+
+@role_required(UserProfile.Role.DOCTOR)
+def search_issues(request):
+    query, page = _search_page(request)
+    results, has_next = search.search_issues(query, request.profile, page=page)
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'has_next': has_next,
+        'results': [
+            {
+                'id': issue.id,
+                'patient': issue.patient.full_name,
+                'snippet': snippet,
+                'created_at': issue.created_at.isoformat(),
+            }
+            for issue, snippet in results
+        ],
+    })
+
+@role_required(UserProfile.Role.DOCTOR)
+def search_patients(request):
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {'id': patient['id'], 'name': patient['full_name']}
+            for patient in search.search_patients(query, request.profile)
+        ],
+    })
+
+
+import asyncio
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from . import events
+from .middleware import aget_profile
+
+async def event_stream(request):
+    """Server-sent events for the logged-in user's dashboard (see core/events.py).
+
+    Serve under ASGI (clinical_concept/asgi.py): the stream is an async
+    generator, so idle connections wait on the event loop, not on a thread.
+    Without ASYNC_VIEWS the site is assumed to run under WSGI, where Django
+    would buffer the endless stream and hold a worker forever; the answer is
+    then 204, which tells EventSource to stop reconnecting.
+    """
+    if not getattr(settings, 'ASYNC_VIEWS', False):
+        return HttpResponse(status=204)
+    profile = await aget_profile(request)
+    if profile is None:
+        return HttpResponse(status=401)
+    broker = events.get_broker()
+
+    async def stream():
+        subscription = broker.subscribe(events.channels_for(profile))
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await subscription.get(events.EVENT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comment line; keeps proxies from closing an idle connection
+                    yield ': ping\n\n'
+                    continue
+                if event is events.OVERFLOW:
+                    yield 'event: reload\ndata: {}\n\n'
+                    break
+                yield events.format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+import hmac
+
+from django.http import Http404
+from . import metrics
+
+
+def metrics_report(request):
+    """Per-view timings from core.metrics: JSON for staff, Prometheus text with ?format=prometheus.
+
+    Open to staff users, or to a scraper sending "Authorization: Bearer
+    <METRICS_TOKEN>". 404 while METRICS_ENABLED is off.
+    """
+    if not metrics.METRICS_ENABLED:
+        raise Http404
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    authorized = (request.user.is_authenticated and request.user.is_staff) or (
+        metrics.METRICS_TOKEN and hmac.compare_digest(token.encode(), metrics.METRICS_TOKEN.encode())
+    )
+    if not authorized:
+        return HttpResponse(status=403)
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    return JsonResponse({'window': metrics.METRICS_BUFFER_SIZE, 'views': metrics.summarize()})
+
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from . import cohort
+
+
+async def _aiter_chunks(chunks):
+    # Under ASGI Django would read a sync iterator into memory before sending
+    # it; pull it a chunk at a time on the request's thread instead
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+@role_required(UserProfile.Role.SCIENTIST)
+def cohort_export(request):
+    """Stream a de-identified cohort dataset (see core/cohort.py).
+
+    ?dataset=patients|issues&format=csv|parquet
+    """
+    dataset = request.GET.get('dataset', 'patients')
+    fmt = request.GET.get('format', 'csv')
+    if dataset not in cohort.DATASETS or fmt not in cohort.FORMATS:
+        return JsonResponse({'error': 'Unknown dataset or format.'}, status=400)
+    try:
+        chunks = cohort.export(dataset, fmt)
+    except cohort.ExportUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if getattr(settings, 'ASYNC_VIEWS', False):
+        chunks = _aiter_chunks(chunks)
+    content_type, extension = cohort.FORMATS[fmt]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    filename = f"cohort-{dataset}-{timezone.now():%Y%m%d}.{extension}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,175 @@
+"""Shared, lazily loaded model artifacts.
+
+Models are stored as uncompressed joblib files next to a JSON manifest
+(``<name>.json``) that records the SHA-256 of the artifact and its input
+schema. Loading verifies both and then opens the numpy arrays with
+``mmap_mode='r'``, so every Streamlit/Django worker on a host maps the same
+page-cache pages instead of each holding a private copy.
+
+Usage:
+    from model_registry import registry
+    svc = registry.get('svc')
+
+    # Convert a legacy pickle / compressed joblib file
+    python model_registry.py convert medical_model.pkl medical_model.joblib \\
+        --features Age,BloodPressure,Glucose,Cholesterol,HeartRate
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+
+FORMAT_VERSION = 1
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ModelIntegrityError(ValueError):
+    """Raised when an artifact does not match its manifest or expected schema."""
+
+
+def manifest_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_model(model, path, features=None, classes=None, **metadata):
+    """Write ``model`` in the mmap-able format and return its manifest."""
+    # compress=0 keeps the numpy arrays raw on disk, which mmap_mode needs
+    joblib.dump(model, path, compress=0)
+
+    manifest = dict(metadata)
+    manifest.update({
+        'format_version': FORMAT_VERSION,
+        'artifact': os.path.basename(path),
+        'sha256': file_sha256(path),
+        'saved_at': datetime.now(timezone.utc).isoformat(),
+        'model_class': f"{type(model).__module__}.{type(model).__name__}",
+        'features': list(features) if features is not None else None,
+        'classes': np.asarray(classes).tolist() if classes is not None else None,
+    })
+    with open(manifest_path(path), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path):
+    try:
+        with open(manifest_path(path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ModelIntegrityError(
+            f"No manifest found for '{path}'; create the artifact with "
+            f"'python model_registry.py convert <legacy model> {path}' or by retraining"
+        )
+
+
+def load_model(path, features=None, mmap_mode='r', verify_hash=True):
+    """Validate ``path`` against its manifest and load it memory-mapped.
+
+    ``features``, when given, is the column order the caller will feed the
+    model; it must match what the model was trained on.
+    """
+    manifest = read_manifest(path)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ModelIntegrityError(
+            f"'{path}' has format version {manifest.get('format_version')}, expected {FORMAT_VERSION}"
+        )
+    if verify_hash and file_sha256(path) != manifest['sha256']:
+        raise ModelIntegrityError(f"'{path}' does not match the SHA-256 recorded in its manifest")
+    if features is not None and manifest.get('features') is not None \
+            and list(features) != manifest['features']:
+        raise ModelIntegrityError(f"'{path}' was trained on different features than requested")
+
+    model = joblib.load(path, mmap_mode=mmap_mode)
+
+    n_features = getattr(model, 'n_features_in_', None)
+    if manifest.get('features') is not None and n_features is not None \
+            and n_features != len(manifest['features']):
+        raise ModelIntegrityError(
+            f"'{path}' expects {n_features} features but its manifest lists {len(manifest['features'])}"
+        )
+    return model, manifest
+
+
+class ModelRegistry:
+    """Name -> artifact mapping that loads each model once, on first use."""
+
+    def __init__(self):
+        self._specs = {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, features=None):
+        self._specs[name] = {'path': path, 'features': features}
+        self._loaded.pop(name, None)
+
+    def get(self, name):
+        return self.get_with_manifest(name)[0]
+
+    def manifest(self, name):
+        return self.get_with_manifest(name)[1]
+
+    def get_with_manifest(self, name):
+        entry = self._loaded.get(name)
+        if entry is None:
+            with self._lock:
+                entry = self._loaded.get(name)
+                if entry is None:
+                    spec = self._specs[name]
+                    entry = load_model(spec['path'], features=spec['features'])
+                    self._loaded[name] = entry
+        return entry
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def unload(self, name):
+        self._loaded.pop(name, None)
+
+
+RISK_FEATURES = ["Age", "BloodPressure", "Glucose", "Cholesterol", "HeartRate"]
+
+registry = ModelRegistry()
+registry.register('risk', os.path.join(BASE_DIR, 'medical_model.joblib'), features=RISK_FEATURES)
+registry.register('svc', os.path.join(BASE_DIR, 'Medical Recommendation System AI - ML', 'models', 'svc.joblib'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model artifact utilities")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help="re-save a legacy pickle/joblib file with a manifest")
+    convert.add_argument('source')
+    convert.add_argument('target')
+    convert.add_argument('--features', help="comma-separated feature names, in column order")
+
+    verify = subparsers.add_parser('verify', help="check an artifact against its manifest")
+    verify.add_argument('path')
+
+    args = parser.parse_args()
+    if args.command == 'convert':
+        # Only convert files you trust: this is the one place we still unpickle blindly
+        model = joblib.load(args.source)
+        features = args.features.split(',') if args.features else None
+        manifest = save_model(model, args.target, features=features,
+                              classes=getattr(model, 'classes_', None), converted_from=args.source)
+        print(f"Saved '{args.target}' ({manifest['sha256'][:12]})")
+    else:
+        _, manifest = load_model(args.path)
+        print(f"'{args.path}' OK ({manifest['model_class']}, {manifest['sha256'][:12]})")
+
+
+if __name__ == '__main__':
+    main()
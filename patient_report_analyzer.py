@@ -1,5 +1,7 @@
+import argparse
 import json
 import re
+import sys
 import torch
 import numpy as np
 import pandas as pd
@@ -13,19 +15,27 @@ from transformers import (
     AutoModelForSequenceClassification
 )
 
+from pipeline_tracing import NullTracer, Tracer, profiled
+
 class AdvancedMedicalIntelligenceSystem:
-    def __init__(self):
+    def __init__(self, tracer=None):
+        # Stage timings (see pipeline_tracing.py); NullTracer records nothing
+        self.tracer = tracer or NullTracer()
+
         # Device configuration
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         
         # Advanced Biomedical NER Model
-        self._initialize_ner_model()
+        with self.tracer.stage("load_ner_model"):
+            self._initialize_ner_model()
         
         # Medical Specialty Classification Model
-        self._initialize_specialty_model()
+        with self.tracer.stage("load_specialty_model"):
+            self._initialize_specialty_model()
         
         # Medical Risk Assessment Knowledge Base
-        self._load_risk_knowledge_base()
+        with self.tracer.stage("load_risk_knowledge_base"):
+            self._load_risk_knowledge_base()
 
     def _initialize_ner_model(self):
         try:
@@ -77,11 +87,12 @@ class AdvancedMedicalIntelligenceSystem:
     def extract_pdf_text(self, pdf_file):
         """Advanced PDF text extraction with error handling"""
         try:
-            with pdfplumber.open(pdf_file) as pdf:
+            with self.tracer.stage("extract_pdf_text") as span, pdfplumber.open(pdf_file) as pdf:
                 full_text = "\n".join([
                     page.extract_text() for page in pdf.pages 
                     if page.extract_text() is not None
                 ])
+                span.set(pages=len(pdf.pages), chars=len(full_text))
                 return full_text
         except Exception as e:
             st.error(f"Critical PDF extraction error: {e}")
@@ -97,9 +108,17 @@ class AdvancedMedicalIntelligenceSystem:
             # Truncate text to model's max length
             max_length = self.ner_tokenizer.model_max_length
             text = text[:max_length]
+
+            if self.tracer.enabled:
+                # The pipeline tokenizes internally; tokenizing once more here
+                # (only while tracing) separates its cost from the forward pass
+                with self.tracer.stage("ner_tokenization") as span:
+                    span.set(tokens=len(self.ner_tokenizer(text, truncation=True)["input_ids"]))
             
             # Perform Named Entity Recognition
-            entities = self.ner_pipeline(text)
+            with self.tracer.stage("ner_forward") as span:
+                entities = self.ner_pipeline(text)
+                span.set(entities=len(entities))
             
             # Updated organized entities with fallback
             organized_entities = {
@@ -110,30 +129,31 @@ class AdvancedMedicalIntelligenceSystem:
             }
             
             # Process and categorize entities
-            for entity in entities:
-                entity_text = entity.get('word', '')
-                entity_type = entity.get('entity_group', '').lower()
+            with self.tracer.stage("ner_aggregation"):
+                for entity in entities:
+                    entity_text = entity.get('word', '')
+                    entity_type = entity.get('entity_group', '').lower()
                 
-                if not entity_text:
-                    continue
+                    if not entity_text:
+                        continue
                 
-                # Categorize entities
-                if any(keyword in entity_type for keyword in ['disease', 'condition', 'disorder']):
-                    if entity_text not in organized_entities["Medical_Conditions"]:
-                        organized_entities["Medical_Conditions"].append(entity_text)
+                    # Categorize entities
+                    if any(keyword in entity_type for keyword in ['disease', 'condition', 'disorder']):
+                        if entity_text not in organized_entities["Medical_Conditions"]:
+                            organized_entities["Medical_Conditions"].append(entity_text)
                 
-                elif any(keyword in entity_type for keyword in ['drug', 'medication', 'medicine']):
-                    if entity_text not in organized_entities["Medications"]:
-                        organized_entities["Medications"].append(entity_text)
+                    elif any(keyword in entity_type for keyword in ['drug', 'medication', 'medicine']):
+                        if entity_text not in organized_entities["Medications"]:
+                            organized_entities["Medications"].append(entity_text)
                 
-                elif any(keyword in entity_type for keyword in ['procedure', 'test', 'exam', 'treatment']):
-                    if entity_text not in organized_entities["Procedures"]:
-                        organized_entities["Procedures"].append(entity_text)
+                    elif any(keyword in entity_type for keyword in ['procedure', 'test', 'exam', 'treatment']):
+                        if entity_text not in organized_entities["Procedures"]:
+                            organized_entities["Procedures"].append(entity_text)
                 
-                # Capture numerical lab results
-                if re.search(r'\d+(\.\d+)?', entity_text):
-                    if entity_text not in organized_entities["Lab_Results"]:
-                        organized_entities["Lab_Results"].append(entity_text)
+                    # Capture numerical lab results
+                    if re.search(r'\d+(\.\d+)?', entity_text):
+                        if entity_text not in organized_entities["Lab_Results"]:
+                            organized_entities["Lab_Results"].append(entity_text)
             
             return organized_entities
         
@@ -177,6 +197,10 @@ class AdvancedMedicalIntelligenceSystem:
 
     def medical_specialty_classification(self, text):
         """Advanced Medical Specialty Classification"""
+        with self.tracer.stage("medical_specialty_classification"):
+            return self._medical_specialty_classification(text)
+
+    def _medical_specialty_classification(self, text):
         if not self.specialty_model or not self.specialty_tokenizer:
             st.warning("Specialty classification model not loaded.")
             return {"Relevant_Medical_Specialties": []}
@@ -193,19 +217,21 @@ class AdvancedMedicalIntelligenceSystem:
             text = text[:max_length]
             
             # Prepare input
-            inputs = self.specialty_tokenizer(
-                text, 
-                return_tensors="pt", 
-                truncation=True, 
-                max_length=max_length
-            )
+            with self.tracer.stage("specialty_tokenization") as span:
+                inputs = self.specialty_tokenizer(
+                    text, 
+                    return_tensors="pt", 
+                    truncation=True, 
+                    max_length=max_length
+                )
+                span.set(tokens=int(inputs["input_ids"].shape[1]))
             
             # Move inputs to the same device as the model
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
             self.specialty_model.to(self.device)
             
             # Perform classification
-            with torch.no_grad():
+            with self.tracer.stage("specialty_forward"), torch.no_grad():
                 outputs = self.specialty_model(**inputs)
                 
                 # Use safe conversion methods
@@ -235,6 +261,11 @@ class AdvancedMedicalIntelligenceSystem:
 
     def medical_risk_assessment(self, text, entities):
         """Advanced Medical Risk Assessment"""
+        with self.tracer.stage("medical_risk_assessment") as span:
+            span.set(conditions=len(entities.get("Medical_Conditions", [])))
+            return self._medical_risk_assessment(entities)
+
+    def _medical_risk_assessment(self, entities):
         # Enhanced risk assessment logic
         risk_assessment = {
             "Overall_Risk_Level": "Low",
@@ -278,11 +309,24 @@ class AdvancedMedicalIntelligenceSystem:
         return risk_assessment
 
 
+def analyze_report(system, pdf_file):
+    """Run every stage on one PDF; None if no text could be extracted."""
+    raw_text = system.extract_pdf_text(pdf_file)
+    if not raw_text:
+        return None
+    medical_entities = system.advanced_medical_ner(raw_text)
+    return {
+        "entities": medical_entities,
+        "insights": system.medical_specialty_classification(raw_text),
+        "risk_assessment": system.medical_risk_assessment(raw_text, medical_entities),
+    }
+
+
 def main():
     st.set_page_config(page_title="Advanced Medical Intelligence", layout="wide")
     
     # Initialize system
-    system = AdvancedMedicalIntelligenceSystem()
+    system = AdvancedMedicalIntelligenceSystem(tracer=Tracer())
     
     st.title("🩺 Advanced Biomedical Intelligence Analysis")
     
@@ -296,21 +340,17 @@ def main():
     if uploaded_file:
         with st.spinner("🔬 Performing Advanced Biomedical Analysis..."):
             try:
-                # Process medical document
-                raw_text = system.extract_pdf_text(uploaded_file)
+                # Process medical document: entity recognition, specialty
+                # classification and risk assessment
+                analysis = analyze_report(system, uploaded_file)
                 
-                if not raw_text:
+                if analysis is None:
                     st.error("Unable to extract text from the PDF. Please check the document.")
                     return
                 
-                # Advanced entity recognition
-                medical_entities = system.advanced_medical_ner(raw_text)
-                
-                # Medical specialty classification
-                medical_insights = system.medical_specialty_classification(raw_text)
-                
-                # Risk assessment
-                risk_assessment = system.medical_risk_assessment(raw_text, medical_entities)
+                medical_entities = analysis["entities"]
+                medical_insights = analysis["insights"]
+                risk_assessment = analysis["risk_assessment"]
                 
                 # Display comprehensive report
                 st.header("🏥 Comprehensive Biomedical Intelligence Report")
@@ -385,9 +425,58 @@ def main():
                         st.write(f"- {intervention}")
                 else:
                     st.write("No specific interventions recommended")
+                
+                # Where the time went
+                with st.expander("⏱️ Pipeline Stage Timings"):
+                    st.dataframe(pd.DataFrame.from_dict(system.tracer.summary(), orient="index"))
             
             except Exception as e:
                 st.error(f"An unexpected error occurred during analysis: {e}")
 
+
+def cli(argv):
+    """Analyze PDFs without the UI, e.g.
+
+        python patient_report_analyzer.py report.pdf --trace trace.json --trace-format chrome
+        python patient_report_analyzer.py report.pdf --profile sample
+
+    Results go to stdout as JSON, the per-stage summary to stderr.
+    """
+    parser = argparse.ArgumentParser(description="Analyze medical report PDFs and trace each pipeline stage.")
+    parser.add_argument("pdf", nargs="+")
+    parser.add_argument("--trace", help="write the stage trace to this file")
+    parser.add_argument("--trace-format", choices=["json", "chrome"], default="json")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                        help="profile the run with cProfile (default) or the stack sampler")
+    parser.add_argument("--profile-out", help="default: analysis.prof or analysis.folded")
+    args = parser.parse_args(argv)
+
+    tracer = Tracer()
+
+    def run():
+        system = AdvancedMedicalIntelligenceSystem(tracer=tracer)
+        return {path: analyze_report(system, path) for path in args.pdf}
+
+    if args.profile:
+        profile_out = args.profile_out or ("analysis.prof" if args.profile == "cprofile" else "analysis.folded")
+        with profiled(args.profile, profile_out):
+            results = run()
+        print(f"Profile written to {profile_out}", file=sys.stderr)
+    else:
+        results = run()
+
+    print(json.dumps(results, indent=2))
+    for name, stage in tracer.summary().items():
+        print(f"{name:<34} {stage['calls']:>3} x {stage['seconds']:8.3f}s"
+              + (f"  {stage['tokens']} tokens" if stage["tokens"] else ""), file=sys.stderr)
+    if args.trace:
+        tracer.export(args.trace, args.trace_format)
+        print(f"Trace written to {args.trace}", file=sys.stderr)
+
+
 if __name__ == "__main__":
-    main()zzz
\ No newline at end of file
+    # `streamlit run patient_report_analyzer.py` passes no arguments
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
\ No newline at end of file
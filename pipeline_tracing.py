@@ -0,0 +1,227 @@
+"""Stage-level tracing for the report-analysis pipeline.
+
+``AdvancedMedicalIntelligenceSystem`` (patient_report_analyzer.py) wraps each
+stage -- model loading, PDF extraction, tokenization, the NER forward pass,
+entity aggregation, specialty classification and risk assessment -- in
+``tracer.stage(name)``. The default ``NullTracer`` does nothing; pass a
+``Tracer`` to record, per stage:
+
+* wall time and process CPU time;
+* ``tokens`` processed, where the stage knows them;
+* resident set size at the end of the stage and the process's peak RSS;
+* torch intra-op threads and how busy they were (CPU time / wall time /
+  threads), which shows a forward pass starved of cores.
+
+Traces export as plain JSON (``Tracer.to_json``) or in the Chrome trace
+event format (``Tracer.to_chrome_trace``) for chrome://tracing or Perfetto.
+
+``profiled(mode, path)`` wraps a run in cProfile (a .prof file for pstats or
+snakeviz) or in ``StackSampler``, which writes collapsed stacks in the same
+format as ``py-spy record --format raw`` for flamegraph.pl or speedscope.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """Resident set size in bytes, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss():
+    """Peak resident set size of the process in bytes, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def torch_threads():
+    torch = sys.modules.get('torch')
+    return torch.get_num_threads() if torch is not None else 1
+
+
+class Span:
+    __slots__ = ('name', 'start', 'duration', 'cpu_time', 'thread_id', 'attrs')
+
+    def __init__(self, name, start, thread_id, attrs):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.cpu_time = 0.0
+        self.thread_id = thread_id
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """Attach measurements known only inside the stage, e.g. ``tokens``."""
+        self.attrs.update(attrs)
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'start': self.start,
+            'duration': self.duration,
+            'cpu_time': self.cpu_time,
+            **self.attrs,
+        }
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+
+class NullTracer:
+    """The default: records nothing and costs a context manager per stage."""
+    enabled = False
+    _span = _NullSpan()
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        yield self._span
+
+
+class Tracer:
+    """Records a Span per stage; safe to share between threads."""
+    enabled = True
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        span = Span(name, time.perf_counter() - self._origin, threading.get_ident(), dict(attrs))
+        cpu_began = time.process_time()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - self._origin - span.start
+            span.cpu_time = time.process_time() - cpu_began
+            threads = torch_threads()
+            span.attrs.setdefault('rss_bytes', current_rss())
+            span.attrs.setdefault('peak_rss_bytes', peak_rss())
+            span.attrs.setdefault('torch_threads', threads)
+            if span.duration > 0:
+                span.attrs.setdefault('thread_utilization', round(span.cpu_time / span.duration / threads, 3))
+            with self._lock:
+                self.spans.append(span)
+
+    def summary(self):
+        """Per stage name: calls, total and max seconds, tokens; in first-seen order."""
+        stages = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            entry = stages.setdefault(span.name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'tokens': 0})
+            entry['calls'] += 1
+            entry['seconds'] += span.duration
+            entry['max_seconds'] = max(entry['max_seconds'], span.duration)
+            entry['tokens'] += span.attrs.get('tokens') or 0
+        return stages
+
+    def to_json(self):
+        return {'spans': [span.as_dict() for span in sorted(self.spans, key=lambda s: s.start)],
+                'summary': self.summary()}
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            events.append({
+                'name': span.name, 'cat': 'pipeline', 'ph': 'X', 'pid': pid, 'tid': span.thread_id,
+                'ts': span.start * 1e6, 'dur': span.duration * 1e6,
+                'args': {'cpu_time': span.cpu_time, **span.attrs},
+            })
+            if span.attrs.get('rss_bytes') is not None:
+                events.append({
+                    'name': 'rss', 'ph': 'C', 'pid': pid, 'ts': (span.start + span.duration) * 1e6,
+                    'args': {'MiB': round(span.attrs['rss_bytes'] / 2 ** 20, 1)},
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path, fmt='json'):
+        data = self.to_chrome_trace() if fmt == 'chrome' else self.to_json()
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=1, default=str)
+
+
+class StackSampler:
+    """Sample the main thread's Python stack every ``interval`` seconds.
+
+    ``dump`` writes "frame;frame;frame count" lines (root first), the
+    collapsed format py-spy emits with ``--format raw``.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+@contextmanager
+def profiled(mode, path):
+    """Run the block under ``mode`` ('cprofile' or 'sample') and write the profile to ``path``."""
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    elif mode == 'sample':
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.dump(path)
+    else:
+        raise ValueError(f"Unknown profile mode '{mode}'")
@@ -0,0 +1,226 @@
+"""Scoring for the RandomForest risk model trained by train_model.py.
+
+``RiskScorer.score`` takes one record (a dict of the RISK_FEATURES) or a list
+of records and returns one result per record. Three paths are used:
+
+* single records go through a compiled forest: every tree's nodes packed into
+  flat numpy arrays and traversed for all trees at once, which avoids the
+  per-call overhead of sklearn's ``predict_proba`` (thread pool start-up,
+  input validation) that dominates single-row latency;
+* small batches call ``predict_proba`` once on the whole matrix;
+* batches of ``parallel_threshold`` rows or more are split into chunks scored
+  on ``n_jobs`` threads (tree traversal releases the GIL).
+
+Benchmark (p50/p99 latency of every path):
+    python risk_scoring.py [--model medical_model.joblib] [--batch-size 100000]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from model_registry import RISK_FEATURES, load_model, registry
+
+RISK_LABELS = {0: 'Low Risk', 1: 'High Risk'}
+
+
+class InvalidRecord(ValueError):
+    """A record that cannot be scored; the message is safe to show the caller."""
+
+
+class CompiledForest:
+    """Flat-array copy of a fitted forest for fast single-row traversal."""
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(tree.node_count) + offset
+            # Leaves point at themselves so extra iterations are no-ops
+            left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            # Older sklearn stores class counts, newer stores fractions; normalise both
+            leaf_value = tree.value[:, 0, :]
+            value.append(leaf_value / leaf_value.sum(axis=1, keepdims=True))
+
+        self.roots = offsets.astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.value = np.concatenate(value)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.classes = forest.classes_
+
+    def predict_proba_one(self, x):
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        x = np.asarray(x, dtype=np.float32).astype(np.float64)
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            go_left = x[self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].mean(axis=0)
+
+
+class RiskScorer:
+    def __init__(self, model, n_jobs=-1, parallel_threshold=50000, chunk_size=10000):
+        self.model = model
+        self.n_jobs = n_jobs
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+        self.compiled = CompiledForest(model)
+
+    @staticmethod
+    def to_matrix(records):
+        """Validate records and return them as an (n, len(RISK_FEATURES)) array.
+
+        Every path scores the result, so the checks here (including NaN and
+        infinity, which the compiled forest would otherwise route silently)
+        are the only ones a record has to pass.
+        """
+        if not isinstance(records, list):
+            raise InvalidRecord("Records must be an object or a list of objects")
+        rows = []
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise InvalidRecord(f"Record {i} must be an object")
+            missing = [f for f in RISK_FEATURES if record.get(f) is None]
+            if missing:
+                raise InvalidRecord(f"Record {i} is missing {', '.join(missing)}")
+            try:
+                row = [float(record[f]) for f in RISK_FEATURES]
+            except (TypeError, ValueError):
+                raise InvalidRecord(f"Record {i} has a non-numeric value")
+            if not np.isfinite(row).all():
+                raise InvalidRecord(f"Record {i} has a NaN or infinite value")
+            rows.append(row)
+        return np.array(rows, dtype=np.float64).reshape(-1, len(RISK_FEATURES))
+
+    def predict_proba(self, X):
+        if len(X) == 1:
+            return self.compiled.predict_proba_one(X[0])[np.newaxis, :]
+        # The model was fitted on a DataFrame; keep the column names attached
+        X = pd.DataFrame(X, columns=RISK_FEATURES)
+        if len(X) < self.parallel_threshold:
+            return self.model.predict_proba(X)
+        chunks = [X.iloc[i:i + self.chunk_size] for i in range(0, len(X), self.chunk_size)]
+        parts = Parallel(n_jobs=self.n_jobs, prefer='threads')(
+            delayed(self.model.predict_proba)(chunk) for chunk in chunks
+        )
+        return np.vstack(parts)
+
+    def score(self, records):
+        """Score a record or a list of records; returns a list of result dicts."""
+        if isinstance(records, dict):
+            records = [records]
+        proba = self.predict_proba(self.to_matrix(records))
+        classes = self.model.classes_
+        labels = classes[proba.argmax(axis=1)]
+        return [
+            {
+                'risk_level': RISK_LABELS.get(int(label), str(label)),
+                'probabilities': {RISK_LABELS.get(int(c), str(c)): round(float(p), 6)
+                                  for c, p in zip(classes, row)},
+            }
+            for label, row in zip(labels, proba)
+        ]
+
+
+_scorer = None
+
+
+def get_scorer():
+    """Process-wide scorer around the registry's 'risk' model, built on first use.
+
+    This is the request-time scorer, so it stays on the calling thread: a web
+    worker spinning up a thread per core for every request would starve the
+    others on the host.
+    """
+    global _scorer
+    if _scorer is None:
+        model = registry.get('risk')
+        # predict_proba uses the n_jobs the forest was trained with
+        model.n_jobs = 1
+        _scorer = RiskScorer(model, n_jobs=1)
+    return _scorer
+
+
+def _percentiles(timings):
+    timings = np.array(timings) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(timings, 50)), 4),
+        'p99_ms': round(float(np.percentile(timings, 99)), 4),
+    }
+
+
+def benchmark(scorer, batch_size, repeats, batch_repeats):
+    rng = np.random.default_rng(42)
+    X = np.column_stack([
+        rng.integers(20, 80, batch_size),
+        rng.integers(80, 180, batch_size),
+        rng.integers(70, 200, batch_size),
+        rng.integers(150, 300, batch_size),
+        rng.integers(60, 120, batch_size),
+    ]).astype(np.float64)
+
+    # The compiled forest must agree with sklearn before its timings mean anything
+    sample = X[:200]
+    expected = scorer.model.predict_proba(pd.DataFrame(sample, columns=RISK_FEATURES))
+    compiled = np.vstack([scorer.compiled.predict_proba_one(row) for row in sample])
+    if not np.allclose(expected, compiled):
+        raise AssertionError("Compiled forest disagrees with predict_proba")
+
+    def time_calls(fn, n):
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    row = pd.DataFrame(X[:1], columns=RISK_FEATURES)
+    serial = RiskScorer(scorer.model, parallel_threshold=len(X) + 1)
+    parallel = RiskScorer(scorer.model, n_jobs=scorer.n_jobs, parallel_threshold=0,
+                          chunk_size=scorer.chunk_size)
+    results = {
+        'single_sklearn': _percentiles(time_calls(lambda: scorer.model.predict_proba(row), repeats)),
+        'single_compiled': _percentiles(time_calls(lambda: scorer.compiled.predict_proba_one(X[0]), repeats)),
+        'batch_serial': _percentiles(time_calls(lambda: serial.predict_proba(X), batch_repeats)),
+    }
+    results['batch_parallel'] = _percentiles(time_calls(lambda: parallel.predict_proba(X), batch_repeats))
+    for name in ('batch_serial', 'batch_parallel'):
+        results[name]['batch_size'] = batch_size
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the risk model scoring paths")
+    parser.add_argument('--model', help="artifact to load (default: the registry's 'risk' model)")
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=1000, help="single-record calls per path")
+    parser.add_argument('--batch-repeats', type=int, default=10)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--out', help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    model = load_model(args.model, features=RISK_FEATURES)[0] if args.model else registry.get('risk')
+    scorer = RiskScorer(model, n_jobs=args.n_jobs)
+    results = benchmark(scorer, args.batch_size, args.repeats, args.batch_repeats)
+
+    for name, stats in results.items():
+        print(f"{name:>16}: p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
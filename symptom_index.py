@@ -0,0 +1,244 @@
+"""Free-text symptom normalization for the symptom -> disease model.
+
+The raw feature names in Training.csv are awkward to show or type
+('spotting_ urination', 'foul_smell_of urine', 'fluid_overload.1'), and
+main.py used to index ``symptoms_dict`` directly, so anything else raised
+KeyError. ``SymptomIndex`` maps user input onto feature indices instead:
+
+* ``complete(prefix)``  prefix trie over every word start of the canonical
+  names and synonyms, for autocomplete;
+* ``lookup(text)``      exact / synonym match, then trigram fuzzy match;
+* ``extract(text)``     scans a sentence (e.g. an Issue description) for
+  known symptom phrases, skipping negated ones ("denies fever");
+* ``vector(symptoms)``  0/1 feature vector for the model, ignoring unknowns.
+
+Everything is precomputed at construction; lookups are dictionary and set
+operations over a few hundred terms and take well under a millisecond.
+"""
+import re
+from collections import Counter
+
+import numpy as np
+
+# Common phrasings -> canonical symptom name (as produced by canonical_name)
+SYNONYMS = {
+    'itchy skin': 'itching',
+    'itch': 'itching',
+    'rash': 'skin rash',
+    'sneezing': 'continuous sneezing',
+    'shivers': 'shivering',
+    'joint ache': 'joint pain',
+    'stomach ache': 'stomach pain',
+    'stomachache': 'stomach pain',
+    'heartburn': 'acidity',
+    'mouth ulcers': 'ulcers on tongue',
+    'throwing up': 'vomiting',
+    'vomit': 'vomiting',
+    'burning urination': 'burning micturition',
+    'painful urination': 'burning micturition',
+    'tiredness': 'fatigue',
+    'tired': 'fatigue',
+    'cold hands and feet': 'cold hands and feets',
+    'fever': 'high fever',
+    'low grade fever': 'mild fever',
+    'shortness of breath': 'breathlessness',
+    'short of breath': 'breathlessness',
+    'difficulty breathing': 'breathlessness',
+    'headaches': 'headache',
+    'jaundice': 'yellowish skin',
+    'feeling sick': 'nausea',
+    'no appetite': 'loss of appetite',
+    'diarrhea': 'diarrhoea',
+    'loose motions': 'diarrhoea',
+    'sore throat': 'throat irritation',
+    'red eyes': 'redness of eyes',
+    'blocked nose': 'congestion',
+    'stuffy nose': 'congestion',
+    'palpitation': 'palpitations',
+    'racing heart': 'fast heart rate',
+    'dizzy': 'dizziness',
+    'swollen feet': 'swollen legs',
+    'swollen extremities': 'swollen extremeties',
+    'stiff joints': 'movement stiffness',
+    'vertigo': 'spinning movements',
+    'gas': 'passage of gases',
+    'flatulence': 'passage of gases',
+    'depressed': 'depression',
+    'muscle ache': 'muscle pain',
+    'scarring': 'scurring',
+    'pimples': 'pus filled pimples',
+    'blisters': 'blister',
+    'frequent urination': 'polyuria',
+    'spotting urine': 'spotting urination',
+    'foul smelling urine': 'foul smell of urine',
+    'blurred vision': 'blurred and distorted vision',
+    'coughing': 'cough',
+    'sweats': 'sweating',
+}
+
+# A negation cue ("no", "denies", "negative for") negates every symptom after
+# it up to the end of its clause, so "denies fever and chills" drops both. A
+# clause ends at punctuation or at a contrast word ("no fever but a cough").
+NEGATION_CUES = [
+    'no', 'not', 'never', 'without', 'denies', 'denied', 'negative for',
+    "doesn't", "didn't", "hasn't", "haven't",
+]
+_CLAUSE_RE = re.compile(r'[,;.:\n]|\b(?:but|however|although|though|except)\b', re.IGNORECASE)
+_SPLIT_RE = re.compile(r'\band\b|\bwith\b', re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z0-9()']+")
+
+
+def normalize(text):
+    """Lower-case, treat '_' as a space and collapse whitespace."""
+    return ' '.join(_WORD_RE.findall(text.lower().replace('_', ' ')))
+
+
+def canonical_name(feature):
+    """Display name for a raw Training.csv column ('fluid_overload.1' -> 'fluid overload')."""
+    return normalize(re.sub(r'\.\d+$', '', feature))
+
+
+_NEGATION_CUES = [normalize(cue).split() for cue in NEGATION_CUES]
+
+
+def negation_at(words, i):
+    """Number of words in the negation cue starting at ``words[i]``, or 0."""
+    for cue in _NEGATION_CUES:
+        if words[i:i + len(cue)] == cue:
+            return len(cue)
+    return 0
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class SymptomIndex:
+    def __init__(self, features, synonyms=SYNONYMS, fuzzy_threshold=0.6):
+        self.features = list(features)
+        self.fuzzy_threshold = fuzzy_threshold
+
+        # canonical name -> feature indices (duplicated columns share a name)
+        self.indices = {}
+        for i, feature in enumerate(self.features):
+            self.indices.setdefault(canonical_name(feature), []).append(i)
+        self.names = list(self.indices)
+
+        # every searchable term (canonical names + synonyms) -> canonical name
+        self.terms = {name: name for name in self.names}
+        for synonym, name in synonyms.items():
+            if name in self.indices:
+                self.terms.setdefault(normalize(synonym), name)
+
+        self._build_trie()
+        self._build_trigrams()
+        self._max_words = max(len(term.split()) for term in self.terms)
+
+    def _build_trie(self):
+        # Each node keeps the canonical names reachable below it, so completion
+        # is a walk down the prefix with no subtree traversal.
+        self._trie = {'names': []}
+        for term, name in sorted(self.terms.items()):
+            words = term.split()
+            for start in range(len(words)):
+                node = self._trie
+                for char in ' '.join(words[start:]):
+                    node = node.setdefault(char, {'names': []})
+                    if name not in node['names']:
+                        node['names'].append(name)
+
+    def _build_trigrams(self):
+        self._term_list = list(self.terms)
+        self._term_trigrams = [trigrams(term) for term in self._term_list]
+        self._postings = {}
+        for term_id, grams in enumerate(self._term_trigrams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(term_id)
+
+    def complete(self, prefix, limit=10):
+        """Canonical names with a word starting with ``prefix``."""
+        node = self._trie
+        for char in normalize(prefix):
+            node = node.get(char)
+            if node is None:
+                return []
+        return node['names'][:limit]
+
+    def fuzzy(self, text, limit=5):
+        """(canonical name, score) pairs ranked by trigram Dice similarity."""
+        query = trigrams(normalize(text))
+        query_size = sum(query.values())
+        shared = Counter()
+        for gram, count in query.items():
+            for term_id in self._postings.get(gram, ()):
+                shared[term_id] += min(count, self._term_trigrams[term_id][gram])
+
+        best = {}
+        for term_id, common in shared.items():
+            score = 2 * common / (query_size + sum(self._term_trigrams[term_id].values()))
+            name = self.terms[self._term_list[term_id]]
+            if score >= self.fuzzy_threshold and score > best.get(name, 0):
+                best[name] = score
+        return sorted(best.items(), key=lambda item: -item[1])[:limit]
+
+    def lookup(self, text):
+        """Canonical name for a single symptom, or None if nothing is close."""
+        key = normalize(text)
+        if key in self.terms:
+            return self.terms[key]
+        matches = self.fuzzy(key, limit=1)
+        return matches[0][0] if matches else None
+
+    def extract(self, text):
+        """Canonical names mentioned anywhere in free text, in order of appearance.
+
+        Mentions negated within their clause ("no chest pain", "denies fever
+        and chills") are left out.
+        """
+        found = []
+        for clause in _CLAUSE_RE.split(text):
+            negated = False
+            for segment in _SPLIT_RE.split(clause):
+                words = normalize(segment).split()
+                matched = False
+                i = 0
+                while i < len(words):
+                    # Longest known phrase starting at this word wins, so a
+                    # synonym like 'no appetite' is a symptom, not a negation
+                    for n in range(min(self._max_words, len(words) - i), 0, -1):
+                        name = self.terms.get(' '.join(words[i:i + n]))
+                        if name:
+                            if not negated and name not in found:
+                                found.append(name)
+                            matched = True
+                            i += n
+                            break
+                    else:
+                        cue = negation_at(words, i)
+                        negated = negated or bool(cue)
+                        i += cue or 1
+                # Short segments with no exact phrase may still be a typo of one
+                if not matched and not negated and 0 < len(words) <= self._max_words:
+                    name = self.lookup(' '.join(words))
+                    if name and name not in found:
+                        found.append(name)
+        return found
+
+    def resolve(self, symptoms):
+        """Split raw inputs into (canonical names, unrecognised inputs)."""
+        names, unknown = [], []
+        for symptom in symptoms:
+            name = self.lookup(symptom)
+            if name is None:
+                unknown.append(symptom)
+            elif name not in names:
+                names.append(name)
+        return names, unknown
+
+    def vector(self, symptoms):
+        """0/1 model input for the given symptoms; unrecognised ones are ignored."""
+        input_vector = np.zeros(len(self.features))
+        for name in self.resolve(symptoms)[0]:
+            input_vector[self.indices[name]] = 1
+        return input_vector
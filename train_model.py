@@ -1,40 +1,197 @@
+"""Generate synthetic vitals data and train the risk model.
+
+With no arguments this reproduces the original behaviour: 500 rows, a default
+RandomForestClassifier, saved as medical_model.joblib. For load testing, rows
+are generated and consumed in chunks so N can go up to 10^8:
+
+    python train_model.py --rows 10000000 --chunk-size 1000000 \\
+        --model rf --model rf-warm --model hgb-warm --n-jobs 4 \\
+        --report train_report.json --no-save
+
+Configurations:
+    rf        RandomForestClassifier on all rows at once (needs N rows in memory)
+    rf-warm   RandomForestClassifier with warm_start, adding trees chunk by chunk
+    hgb       HistGradientBoostingClassifier on all rows at once
+    hgb-warm  HistGradientBoostingClassifier with warm_start, adding boosting
+              iterations chunk by chunk
+
+The report records fit time, peak memory and saved model size per config.
+Peak memory comes from a second, untimed fit under tracemalloc (which slows
+every allocation); --no-memory skips it.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.metrics import accuracy_score
-import joblib
-
-# Step 1: Generate Dummy Data
-np.random.seed(42)
-data = {
-    "Age": np.random.randint(20, 80, 500),
-    "BloodPressure": np.random.randint(80, 180, 500),
-    "Glucose": np.random.randint(70, 200, 500),
-    "Cholesterol": np.random.randint(150, 300, 500),
-    "HeartRate": np.random.randint(60, 120, 500),
-    "RiskLevel": np.random.choice([0, 1], size=500)  # 0: Low Risk, 1: High Risk
+
+from model_registry import RISK_FEATURES, save_model
+
+# (low, high) ranges for np.random.randint, as in the original dummy data
+FEATURE_RANGES = {
+    "Age": (20, 80),
+    "BloodPressure": (80, 180),
+    "Glucose": (70, 200),
+    "Cholesterol": (150, 300),
+    "HeartRate": (60, 120),
 }
+CONFIGS = ['rf', 'rf-warm', 'hgb', 'hgb-warm']
+
+
+def generate_chunks(n_rows, chunk_size, seed=42):
+    """Yield (X, y) DataFrame/Series chunks totalling ``n_rows`` rows."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, chunk_size):
+        size = min(chunk_size, n_rows - start)
+        # float32 halves memory compared to the int64 randint default
+        X = pd.DataFrame({
+            name: rng.integers(low, high, size).astype(np.float32)
+            for name, (low, high) in FEATURE_RANGES.items()
+        })[RISK_FEATURES]
+        y = pd.Series(rng.integers(0, 2, size), name="RiskLevel")  # 0: Low Risk, 1: High Risk
+        yield X, y
+
+
+def load_all(n_rows, chunk_size, seed):
+    chunks = list(generate_chunks(n_rows, chunk_size, seed))
+    X = pd.concat([X for X, _ in chunks], ignore_index=True)
+    y = pd.concat([y for _, y in chunks], ignore_index=True)
+    return X, y
+
+
+def train(config, args):
+    """Fit one configuration on freshly generated training rows."""
+    n_chunks = math.ceil(args.rows / args.chunk_size)
+
+    if config == 'rf':
+        X, y = load_all(args.rows, args.chunk_size, args.seed)
+        model = RandomForestClassifier(n_estimators=args.n_estimators, min_samples_leaf=args.min_samples_leaf,
+                                       n_jobs=args.n_jobs, random_state=42)
+        model.fit(X, y)
+
+    elif config == 'rf-warm':
+        trees_per_chunk = max(1, args.n_estimators // n_chunks)
+        model = RandomForestClassifier(n_estimators=0, min_samples_leaf=args.min_samples_leaf,
+                                       n_jobs=args.n_jobs, warm_start=True, random_state=42)
+        for X, y in generate_chunks(args.rows, args.chunk_size, args.seed):
+            model.set_params(n_estimators=model.n_estimators + trees_per_chunk)
+            model.fit(X, y)
+
+    elif config == 'hgb':
+        X, y = load_all(args.rows, args.chunk_size, args.seed)
+        model = HistGradientBoostingClassifier(max_iter=args.max_iter, early_stopping=False, random_state=42)
+        model.fit(X, y)
+
+    elif config == 'hgb-warm':
+        # Every fit() call, warm start included, bins its own chunk with a new
+        # _BinMapper and adds iterations fitted to that chunk; the earlier
+        # trees predict on raw feature thresholds, so they stay valid
+        iters_per_chunk = max(1, args.max_iter // n_chunks)
+        model = HistGradientBoostingClassifier(max_iter=0, early_stopping=False,
+                                               warm_start=True, random_state=42)
+        for X, y in generate_chunks(args.rows, args.chunk_size, args.seed):
+            model.set_params(max_iter=model.max_iter + iters_per_chunk)
+            model.fit(X, y)
+
+    else:
+        raise ValueError(f"Unknown configuration '{config}'")
+    return model
+
+
+def model_size(model):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.joblib')
+        save_model(model, path, features=RISK_FEATURES)
+        return os.path.getsize(path)
+
+
+def traced_peak(config, args):
+    """Peak Python-visible memory of a separate fit, kept out of the timed one."""
+    # tracemalloc sees numpy buffers; ru_maxrss also catches the C-level tree
+    # builders, but it is a process-wide high-water mark across configs.
+    tracemalloc.start()
+    try:
+        train(config, args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(config, args, X_test, y_test):
+    start = time.perf_counter()
+    model = train(config, args)
+    fit_seconds = time.perf_counter() - start
+
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    report = {
+        'config': config,
+        'rows': args.rows,
+        'chunk_size': args.chunk_size,
+        'n_jobs': args.n_jobs,
+        'fit_seconds': round(fit_seconds, 4),
+        'rows_per_second': round(args.rows / fit_seconds, 1),
+        'peak_traced_memory_bytes': None if args.no_memory else traced_peak(config, args),
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'model_size_bytes': model_size(model),
+        'accuracy': round(float(accuracy), 6),
+    }
+    return model, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic vitals data and train the risk model")
+    parser.add_argument('--rows', type=int, default=350, help="training rows (default matches the original 70%% of 500)")
+    parser.add_argument('--test-rows', type=int, default=150)
+    parser.add_argument('--chunk-size', type=int, default=1000000)
+    parser.add_argument('--model', dest='models', action='append', choices=CONFIGS,
+                        help="configuration to train; repeat to compare several (default: rf)")
+    parser.add_argument('--n-jobs', type=int, default=None)
+    parser.add_argument('--n-estimators', type=int, default=100, help="total trees for rf/rf-warm")
+    parser.add_argument('--max-iter', type=int, default=100, help="total boosting iterations for hgb/hgb-warm")
+    parser.add_argument('--min-samples-leaf', type=int, default=1,
+                        help="raise this for large N: the labels are random, so trees otherwise grow one leaf per row")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', help="write the per-configuration report as JSON to this file")
+    parser.add_argument('--output', default="medical_model.joblib", help="where to save the first configuration's model")
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--no-memory', action='store_true', help="skip the extra traced fit that measures peak memory")
+    args = parser.parse_args()
+    configs = args.models or ['rf']
 
-# Convert to DataFrame
-df = pd.DataFrame(data)
+    # Step 1: Hold-out rows, generated from a different seed than the training stream
+    X_test, y_test = load_all(args.test_rows, args.chunk_size, args.seed + 1)
 
-# Step 2: Split Data into Features (X) and Target (y)
-X = df[["Age", "BloodPressure", "Glucose", "Cholesterol", "HeartRate"]]
-y = df["RiskLevel"]
+    # Step 2: Train and evaluate every requested configuration
+    reports = []
+    saved = args.no_save
+    for config in configs:
+        model, report = run(config, args, X_test, y_test)
+        reports.append(report)
+        peak = report['peak_traced_memory_bytes']
+        print(f"{config:>9}: acc={report['accuracy'] * 100:.2f}% fit={report['fit_seconds']:.2f}s "
+              f"peak={'-' if peak is None else f'{peak / 2**20:.1f}MiB'} "
+              f"size={report['model_size_bytes'] / 2**20:.1f}MiB")
 
-# Train-Test Split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        # Step 3: Save the Trained Model (mmap-able joblib + manifest, see model_registry.py)
+        if not saved:
+            save_model(model, args.output, features=RISK_FEATURES, classes=model.classes_,
+                       accuracy=report['accuracy'], training=report)
+            print(f"Model saved as '{args.output}'")
+            saved = True
+        del model
 
-# Step 3: Train the Model
-model = RandomForestClassifier(random_state=42)
-model.fit(X_train, y_train)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(reports, f, indent=2)
 
-# Step 4: Evaluate the Model
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Model Accuracy: {accuracy * 100:.2f}%")
 
-# Step 5: Save the Trained Model
-joblib.dump(model, "medical_model.pkl")
-print("Model saved as 'medical_model.pkl'")
+if __name__ == '__main__':
+    main()